@@ -0,0 +1,118 @@
+"""
+Asyncio engine hosting agent runs.
+
+Each agent run is a coroutine on one shared event loop, which runs on a
+single background thread. This replaces the OS thread per
+/api/process_command. While a run waits on Vision, gpt-4o or a settle delay,
+it costs no thread. Blocking work (screen capture, encoding, input
+injection) goes through asyncio.to_thread into a bounded pool, so a process
+can drive many runs at once.
+
+Runs are keyed. cancel(key) cancels the task, which interrupts whatever the
+run is awaiting. An in-flight HTTP or gRPC request is aborted instead of
+being waited out. Flask-SocketIO handlers and routes run on their own
+threads and talk to the engine only through the thread-safe submit, run and
+cancel methods.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AgentEngine:
+    def __init__(self, workers=8, name='agent-engine'):
+        self.workers = workers
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._runs = {}           # key -> (concurrent Future, started)
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def _ensure_loop(self):
+        """Start the event loop thread on first use"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                loop.set_default_executor(
+                    ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f'{self.name}-io')
+                )
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    @property
+    def loop(self):
+        return self._ensure_loop()
+
+    def submit(self, coro, key=None):
+        """
+        Schedule a coroutine on the engine loop and return a concurrent Future.
+        A run already registered under the same key is cancelled first.
+        """
+        loop = self._ensure_loop()
+        if key is not None:
+            self.cancel(key)
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        if key is not None:
+            with self._lock:
+                self._runs[key] = (future, time.time())
+        future.add_done_callback(lambda done: self._finished(key, done))
+        return future
+
+    def _finished(self, key, future):
+        with self._lock:
+            if key is not None and self._runs.get(key, (None,))[0] is future:
+                del self._runs[key]
+            if future.cancelled():
+                self.cancelled += 1
+            elif future.exception() is not None:
+                self.failed += 1
+                print(f"[Engine] Run {key} failed: {future.exception()!r}")
+            else:
+                self.completed += 1
+
+    def run(self, coro, key=None, timeout=None):
+        """Run a coroutine on the engine loop and block until it returns (not from the loop itself)"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("AgentEngine.run() would deadlock when called from the engine loop")
+        return self.submit(coro, key).result(timeout)
+
+    def cancel(self, key):
+        """Cancel the run registered under key; True if one was running"""
+        with self._lock:
+            entry = self._runs.get(key)
+        if entry is None:
+            return False
+        return entry[0].cancel()
+
+    def running(self, key):
+        with self._lock:
+            return key in self._runs
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            runs = {str(key): round(now - started, 3) for key, (_, started) in self._runs.items()}
+            return {
+                'running': len(runs),
+                'runs': runs,               # key -> seconds running
+                'completed': self.completed,
+                'cancelled': self.cancelled,
+                'failed': self.failed,
+                'workers': self.workers,
+                'loop_started': self._loop is not None,
+            }
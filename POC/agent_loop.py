@@ -1,24 +1,66 @@
 import os
 import time
+import asyncio
 import mss
 import io
-from google.cloud import vision
-from google.cloud.vision_v1 import types
 from desktop_actions import execute_steps
-from openai import AzureOpenAI
+from openai import AzureOpenAI, AsyncAzureOpenAI
 import base64
 import json
-from system_info import get_system_info
+from system_info import system_info_provider
 from config import AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT
+from config import FRAME_DIFF_TILE_SIZE, FRAME_DIFF_PIXEL_THRESHOLD, FRAME_CHANGE_THRESHOLD
+from config import INCREMENTAL_OCR, INCREMENTAL_OCR_MARGIN, INCREMENTAL_OCR_MAX_DIRTY
+from config import AGENT_PIPELINED, AGENT_STEP_DELAY, OCR_RANKER, AGENT_RECORD_DIR
+from config import OCR_CACHE_PATH, OCR_CACHE_MAX_MB
+from config import TRAJECTORY_CACHE_PATH, TRAJECTORY_MAX_DISTANCE
+from config import LLM_STREAMING, LLM_USAGE_SAMPLE_EVERY
+from config import AGENT_ENGINE_WORKERS
+from config import PROMPT_TOKEN_BUDGET, PROMPT_RECENT_ACTIONS
+from config import AGENT_MAX_SESSIONS, AGENT_XVFB, AGENT_XVFB_DISPLAY_BASE, AGENT_XVFB_SCREEN
+from config import OCR_ENGINE, OCR_LOCAL_WORKERS, TESSERACT_LANG, TESSERACT_SCALE, TESSERACT_MIN_CONFIDENCE
+from config import OCR_TILE_SIZE, OCR_TILE_OVERLAP
+from config import AGENT_SETTLE, SETTLE_STABLE_S, SETTLE_IDLE_S, SETTLE_TIMEOUT_S, SETTLE_INTERVAL_S
+from frame_diff import FrameChangeDetector
+from incremental_ocr import IncrementalOCR
+from ocr_processing import build_annotations
+from ocr_frame import OCRFrame, as_dicts
+from ocr_engine import create_ocr_engine, local_engine_available, OCRError
+from ocr_tiles import TileOCR
+from ocr_cache import OCRCache, content_hash
+from trajectory_cache import TrajectoryCache, screen_fingerprint as trajectory_fingerprint
+from screen_capture import screen_capture
+from frame_bus import frame_bus
+from state_store import VersionedState
+from pipeline import StepTiming, PipelineReport
+from concurrent.futures import CancelledError
+from agent_engine import AgentEngine
+from agent_session import SessionManager, DEFAULT_SESSION
+from ocr_ranker import create_ranker
+from stream_json import JSONObjectScanner
+from prompt_compiler import PromptCompiler
+from text_index import text_index_for
+from prompts import ACTION_SYSTEM_PROMPT, ACTION_PROMPT_TEMPLATE, SELECTOR_SYSTEM_PROMPT, SELECTOR_PROMPT_TEMPLATE, vision_messages
+from llm_usage import llm_usage, UsageSampler, drain_usage
+from session_recorder import SessionRecorder
+from screen_settle import SettleDetector, bus_sampler
 import openai
 
-# Check for Google Cloud Vision API key
-GOOGLE_CREDENTIALS = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
-if not GOOGLE_CREDENTIALS or not os.path.exists(GOOGLE_CREDENTIALS):
-    raise RuntimeError("Google Cloud Vision API key not found. Please set the GOOGLE_APPLICATION_CREDENTIALS environment variable to your service account JSON file.")
-
-# Initialize Google Cloud Vision client
-vision_client = vision.ImageAnnotatorClient()
+# OCR engine (OCR_ENGINE); without Vision credentials the local engine is used instead, if installed.
+# Its worker processes start with the first run (warm_ocr), never at import: spawned workers re-import this module.
+ocr_options = dict(workers=OCR_LOCAL_WORKERS, lang=TESSERACT_LANG, scale=TESSERACT_SCALE,
+                   min_confidence=TESSERACT_MIN_CONFIDENCE)
+try:
+    ocr_engine = create_ocr_engine(OCR_ENGINE, **ocr_options)
+except (RuntimeError, ImportError) as e:
+    if not local_engine_available():
+        raise RuntimeError(f"{OCR_ENGINE} OCR engine unavailable ({e}) and local Tesseract is not installed "
+                           "(pip install pytesseract and the tesseract binary)") from e
+    print(f"[OCR] {OCR_ENGINE} engine unavailable ({e}); falling back to local Tesseract")
+    ocr_engine = create_ocr_engine('tesseract', **ocr_options)
+# Large frames are recognized tile by tile across the local workers
+tile_ocr = TileOCR(ocr_engine, OCR_TILE_SIZE, OCR_TILE_OVERLAP) if (
+    OCR_TILE_SIZE and not ocr_engine.remote and OCR_LOCAL_WORKERS > 1) else None
 
 # Initialize OpenAI client (new API)
 openai_client = AzureOpenAI(
@@ -27,356 +69,375 @@ openai_client = AzureOpenAI(
     azure_endpoint=AZURE_OPENAI_ENDPOINT,
 )
 
-# State for transparency and web UI
-agent_state = {
-    'goal': None,
-    'actions_taken': [],
-    'step': 0,
-    'screen_ocr': '',
-    'screen_b64': '',
-    'ocr_annotations': [],
-    'llm_prompt': '',
-    'llm_response': '',
-    'status': 'idle',
-    'message': '',
-    'stop_requested': False
-}
-
-def capture_screen():
-    with mss.mss() as sct:
-        monitor = sct.monitors[1]
-        screenshot = sct.grab(monitor)
-        img_bytes = mss.tools.to_png(screenshot.rgb, screenshot.size)
-        # For web UI: base64 encode
-        img_b64 = base64.b64encode(img_bytes).decode('utf-8')
-        
-        # Debug: Print monitor and image information
-        print(f"[Debug] Monitor info: {monitor}")
-        print(f"[Debug] Screenshot size: {screenshot.size}")
-        print(f"[Debug] Image bytes size: {len(img_bytes)}")
-        
-        return img_bytes, img_b64
-
-def ocr_screen_with_coordinates(img_bytes):
-    """Extract text with coordinate annotations from the screen, merging nearby words into UI elements."""
-    image = types.Image(content=img_bytes)
-    response = vision_client.text_detection(image=image)
-    texts = response.text_annotations
-    
-    if not texts:
-        return "", []
-    
-    # Full text content
-    full_text = texts[0].description
-    
-    # Get scaling factor using mss
-    with mss.mss() as sct:
-        monitor = sct.monitors[1]
-        screenshot = sct.grab(monitor)
-        screen_width = monitor['width']
-        screen_height = monitor['height']
-        screenshot_width = screenshot.width
-        screenshot_height = screenshot.height
-        scale_x = screen_width / screenshot_width
-        scale_y = screen_height / screenshot_height
-        print(f"[Debug] Screen: {screen_width}x{screen_height}, Screenshot: {screenshot_width}x{screenshot_height}, Scale: x={scale_x:.3f}, y={scale_y:.3f}")
-    
-    # Process individual text elements first
-    text_elements = []
-    for text in texts[1:]:
-        text_content = text.description.strip()
-        if not text_content:
-            continue
-            
-        vertices = text.bounding_poly.vertices
-        x_coords = [vertex.x for vertex in vertices]
-        y_coords = [vertex.y for vertex in vertices]
-        center_x = sum(x_coords) / len(x_coords)
-        center_y = sum(y_coords) / len(y_coords)
-        
-        # Scale to screen coordinates
-        screen_x = int(center_x * scale_x)
-        screen_y = int(center_y * scale_y)
-        bbox = {
-            'x1': int(min(x_coords) * scale_x),
-            'y1': int(min(y_coords) * scale_y),
-            'x2': int(max(x_coords) * scale_x),
-            'y2': int(max(y_coords) * scale_y)
-        }
-        
-        text_elements.append({
-            'text': text_content,
-            'x': screen_x,
-            'y': screen_y,
-            'bbox': bbox,
-            'width': bbox['x2'] - bbox['x1'],
-            'height': bbox['y2'] - bbox['y1']
-        })
-    
-    # Filter out UI control elements that shouldn't be clicked
-    ui_control_words = {
-        'stop', 'start', 'pause', 'reset', 'clear', 'close', 'exit', 'quit',
-        'cancel', 'abort', 'terminate', 'kill', 'end', 'finish', 'done',
-        'refresh', 'reload', 'update', 'save', 'load', 'import', 'export'
-    }
-    
-    # Common UI elements that should not be merged with others
-    ui_element_words = {
-        'images', 'videos', 'news', 'maps', 'books', 'flights', 'finance',
-        'all', 'web', 'search', 'home', 'back', 'forward', 'reload',
-        'file', 'edit', 'view', 'help', 'tools', 'options', 'settings',
-        'profile', 'account', 'login', 'logout', 'sign', 'register'
-    }
-    
-    # Filter out elements that look like UI controls
-    filtered_elements = []
-    for element in text_elements:
-        text_lower = element['text'].lower().strip()
-        
-        # Skip if it's a single word that matches UI controls
-        if text_lower in ui_control_words and len(element['text'].split()) == 1:
-            print(f"[OCR Filter] Skipping UI control: '{element['text']}'")
-            continue
-            
-        # Skip if it's positioned in typical UI control areas (top/bottom edges)
-        if element['y'] < 50 or element['y'] > screen_height - 100:
-            # But allow it if it's clearly part of the main content
-            if element['width'] > 200 or len(element['text']) > 10:
-                filtered_elements.append(element)
-            else:
-                print(f"[OCR Filter] Skipping edge UI element: '{element['text']}' at y={element['y']}")
-                continue
-        else:
-            filtered_elements.append(element)
-    
-    text_elements = filtered_elements
-    
-    # Merge nearby words into UI elements
-    merged_elements = []
-    used_indices = set()
-    
-    # Parameters for merging - much more conservative for UI elements
-    max_horizontal_gap = 30  # pixels between words horizontally (reduced from 80)
-    max_vertical_gap = 15    # pixels between words vertically (reduced from 25)
-    max_height_diff = 10     # max height difference for same line (reduced from 20)
-    
-    for i, element in enumerate(text_elements):
-        if i in used_indices:
-            continue
-            
-        # Start a new group
-        group = [element]
-        used_indices.add(i)
-        
-        # Find nearby elements horizontally (likely same line)
-        for j, other_element in enumerate(text_elements):
-            if j in used_indices:
-                continue
-                
-            # Check if elements are on roughly the same line
-            height_diff = abs(element['y'] - other_element['y'])
-            if height_diff <= max_height_diff:
-                # Check horizontal distance
-                if element['x'] < other_element['x']:
-                    gap = other_element['bbox']['x1'] - element['bbox']['x2']
-                else:
-                    gap = element['bbox']['x1'] - other_element['bbox']['x2']
-                    
-                # Much more conservative merging - only merge if very close
-                if gap <= max_horizontal_gap and gap >= -5:  # Reduced overlap tolerance
-                    # Additional check: don't merge if both elements are short (likely UI elements)
-                    if len(element['text']) <= 8 and len(other_element['text']) <= 8:
-                        # For short elements, require even smaller gap
-                        if gap <= 15:  # Very small gap for short elements
-                            # Check if either element is a UI element that shouldn't be merged
-                            element_lower = element['text'].lower().strip()
-                            other_lower = other_element['text'].lower().strip()
-                            
-                            if (element_lower in ui_element_words or other_lower in ui_element_words):
-                                # Don't merge UI elements like tabs
-                                print(f"[OCR Merge] Skipping merge of UI elements: '{element['text']}' and '{other_element['text']}'")
-                                continue
-                            
-                            group.append(other_element)
-                            used_indices.add(j)
-                    else:
-                        # For longer elements, use normal gap
-                        group.append(other_element)
-                        used_indices.add(j)
-        
-        # Sort group by x position
-        group.sort(key=lambda x: x['x'])
-        
-        # Merge into single element
-        if len(group) == 1:
-            merged_elements.append(group[0])
-        else:
-            # Calculate merged bounding box
-            min_x = min(elem['bbox']['x1'] for elem in group)
-            max_x = max(elem['bbox']['x2'] for elem in group)
-            min_y = min(elem['bbox']['y1'] for elem in group)
-            max_y = max(elem['bbox']['y2'] for elem in group)
-            
-            # Merge text with spaces, but be smart about it
-            text_parts = []
-            for elem in group:
-                text_parts.append(elem['text'])
-            
-            # Join with spaces, but don't add extra spaces
-            merged_text = ' '.join(text_parts)
-            
-            # Calculate center
-            center_x = (min_x + max_x) // 2
-            center_y = (min_y + max_y) // 2
-            
-            merged_elements.append({
-                'text': merged_text,
-                'x': center_x,
-                'y': center_y,
-                'bbox': {
-                    'x1': min_x,
-                    'y1': min_y,
-                    'x2': max_x,
-                    'y2': max_y
-                },
-                'width': max_x - min_x,
-                'height': max_y - min_y,
-                'merged_from': len(group)
-            })
-    
-    # Add instance tracking for identical text
-    text_groups = {}
-    for element in merged_elements:
-        text_content = element['text']
-        if text_content not in text_groups:
-            text_groups[text_content] = []
-        text_groups[text_content].append(element)
-    
-    # Add instance info
-    annotations = []
-    for text_content, instances in text_groups.items():
-        if len(instances) == 1:
-            ann = instances[0].copy()
-            ann['index'] = 0
-            ann['total_instances'] = 1
-            annotations.append(ann)
-        else:
-            for i, ann in enumerate(instances):
-                ann_copy = ann.copy()
-                ann_copy['index'] = i
-                ann_copy['total_instances'] = len(instances)
-                annotations.append(ann_copy)
-    
-    # Sort by y position (top to bottom) then x position (left to right)
-    annotations.sort(key=lambda x: (x['y'], x['x']))
-    
-    # Debug output
-    print(f"[OCR Debug] Found {len(merged_elements)} merged elements from {len(text_elements)} individual words")
-    for i, ann in enumerate(annotations[:10]):  # Show first 10
-        merged_info = f" (merged from {ann['merged_from']} words)" if 'merged_from' in ann else ""
-        print(f"  {i+1}. '{ann['text']}' at ({ann['x']}, {ann['y']}){merged_info}")
-    
-    return full_text, annotations
+# Async client for the agent engine; only used from the engine's event loop
+async_openai_client = AsyncAzureOpenAI(
+    api_key=AZURE_OPENAI_API_KEY,
+    api_version="2024-10-21",
+    azure_endpoint=AZURE_OPENAI_ENDPOINT,
+)
 
-def build_llm_prompt(goal, actions_taken, ocr_annotations):
-    sysinfo = get_system_info()
-    sysinfo_str = f"OS: {sysinfo['os']} {sysinfo['os_version']} | Arch: {sysinfo['architecture']} | Desktop: {sysinfo.get('desktop_environment', 'unknown')}"
-    
-    # Format OCR annotations with detailed information
-    ocr_info = "EXACT TEXT ELEMENTS DETECTED BY OCR (use these exact strings for clicking):\n"
-    if not ocr_annotations:
-        ocr_info += "- NO TEXT ELEMENTS DETECTED ON SCREEN\n"
-    else:
-        for i, ann in enumerate(ocr_annotations):
-            merged_info = f" (merged from {ann['merged_from']} words)" if 'merged_from' in ann else ""
-            instance_info = f" [instance {ann['index']+1} of {ann['total_instances']}]" if ann['total_instances'] > 1 else ""
-            ocr_info += f"{i+1}. '{ann['text']}' at position ({ann['x']}, {ann['y']}){merged_info}{instance_info}\n"
-    
-    # Add summary statistics
-    total_elements = len(ocr_annotations)
-    merged_elements = sum(1 for ann in ocr_annotations if 'merged_from' in ann and ann['merged_from'] > 1)
-    ocr_info += f"\nOCR SUMMARY: {total_elements} clickable elements found, {merged_elements} are multi-word elements.\n"
-    
-    prompt = f'''
-You are an agent controlling a computer only through simulated mouse and keyboard actions.
+# Every agent run is a task on this engine's event loop (see agent_engine)
+engine = AgentEngine(AGENT_ENGINE_WORKERS)
 
-Device/system info:
-{sysinfo_str}
+# Persistent OCR cache: identical pixels never go to Vision twice, across runs and processes
+ocr_cache = OCRCache(OCR_CACHE_PATH, OCR_CACHE_MAX_MB * 1024 * 1024) if OCR_CACHE_PATH else None
+# Trajectory cache: successful runs are replayed without the LLM while the screens match
+trajectory_cache = TrajectoryCache(TRAJECTORY_CACHE_PATH, TRAJECTORY_MAX_DISTANCE) if TRAJECTORY_CACHE_PATH else None
 
-Your goal is: "{goal}"
+def new_agent_state():
+    """
+    State of one agent session, for transparency and the web UI. Versioned so
+    the UI receives pushed diffs and large fields are served once by content
+    hash (see state_store).
+    """
+    return VersionedState({
+        'goal': None,
+        'actions_taken': [],
+        'step': 0,
+        'screen_ocr': '',
+        'screen_b64': '',
+        'ocr_annotations': [],
+        'llm_prompt': '',
+        'llm_response': '',
+        'status': 'idle',
+        'message': '',
+        'stop_requested': False,
+        'frame_cache_hits': 0,
+        'frame_cache_misses': 0,
+        'ocr_mode': '',
+        'pipeline': {},
+        'ranker': '',
+        'ocr_cache': {},
+        'replayed_steps': 0,
+        'prompt_tokens': {}
+    }, blob_fields={
+        'screen_b64': ('image/jpeg', base64.b64decode),
+        'screen_ocr': ('text/plain; charset=utf-8', str.encode),
+        'llm_prompt': ('text/plain; charset=utf-8', str.encode),
+    }, serialize=as_dicts)
+
+# Isolated agent sessions; 'default' drives the host display
+def new_settle_detector(bus):
+    """Adaptive post-action wait on a session's display (None: fixed sleeps, AGENT_SETTLE=0)"""
+    if not AGENT_SETTLE:
+        return None
+    return SettleDetector(bus_sampler(bus), stable_window=SETTLE_STABLE_S, idle_window=SETTLE_IDLE_S,
+                          timeout=SETTLE_TIMEOUT_S, interval=SETTLE_INTERVAL_S)
+
+sessions = SessionManager(
+    new_agent_state,
+    max_sessions=AGENT_MAX_SESSIONS,
+    xvfb=AGENT_XVFB,
+    display_base=AGENT_XVFB_DISPLAY_BASE,
+    screen=AGENT_XVFB_SCREEN,
+    settle_factory=new_settle_detector
+)
+# The default session's state (CLI and single-agent callers)
+agent_state = sessions.default.state
 
-Here are the actions you have taken so far:
-{json.dumps(actions_taken, indent=2)}
+def grab_screen(bus=frame_bus):
+    """Return a Frame of the primary monitor captured after this call, via a frame bus (the host display's by default)"""
+    return bus.fresh_frame()
 
-{ocr_info}
+def encode_screenshot(frame):
+    """Return the frame's lossless PNG bytes plus its base64 (encoded once per frame)"""
+    img_bytes = frame.encodings.png()
+    img_b64 = frame.encodings.png_b64()
+    
+    # Debug: Print image information
+    print(f"[Debug] Screenshot size: {frame.size}")
+    print(f"[Debug] Image bytes size: {len(img_bytes)}")
+    
+    return img_bytes, img_b64
 
-CRITICAL INSTRUCTIONS:
-1. ONLY click on text elements that are EXACTLY listed above. Do NOT guess or approximate text.
-2. Use the EXACT text strings shown in the OCR list for clicking.
-3. If you need to click on something that's not in the OCR list, you cannot do it - find an alternative approach.
-4. Pay attention to instance numbers if there are multiple elements with the same text.
-5. For keyboard actions (Enter, Tab, Escape, etc.), use the "press" action, NOT "click_text".
-6. If you see a button or element that looks like a keyboard key, use "press" action instead of clicking.
-7. NEVER click on UI control elements like "STOP", "START", "PAUSE", "CANCEL", etc. - these are interface controls, not content.
-8. Focus on the main application content, not the browser/interface controls around it.
+def capture_screen():
+    return encode_screenshot(grab_screen())
+
+def cached_ocr(key):
+    """Cached OCR result for key (counted as a hit), or None"""
+    cached = ocr_cache.get(ocr_engine.cache_prefix + key) if ocr_cache is not None else None
+    if cached is not None:
+        ocr_cache.record(True, cached['request_bytes'])
+    return cached
+
+def store_ocr(key, value, request_bytes):
+    if ocr_cache is not None:
+        ocr_cache.record(False)
+        ocr_cache.put(ocr_engine.cache_prefix + key, dict(value, request_bytes=request_bytes))
+
+def text_result(key, recognize):
+    """(full_text, words) from recognize() -> (full_text, words, request bytes), cached unless recognition failed"""
+    try:
+        full_text, words, request_bytes = recognize()
+    except OCRError as e:
+        # Never cache a failed recognition
+        print(f"[OCR] {e}")
+        return "", []
+    store_ocr(key, {'full_text': full_text, 'words': words}, request_bytes)
+    return full_text, words
 
-IMPORTANT: Look carefully at the current screen image. If you see evidence that your previous actions were incorrect, made a mistake, or didn't achieve the intended result, you MUST correct course immediately. Don't continue with a flawed approach - adapt and fix the situation.
+def recognize_whole(img_bytes):
+    full_text, words = ocr_engine.recognize(img_bytes)
+    return full_text, words, len(img_bytes)
 
-Examples of when to correct course:
-- If you opened the wrong application, close it and open the correct one
-- If you typed in the wrong field, clear it and type in the right place
-- If you clicked the wrong button, undo the action or navigate back
-- If you see an error message, address it appropriately
-- If the screen shows something unexpected, adjust your strategy
+def detect_text(key, get_image_bytes, get_image=None):
+    """
+    Text detection on the OCR engine, through the OCR cache. Returns
+    (full_text, raw words) with words as (text, vertices) in pixels of the
+    image sent. get_image_bytes is only called on a miss, so a cached screen
+    is never even PNG-encoded. With tile OCR on, get_image (the screenshot
+    as a PIL image) lets a large frame be recognized tile by tile instead.
+    """
+    cached = cached_ocr(key)
+    if cached is not None:
+        return cached['full_text'], cached['words']
+    if tile_ocr is not None and get_image is not None:
+        image = get_image()
+        if tile_ocr.applies(image.size):
+            return text_result(key, lambda: tile_ocr.recognize(image))
+    img_bytes = get_image_bytes()
+    return text_result(key, lambda: recognize_whole(img_bytes))
+
+async def detect_text_async(key, get_image_bytes, get_image=None):
+    """detect_text for the event loop; cache reads and writes and the PNG (or tile) encoding run off the loop"""
+    cached = await asyncio.to_thread(cached_ocr, key)
+    if cached is not None:
+        return cached['full_text'], cached['words']
+    try:
+        image = await asyncio.to_thread(get_image) if tile_ocr is not None and get_image is not None else None
+        if image is not None and tile_ocr.applies(image.size):
+            result = await tile_ocr.arecognize(image)
+        else:
+            img_bytes = await asyncio.to_thread(get_image_bytes)
+            full_text, words = await ocr_engine.arecognize(img_bytes)
+            result = full_text, words, len(img_bytes)
+    except OCRError as e:
+        print(f"[OCR] {e}")
+        return "", []
+    return await asyncio.to_thread(text_result, key, lambda: result)
+
+def screen_geometry(frame=None):
+    """(scale_x, scale_y, screen_height) from the frame, or the capture service's cached geometry (no second grab)"""
+    if frame is not None:
+        return frame.scale_x, frame.scale_y, frame.screen_height
+    monitor, scale_x, scale_y = screen_capture.geometry()
+    return scale_x, scale_y, monitor['height']
+
+def screen_fingerprint(img_bytes, frame=None):
+    """Content hash of a screenshot; the frame's memoized pixel hash avoids touching the PNG"""
+    return frame.encodings.fingerprint() if frame is not None else content_hash(img_bytes)
+
+def screen_words(full_text, words, frame=None):
+    """OCR words of a full screenshot in screen coordinates: (full_text, words, screen_height)"""
+    if not full_text and not words:
+        return "", OCRFrame.empty(), None
+    
+    scale_x, scale_y, screen_height = screen_geometry(frame)
+    
+    # Process individual text elements first
+    return full_text, OCRFrame.from_words(words, scale_x, scale_y), screen_height
 
-DO NOT USE THE MOUSE UNLESS YOU HAVE TO. A common mistake is to type something and then click on it. This is not allowed. Press the enter key to submit the form. Furthermore, if you have already clicked on something, do not click on it again. Try pressing enter instead.
+def ocr_screen_words(img_bytes, frame=None):
+    """
+    Run text detection on a full screenshot (through the OCR cache).
+    Returns (full_text, word elements in screen coordinates, screen_height).
+    The frame supplies the screenshot-to-screen scale; without one the capture
+    service's cached geometry is used. img_bytes may be None when a frame is
+    given; the PNG is then only encoded on a cache miss.
+    """
+    full_text, words = detect_text(
+        'frame:' + screen_fingerprint(img_bytes, frame),
+        lambda: img_bytes if img_bytes is not None else frame.encodings.png(),
+        frame.encodings.rgb_image if frame is not None else None
+    )
+    return screen_words(full_text, words, frame)
+
+def annotate_screen(words, img_bytes, frame=None):
+    """build_annotations for a full screenshot, cached by pixels and screen geometry"""
+    scale_x, scale_y, screen_height = screen_geometry(frame)
+    key = f"{ocr_engine.cache_prefix}annotations:{screen_fingerprint(img_bytes, frame)}:{scale_x:.4f}:{scale_y:.4f}:{screen_height}"
+    cached = ocr_cache.get(key) if ocr_cache is not None else None
+    if cached is not None:
+        return OCRFrame.from_dicts(cached)
+    annotations = build_annotations(words, screen_height)
+    if ocr_cache is not None:
+        ocr_cache.put(key, annotations.to_dicts())
+    return annotations
+
+def ocr_screen_with_coordinates(img_bytes, frame=None):
+    """Extract text with coordinate annotations from the screen, merging nearby words into UI elements."""
+    full_text, text_elements, screen_height = ocr_screen_words(img_bytes, frame)
+    if screen_height is None:
+        return "", text_elements
+    return full_text, annotate_screen(text_elements, img_bytes, frame)
 
-DO NOT CLICK ON THE SAME TEXT ELEMENT MORE THAN TWICE. If you have already clicked on something, do not click on it again. Try pressing enter instead.
+def prepare_crops(frame, regions):
+    """
+    Cut the DirtyRegions out of a screenshot. Returns the cached words per
+    region (None where the OCR engine still has to read the crop) and the pending
+    crops as (position, cache key, png bytes).
+    """
+    img = frame.encodings.rgb_image()
+    crop_words = [None] * len(regions)
+    pending = []
+    for position, region in enumerate(regions):
+        crop = img.crop(region.crop)
+        key = 'crop:' + content_hash(repr(crop.size).encode(), crop.tobytes())
+        cached = cached_ocr(key)
+        if cached is not None:
+            crop_words[position] = cached['words']
+            continue
+        buffer = io.BytesIO()
+        crop.save(buffer, format='PNG')
+        pending.append((position, key, buffer.getvalue()))
+    return crop_words, pending
 
+def store_crops(pending, results):
+    for (_, key, png), (_, words) in zip(pending, results):
+        store_ocr(key, {'words': words}, len(png))
 
-You can only use these actions:
-- {{"action": "type", "text": "..."}}  # For typing plain text (no modifiers)
-- {{"action": "press", "keys": [key1, key2, ...]}}  # For keyboard shortcuts or modifier keys (e.g., ['command', 't'] for Cmd+T)
-- {{"action": "click_text", "target": "exact text from OCR list"}}  # Click on text element (use EXACT text from OCR annotations above)
+async def ocr_dirty_regions(frame, regions):
+    """
+    OCR only the given DirtyRegions of a screenshot in a single batch on the OCR engine.
+    Crops already in the OCR cache are not sent.
+    Returns one word-level OCRFrame per region (screen coordinates), or None if any crop failed.
+    """
+    crop_words, pending = await asyncio.to_thread(prepare_crops, frame, regions)
+    
+    if pending:
+        payload_bytes = sum(len(png) for _, _, png in pending)
+        print(f"[Incremental OCR] Sending {len(pending)} crops ({payload_bytes} bytes) to {ocr_engine.name}")
+        try:
+            results = await ocr_engine.arecognize_batch([png for _, _, png in pending])
+        except OCRError as e:
+            print(f"[Incremental OCR] {e}")
+            return None
+        for (position, key, png), (_, words) in zip(pending, results):
+            crop_words[position] = words
+        await asyncio.to_thread(store_crops, pending, results)
+    
+    return [
+        OCRFrame.from_words(words, frame.scale_x, frame.scale_y, offset_x=region.crop[0], offset_y=region.crop[1])
+        for region, words in zip(regions, crop_words)
+    ]
 
-Examples:
-- To type 'hello', use: {{"action": "type", "text": "hello"}}
-- To press Cmd+T (open new tab on macOS), use: {{"action": "press", "keys": ["command", "t"]}}
-- To press Ctrl+W, use: {{"action": "press", "keys": ["ctrl", "w"]}}
-- To press Enter key, use: {{"action": "press", "keys": ["enter"]}}
-- To press Tab key, use: {{"action": "press", "keys": ["tab"]}}
-- To click on a button with text "Submit", use: {{"action": "click_text", "target": "Submit"}}
-- To click on a menu item "File", use: {{"action": "click_text", "target": "File"}}
-- DO NOT click on UI controls like "STOP", "CANCEL", "CLOSE" - these are interface elements, not content
+async def ocr_screen_incremental(frame, change, incremental):
+    """
+    OCR the screen, re-recognizing only the tiles that changed since the last
+    OCR'd frame when possible. Returns (full_text, annotations, mode).
+    The full-frame PNG is only encoded when a full OCR is actually needed.
+    """
+    regions = incremental.plan(change) if INCREMENTAL_OCR else None
+    if regions is not None:
+        region_words = await ocr_dirty_regions(frame, regions) if regions else []
+        if region_words is not None:
+            words = incremental.splice(regions, region_words, frame.scale_x, frame.scale_y)
+            # The engine's full text is not available for a spliced frame; rebuild it in reading order
+            full_text = ' '.join(words.text)
+            annotations = await asyncio.to_thread(build_annotations, words, frame.screen_height)
+            return full_text, annotations, 'incremental'
+    
+    key = 'frame:' + await asyncio.to_thread(screen_fingerprint, None, frame)
+    full_text, words = await detect_text_async(key, frame.encodings.png, frame.encodings.rgb_image)
+    full_text, words, screen_height = screen_words(full_text, words, frame)
+    incremental.reset(words)
+    if screen_height is None:
+        return "", words, 'full'
+    return full_text, await asyncio.to_thread(annotate_screen, words, None, frame), 'full'
 
-Look at the current screen image and determine what action to take next to achieve your goal. If you need to correct a previous mistake, do so immediately. Pay special attention to the cursor position when deciding mouse movements.
+prompt_compiler = PromptCompiler(budget=PROMPT_TOKEN_BUDGET, recent_actions=PROMPT_RECENT_ACTIONS)
 
-If the goal is achieved, respond with:
-{{"action": "done"}}
+def compile_llm_prompt(goal, actions_taken, ocr_annotations):
+    """
+    The per-step part of the action prompt within PROMPT_TOKEN_BUDGET (which
+    also covers the static ACTION_SYSTEM_PROMPT sent ahead of it), as a
+    CompiledPrompt (text plus token report)
+    """
+    return prompt_compiler.compile(ACTION_PROMPT_TEMPLATE, actions_taken, ocr_annotations, prefix=ACTION_SYSTEM_PROMPT,
+                                   sysinfo=system_info_provider.prompt_snippet(), goal=goal)
 
-Respond ONLY with a single JSON object and no extra text.
-'''
-    return prompt
+def build_llm_prompt(goal, actions_taken, ocr_annotations):
+    return compile_llm_prompt(goal, actions_taken, ocr_annotations).text
 
-def call_llm(prompt, image_b64):
+def call_llm(prompt, image_b64, image_mime="image/jpeg"):
     response = openai_client.chat.completions.create(
         model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "You are a desktop automation agent. Follow instructions precisely."},
-            {
-                "role": "user", 
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_b64}"}}
-                ]
-            }
-        ],
+        messages=vision_messages(ACTION_SYSTEM_PROMPT, prompt, image_b64, image_mime),
         temperature=0.2,
         max_tokens=256
     )
+    llm_usage.record('action', response.usage)
     content = response.choices[0].message.content.strip()
     return content
 
+async def call_llm_async(prompt, image_b64, image_mime="image/jpeg"):
+    response = await async_openai_client.chat.completions.create(
+        model="gpt-4o",
+        messages=vision_messages(ACTION_SYSTEM_PROMPT, prompt, image_b64, image_mime),
+        temperature=0.2,
+        max_tokens=256
+    )
+    llm_usage.record('action', response.usage)
+    return response.choices[0].message.content.strip()
+
+# Streams kept open after dispatch only to read their final usage chunk (sampled, see LLM_USAGE_SAMPLE_EVERY)
+_usage_drains = set()
+usage_sampler = UsageSampler(LLM_USAGE_SAMPLE_EVERY)
+
+async def stream_llm_action(prompt, image_b64, image_mime="image/jpeg"):
+    """
+    Streamed variant of call_llm for the action model. Returns
+    (action, response_text, time_to_first_action) as soon as the first JSON
+    object in the stream is complete. The rest of the stream is cancelled,
+    except on every LLM_USAGE_SAMPLE_EVERY-th call, where it is read in the
+    background for its usage chunk (prompt and cached tokens).
+    """
+    start = time.perf_counter()
+    stream = await async_openai_client.chat.completions.create(
+        model="gpt-4o",
+        messages=vision_messages(ACTION_SYSTEM_PROMPT, prompt, image_b64, image_mime),
+        temperature=0.2,
+        max_tokens=256,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    scanner = JSONObjectScanner()
+    sample_usage = usage_sampler.take()
+    handed_off = False
+    try:
+        async for chunk in stream:
+            if chunk.usage is not None:
+                llm_usage.record('action', chunk.usage)
+            # Azure sends content-filter chunks without choices
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            action = scanner.feed(chunk.choices[0].delta.content)
+            if action is not None:
+                if sample_usage:
+                    drain = asyncio.create_task(drain_usage(stream, 'action', llm_usage))
+                    _usage_drains.add(drain)
+                    drain.add_done_callback(_usage_drains.discard)
+                    handed_off = True
+                return action, scanner.text, time.perf_counter() - start
+    finally:
+        # Closing the stream cancels whatever the model was still going to send
+        if not handed_off:
+            await stream.close()
+    return parse_llm_response(scanner.text), scanner.text.strip(), time.perf_counter() - start
+
+async def request_action(prompt, image_b64, timing):
+    """Ask the action LLM (streamed unless LLM_STREAMING=0); returns (action, llm_response)"""
+    with timing.stage('action'):
+        if LLM_STREAMING:
+            action, llm_response, first_action = await stream_llm_action(prompt, image_b64)
+        else:
+            start = time.perf_counter()
+            llm_response = await call_llm_async(prompt, image_b64)
+            action = parse_llm_response(llm_response)
+            first_action = time.perf_counter() - start
+    timing.metric('time_to_first_action', first_action)
+    return action, llm_response
+
 def parse_llm_response(response):
     try:
         # Find the first JSON object in the response
@@ -388,46 +449,10 @@ def parse_llm_response(response):
         print(f"[Agent] Failed to parse LLM response: {e}")
     return {"action": "ask", "message": "Could not parse LLM response."}
 
-def select_relevant_ocr_elements(goal, ocr_annotations, image_b64):
-    """
-    Use an LLM to select and rank the most relevant OCR elements for the given goal.
-    Returns a ranked list of OCR elements (subset of ocr_annotations, possibly reordered).
-    """
-    selector_prompt = f'''
-You are an expert UI assistant. Your job is to help another agent achieve the following goal on a computer screen:
-GOAL: "{goal}"
-
-You are given a list of all detected text elements on the screen, each with its coordinates and bounding box. You are also given a screenshot image of the screen.
+def build_selector_prompt(goal, ocr_annotations):
+    return SELECTOR_PROMPT_TEMPLATE.format(goal=goal, elements=json.dumps(as_dicts(ocr_annotations), indent=2))
 
-Your task:
-- Carefully examine the screenshot and the list of OCR elements.
-- Select the most important and relevant text elements for achieving the goal.
-- Rank them in order of importance (most relevant first).
-- For each, return the exact text, its coordinates (x, y), and its bounding box.
-- Only include elements that are likely to be actionable or important for the goal.
-- If there are multiple instances of the same text, include each instance separately with its coordinates.
-
-Respond ONLY with a JSON array of objects, each with keys: "text", "x", "y", "bbox", and (if present) "index" and "total_instances". Do not include any explanation or extra text.
-
-Here is the list of OCR elements:
-{json.dumps(ocr_annotations, indent=2)}
-'''
-    response = openai_client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "You are a UI element selector for desktop automation."},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": selector_prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_b64}"}}
-                ]
-            }
-        ],
-        temperature=0.2,
-        max_tokens=512
-    )
-    content = response.choices[0].message.content.strip()
+def parse_selector_response(content):
     try:
         # Parse the first JSON array in the response
         start = content.find('[')
@@ -438,80 +463,329 @@ Here is the list of OCR elements:
         print(f"[Selector LLM] Failed to parse response: {e}")
     return []
 
-def agent_autorun(goal, max_steps=20):
-    agent_state['goal'] = goal
-    agent_state['actions_taken'] = []
-    agent_state['step'] = 0
-    agent_state['status'] = 'running'
-    agent_state['message'] = ''
-    agent_state['stop_requested'] = False
-    print(f"[Agent] Starting autorun perception-action loop for goal: {goal}")
-    for step in range(max_steps):
-        if agent_state['stop_requested']:
-            agent_state['status'] = 'stopped'
-            agent_state['message'] = 'Agent loop stopped by user.'
-            print("[Agent] Agent loop stopped by user.")
-            break
-        agent_state['step'] = step
-        # 1. Capture the screen
-        img_bytes, img_b64 = capture_screen()
-        agent_state['screen_b64'] = img_b64
-        # 2. OCR the screen with coordinates
-        screen_text, ocr_annotations = ocr_screen_with_coordinates(img_bytes)
-        agent_state['screen_ocr'] = screen_text
-        agent_state['ocr_annotations'] = ocr_annotations
-        # 2.5. Middleman LLM: select and rank relevant OCR elements
-        ranked_ocr = select_relevant_ocr_elements(goal, ocr_annotations, img_b64)
-        if ranked_ocr:
-            agent_state['ranked_ocr'] = ranked_ocr
-            ocr_for_action = ranked_ocr
-        else:
-            ocr_for_action = ocr_annotations
-        # Debug: Show OCR results
-        print(f"[Agent] OCR found {len(ocr_annotations)} clickable elements")
-        if ocr_annotations:
-            print("[Agent] Top 5 OCR elements:")
-            for i, ann in enumerate(ocr_annotations[:5]):
-                merged_info = f" (merged from {ann['merged_from']} words)" if 'merged_from' in ann else ""
-                print(f"  {i+1}. '{ann['text']}' at ({ann['x']}, {ann['y']}){merged_info}")
-        # 3. Build LLM prompt (use ranked OCR)
-        prompt = build_llm_prompt(goal, agent_state['actions_taken'], ocr_for_action)
-        agent_state['llm_prompt'] = prompt
-        # 4. Call LLM
-        llm_response = call_llm(prompt, img_b64)
-        agent_state['llm_response'] = llm_response
-        print(f"[LLM Prompt]:\n{prompt}\n[LLM Response]:\n{llm_response}")
-        # 5. Parse LLM response
-        action = parse_llm_response(llm_response)
-        agent_state['actions_taken'].append(action)
-        # 6. Execute action
-        if action['action'] == 'done':
-            agent_state['status'] = 'done'
-            agent_state['message'] = 'Goal achieved.'
-            print("[Agent] Goal achieved!")
-            break
-        elif action['action'] == 'ask':
-            agent_state['status'] = 'ask'
-            agent_state['message'] = action.get('message', 'Agent is stuck or needs clarification.')
-            print(f"[Agent] {agent_state['message']}")
-            break
+def select_relevant_ocr_elements(goal, ocr_annotations, image_b64, image_mime="image/jpeg"):
+    """
+    Use an LLM to select and rank the most relevant OCR elements for the given goal.
+    Returns a ranked list of OCR elements (subset of ocr_annotations, possibly reordered).
+    """
+    response = openai_client.chat.completions.create(
+        model="gpt-4o",
+        messages=vision_messages(SELECTOR_SYSTEM_PROMPT, build_selector_prompt(goal, ocr_annotations), image_b64, image_mime),
+        temperature=0.2,
+        max_tokens=512
+    )
+    llm_usage.record('selector', response.usage)
+    return parse_selector_response(response.choices[0].message.content.strip())
+
+async def select_relevant_ocr_elements_async(goal, ocr_annotations, image_b64, image_mime="image/jpeg"):
+    """select_relevant_ocr_elements on the async client (the llm ranker of the async engine)"""
+    response = await async_openai_client.chat.completions.create(
+        model="gpt-4o",
+        messages=vision_messages(SELECTOR_SYSTEM_PROMPT, build_selector_prompt(goal, ocr_annotations), image_b64, image_mime),
+        temperature=0.2,
+        max_tokens=512
+    )
+    llm_usage.record('selector', response.usage)
+    return parse_selector_response(response.choices[0].message.content.strip())
+
+def action_stands(action, ranked_ocr):
+    """
+    Reconcile a speculative action (chosen from the full OCR list) with the
+    selector's ranking: it stands unless it clicks text the ranking dropped.
+    """
+    if action.get('action') != 'click_text' or not ranked_ocr:
+        return True
+    target = ' '.join(str(action.get('target', '')).lower().split())
+    return any(' '.join(ann['text'].lower().split()) == target for ann in ranked_ocr)
+
+def replayable(action, ocr_annotations):
+    """A recorded action can be replayed unless it clicks text that is not on the current screen"""
+    if action.get('action') != 'click_text':
+        return True
+    return bool(ocr_annotations) and action_stands(action, ocr_annotations)
+
+def capture_step(session, detector):
+    """Blocking half of perception: grab a fresh frame, encode it for the LLM and diff it against the last OCR'd frame"""
+    frame = grab_screen(session.frame_bus)
+    # One capture, many encodings: downscaled JPEG for the LLM, stream JPEG for the UI
+    img_b64 = frame.encodings.llm_image_b64()
+    return frame, img_b64, detector.compare(frame)
+
+def frame_views(frame):
+    """The UI's stream JPEG and the trajectory fingerprint of a frame"""
+    return frame.encodings.stream_jpeg_b64(), trajectory_fingerprint(frame.encodings.stream_gray())
+
+async def perceive(session, detector, incremental, cached_perception, timing):
+    """
+    Capture and OCR the screen for one step. Returns
+    (frame, img_b64, screen_text, ocr_annotations, ranked_ocr, ocr_mode), where
+    ranked_ocr is None when the OCR result is new and still has to be ranked.
+    """
+    with timing.stage('capture'):
+        frame, img_b64, change = await asyncio.to_thread(capture_step, session, detector)
+    if cached_perception is not None and not change.changed:
+        # Screen is effectively identical to the last OCR'd frame: skip OCR and the selector LLM
+        print(f"[Agent] Screen unchanged ({change.changed_fraction:.1%} tiles differ), reusing cached OCR")
+        screen_text, ocr_annotations, ranked_ocr = cached_perception
+        return frame, img_b64, screen_text, ocr_annotations, ranked_ocr, 'cached'
+    # OCR only the dirty tiles when possible
+    with timing.stage('ocr'):
+        screen_text, ocr_annotations, ocr_mode = await ocr_screen_incremental(frame, change, incremental)
+        # Index the texts for click_text now, off the dispatch path
+        await asyncio.to_thread(text_index_for, ocr_annotations)
+    detector.accept(change)
+    return frame, img_b64, screen_text, ocr_annotations, None, ocr_mode
+
+async def settle(session, timing):
+    """
+    Wait for the UI to react to the last action: until the session's screen
+    is stable, or AGENT_STEP_DELAY when adaptive settling is off. The wait
+    is recorded as the step's settle_wait metric.
+    """
+    with timing.stage('settle'):
+        if session.settle is None:
+            await asyncio.sleep(AGENT_STEP_DELAY)
+            timing.metric('settle_wait', AGENT_STEP_DELAY)
+            return
+        result = await asyncio.to_thread(session.settle.wait)
+    timing.metric('settle_wait', result.waited)
+    if not result.stable:
+        print(f"[Agent] Screen still changing after {result.waited:.1f}s, continuing")
+
+async def settle_and_perceive(session, detector, incremental, cached_perception, timing):
+    """Wait for the UI to react to the last action, then perceive (runs ahead in the pipelined loop)"""
+    await settle(session, timing)
+    return await perceive(session, detector, incremental, cached_perception, timing)
+
+async def timed(timing, stage, awaitable):
+    with timing.stage(stage):
+        return await awaitable
+
+async def choose_action(goal, actions_taken, ocr_annotations, ranked_ocr, img_b64, timing, ranker, pipelined=False, report=None):
+    """
+    Rank the OCR elements (unless cached) and ask the LLM for the next action.
+    When pipelined with a remote (LLM) ranker, ranking and a speculative
+    action call on the unranked list run concurrently; the speculative action
+    is kept if it is consistent with the ranking, otherwise the action call is
+    repeated. Returns (action, compiled prompt, llm_response, ranked_ocr).
+    """
+    if ranked_ocr is None and pipelined and ranker.remote:
+        speculative_prompt = compile_llm_prompt(goal, actions_taken, ocr_annotations)
+        ranked_ocr, (action, llm_response) = await asyncio.gather(
+            timed(timing, 'select', ranker.arank(goal, ocr_annotations, actions_taken, img_b64)),
+            request_action(speculative_prompt.text, img_b64, timing)
+        )
+        if action_stands(action, ranked_ocr):
+            report.speculation_hits += 1
+            return action, speculative_prompt, llm_response, ranked_ocr
+        report.speculation_misses += 1
+        print(f"[Agent] Speculative action {action} conflicts with the ranked OCR, asking again")
+    elif ranked_ocr is None:
+        # Select and rank relevant OCR elements (local lexical ranker, or the middleman LLM)
+        with timing.stage('select'):
+            ranked_ocr = await ranker.arank(goal, ocr_annotations, actions_taken, img_b64)
+    # Build the LLM prompt (use ranked OCR) and call the LLM
+    prompt = compile_llm_prompt(goal, actions_taken, ranked_ocr or ocr_annotations)
+    action, llm_response = await request_action(prompt.text, img_b64, timing)
+    return action, prompt, llm_response, ranked_ocr
+
+async def run_agent(goal, max_steps=20, pipelined=AGENT_PIPELINED, session=None):
+    """
+    The perception-action loop as a coroutine on the agent engine. Every wait
+    (Vision, gpt-4o, settle delays) is an await, so cancelling the task stops
+    the run mid-request. Capture, input and state belong to the session.
+    """
+    session = session or sessions.default
+    state = session.state
+    state['goal'] = goal
+    state['actions_taken'] = []
+    state['step'] = 0
+    state['status'] = 'running'
+    state['message'] = ''
+    state['stop_requested'] = False
+    state['frame_cache_hits'] = 0
+    state['frame_cache_misses'] = 0
+    state['replayed_steps'] = 0
+    # Frame change detection: OCR and element ranking are reused while the screen stays the same
+    detector = FrameChangeDetector(
+        tile_size=FRAME_DIFF_TILE_SIZE,
+        pixel_threshold=FRAME_DIFF_PIXEL_THRESHOLD,
+        change_threshold=FRAME_CHANGE_THRESHOLD
+    )
+    incremental = IncrementalOCR(margin=INCREMENTAL_OCR_MARGIN, max_dirty_fraction=INCREMENTAL_OCR_MAX_DIRTY)
+    cached_perception = None
+    action_index = action_index_source = None  # click_text index of the elements the action was chosen from
+    ranker = create_ranker(OCR_RANKER, select_relevant_ocr_elements, select_relevant_ocr_elements_async)
+    state['ranker'] = ranker.name
+    recorder = SessionRecorder(AGENT_RECORD_DIR) if AGENT_RECORD_DIR else None
+    trajectory = []  # (actions_taken, fingerprint, action) of this run, stored if it succeeds
+    # Pipelined mode: selector and a speculative action call run concurrently, and the
+    # next step's capture/OCR starts as soon as the action has been executed
+    report = PipelineReport('pipelined' if pipelined else 'serial')
+    state['pipeline'] = report.to_dict()
+    next_perception = None  # (timing, task) started at the end of the previous step
+    print(f"[Agent] Starting autorun perception-action loop for goal: {goal} ({report.mode}, session {session.id})")
+    try:
+        for step in range(max_steps):
+            if state['stop_requested']:
+                state['status'] = 'stopped'
+                state['message'] = 'Agent loop stopped by user.'
+                print("[Agent] Agent loop stopped by user.")
+                break
+            state['step'] = step
+            # 1-2. Capture and OCR the screen
+            if next_perception is not None:
+                timing, task = next_perception
+                next_perception = None
+                perception = await task
+            else:
+                timing = StepTiming(step)
+                timing.start()
+                perception = await perceive(session, detector, incremental, cached_perception, timing)
+            frame, img_b64, screen_text, ocr_annotations, ranked_ocr, ocr_mode = perception
+            stream_b64, fingerprint = await asyncio.to_thread(frame_views, frame)
+            state['screen_b64'] = stream_b64
+            state['ocr_mode'] = ocr_mode
+            if ocr_mode == 'cached':
+                state['frame_cache_hits'] += 1
+            else:
+                state['frame_cache_misses'] += 1
+            state['screen_ocr'] = screen_text
+            state['ocr_annotations'] = ocr_annotations
+            if ocr_cache is not None and ocr_mode != 'cached':
+                state['ocr_cache'] = await asyncio.to_thread(ocr_cache.stats)
+            # Debug: Show OCR results
+            print(f"[Agent] OCR found {len(ocr_annotations)} clickable elements")
+            if ocr_annotations:
+                print("[Agent] Top 5 OCR elements:")
+                for i, ann in enumerate(ocr_annotations[:5]):
+                    merged_info = f" (merged from {ann['merged_from']} words)" if 'merged_from' in ann else ""
+                    print(f"  {i+1}. '{ann['text']}' at ({ann['x']}, {ann['y']}){merged_info}")
+            # 2.5-4. Replay a recorded decision for this exact situation, else rank OCR and ask the LLM
+            replay = None
+            if trajectory_cache is not None:
+                with timing.stage('replay'):
+                    replay = await asyncio.to_thread(trajectory_cache.lookup, goal, state['actions_taken'], fingerprint)
+                if replay is not None and not replayable(replay, ocr_annotations):
+                    print(f"[Agent] Recorded action {replay} does not fit the screen, falling back to the LLM")
+                    replay = None
+            if replay is not None:
+                action, prompt, llm_response = replay, None, '(replayed from trajectory cache)'
+                state['replayed_steps'] += 1
+                print(f"[Agent] Screen matches a recorded run, replaying {action}")
+            else:
+                action, prompt, llm_response, ranked_ocr = await choose_action(
+                    goal, state['actions_taken'], ocr_annotations, ranked_ocr, img_b64, timing, ranker, pipelined, report
+                )
+            trajectory.append((state['actions_taken'], fingerprint, action))
+            cached_perception = (screen_text, ocr_annotations, ranked_ocr)
+            ocr_for_action = ranked_ocr if ranked_ocr else ocr_annotations
+            if ocr_for_action is not action_index_source:
+                # Index a new ranked list once; reused while the screen stays the same (an OCRFrame's is memoized)
+                action_index = await asyncio.to_thread(text_index_for, ocr_for_action)
+                action_index_source = ocr_for_action
+            # 5. Execute the action first; bookkeeping below must not delay dispatch
+            if action['action'] not in ('done', 'ask'):
+                with timing.stage('execute'):
+                    # Input injection blocks (pyautogui sleeps); a cancel lets the current action finish
+                    focus_wait = await asyncio.to_thread(execute_steps, [action], action_index, session.display,
+                                                         session.settle)
+                if focus_wait:
+                    timing.metric('focus_wait', focus_wait)
+                if pipelined:
+                    # Run ahead: next capture/OCR settles and starts while this step wraps up
+                    next_timing = StepTiming(step + 1)
+                    next_timing.start()
+                    next_perception = (next_timing, asyncio.create_task(
+                        settle_and_perceive(session, detector, incremental, cached_perception, next_timing)
+                    ))
+            if ranked_ocr:
+                state['ranked_ocr'] = ranked_ocr
+            state['llm_prompt'] = f"{ACTION_SYSTEM_PROMPT}\n---\n{prompt.text}" if prompt else ''
+            state['llm_response'] = llm_response
+            if prompt:
+                state['prompt_tokens'] = prompt.report()
+            print(f"[LLM Prompt]:\n{prompt.text if prompt else ''}\n[LLM Response]:\n{llm_response}")
+            if recorder is not None:
+                await asyncio.to_thread(recorder.record, step, goal, state['actions_taken'], ocr_annotations, img_b64, action)
+            # 6. Record the parsed action (a new list, so the state store sees the change)
+            state['actions_taken'] = state['actions_taken'] + [action]
+            if action['action'] == 'done':
+                state['status'] = 'done'
+                state['message'] = 'Goal achieved.'
+                print("[Agent] Goal achieved!")
+                if trajectory_cache is not None:
+                    await asyncio.to_thread(trajectory_cache.record_run, goal, trajectory)
+            elif action['action'] == 'ask':
+                state['status'] = 'ask'
+                state['message'] = action.get('message', 'Agent is stuck or needs clarification.')
+                print(f"[Agent] {state['message']}")
+            elif not pipelined:
+                await settle(session, timing)
+            timing.finish()
+            summary = report.add(timing)
+            state['pipeline'] = report.to_dict()
+            print(f"[Agent] Step {step} took {summary['wall_s']}s (stages {summary['serial_s']}s, saved {summary['saved_s']}s)")
+            if action['action'] in ('done', 'ask'):
+                break
         else:
-            execute_steps([action], ocr_for_action)
-        time.sleep(1)
-    else:
-        agent_state['status'] = 'max_steps'
-        agent_state['message'] = 'Reached maximum number of steps.'
-        print("[Agent] Reached maximum number of steps.")
-
-def get_agent_state():
-    """Return the current agent state for the web UI."""
-    return agent_state
-
-def stop_agent_loop():
-    """Stop the currently running agent loop."""
-    agent_state['stop_requested'] = True
+            state['status'] = 'max_steps'
+            state['message'] = 'Reached maximum number of steps.'
+            print("[Agent] Reached maximum number of steps.")
+    except asyncio.CancelledError:
+        state['status'] = 'stopped'
+        state['message'] = 'Agent loop stopped by user.'
+        print("[Agent] Agent loop cancelled mid-step.")
+        raise
+    finally:
+        if next_perception is not None:
+            next_perception[1].cancel()
+    return state['status']
+
+def warm_ocr(wait=False):
+    """Start the OCR engine's workers; called from the entry points, never at import"""
+    ocr_engine.warm(wait)
+
+def start_agent_loop(goal, max_steps=20, pipelined=AGENT_PIPELINED, session_id=DEFAULT_SESSION):
+    """Start a run in a session on the agent engine and return at once (a run already in progress there is cancelled)"""
+    session = sessions.get(session_id)
+    if session is None:
+        raise KeyError(f"Unknown session: {session_id}")
+    warm_ocr()
+    return engine.submit(run_agent(goal, max_steps, pipelined, session), key=session.id)
+
+def agent_autorun(goal, max_steps=20, pipelined=AGENT_PIPELINED, session_id=DEFAULT_SESSION):
+    """Blocking entry point (CLI): run the loop on the agent engine and wait for it to finish"""
+    future = start_agent_loop(goal, max_steps, pipelined, session_id)
+    try:
+        future.result()
+    except KeyboardInterrupt:
+        future.cancel()
+        raise
+    except CancelledError:
+        pass  # stopped through stop_agent_loop
+
+def get_agent_state(fields=None, inline_blobs=True, session_id=DEFAULT_SESSION):
+    """Return the current state of a session for the web UI (OCR frames serialized to dicts), or None for an unknown session."""
+    session = sessions.get(session_id)
+    if session is None:
+        return None
+    return session.state.snapshot(fields, inline_blobs=inline_blobs)[1]
+
+def stop_agent_loop(session_id=DEFAULT_SESSION):
+    """Stop the agent loop of a session, interrupting any request it is waiting on."""
+    session = sessions.get(session_id)
+    if session is None:
+        return False
+    session.state['stop_requested'] = True
+    engine.cancel(session.id)
     return True
 
+def close_session(session_id):
+    """Stop a session's run and release its display"""
+    stop_agent_loop(session_id)
+    return sessions.remove(session_id)
+
 def get_current_mouse_position():
     """Get current mouse position for debugging"""
     import pyautogui
@@ -524,13 +798,14 @@ def test_coordinate_mapping():
     print("=== COORDINATE MAPPING TEST ===")
     
     # Capture screen
-    img_bytes, img_b64 = capture_screen()
+    frame = grab_screen()
+    img_bytes, img_b64 = encode_screenshot(frame)
     
     # Get current mouse position
     mouse_x, mouse_y = get_current_mouse_position()
     
     # Perform OCR
-    screen_text, ocr_annotations = ocr_screen_with_coordinates(img_bytes)
+    screen_text, ocr_annotations = ocr_screen_with_coordinates(img_bytes, frame)
     
     print(f"\n[Debug] OCR found {len(ocr_annotations)} text elements:")
     for i, ann in enumerate(ocr_annotations[:5]):  # Show first 5
@@ -550,4 +825,4 @@ if __name__ == "__main__":
     user_goal = input("Enter your goal: ")
     agent_autorun(user_goal)
     print("\nFinal agent state:")
-    print(json.dumps(agent_state, indent=2)) 
\ No newline at end of file
+    print(json.dumps(get_agent_state(), indent=2)) 
\ No newline at end of file
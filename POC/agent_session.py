@@ -0,0 +1,194 @@
+"""
+Agent sessions: isolated agents side by side in one process.
+
+Each AgentSession has its own versioned state (goal, screenshots, actions,
+stop flag), its own frame bus and an X display for capture and input. The
+'default' session drives the host display, exactly as before. Other
+sessions get a display of their own: either one the caller names, or an
+Xvfb server the manager starts for the session and stops with it. Runs on
+different displays never fight over the mouse and keyboard, so throughput
+scales with cores instead of being fixed at one desktop.
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+
+from frame_bus import FrameBus, frame_bus
+from screen_capture import ScreenCapture
+
+DEFAULT_SESSION = 'default'
+
+
+class XvfbDisplay:
+    """An Xvfb server on its own display number, started and stopped with a session"""
+
+    def __init__(self, number, screen='1920x1080x24'):
+        self.number = number
+        self.name = f':{number}'
+        self.screen = screen
+        self.process = None
+
+    def start(self, timeout=5.0):
+        if shutil.which('Xvfb') is None:
+            raise RuntimeError("Xvfb is not installed; cannot start a virtual display")
+        self.process = subprocess.Popen(
+            ['Xvfb', self.name, '-screen', '0', self.screen, '-nolisten', 'tcp'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        # The server is ready once its socket exists
+        socket_path = f'/tmp/.X11-unix/X{self.number}'
+        deadline = time.monotonic() + timeout
+        while not os.path.exists(socket_path):
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Xvfb {self.name} exited with code {self.process.returncode}")
+            if time.monotonic() > deadline:
+                self.stop()
+                raise RuntimeError(f"Xvfb {self.name} did not start within {timeout}s")
+            time.sleep(0.05)
+        print(f"[Sessions] Started Xvfb on {self.name} ({self.screen})")
+
+    def stop(self):
+        if self.process is None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.process = None
+        print(f"[Sessions] Stopped Xvfb on {self.name}")
+
+
+def display_in_use(number):
+    return os.path.exists(f'/tmp/.X11-unix/X{number}') or os.path.exists(f'/tmp/.X{number}-lock')
+
+
+class AgentSession:
+    def __init__(self, session_id, state, display=None, bus=None, xvfb=None, settle_factory=None):
+        self.id = session_id
+        self.state = state            # VersionedState of this session only
+        self.display = display        # X display for capture and input; None is the host display
+        self.frame_bus = bus or FrameBus(ScreenCapture(display=display))
+        self.xvfb = xvfb              # XvfbDisplay owned by this session, if any
+        # Waits for this display to settle after an action; None means fixed sleeps
+        self.settle = settle_factory(self.frame_bus) if settle_factory else None
+        self.created = time.time()
+
+    def to_dict(self):
+        return {
+            'session_id': self.id,
+            'display': self.display,
+            'xvfb': self.xvfb is not None,
+            'status': self.state.get('status'),
+            'goal': self.state.get('goal'),
+            'step': self.state.get('step'),
+            'created': self.created,
+        }
+
+    def close(self):
+        # mss handles hold connections to the display; close them before its server goes away
+        self.frame_bus.capture.close()
+        if self.xvfb is not None:
+            self.xvfb.stop()
+
+
+class SessionManager:
+    def __init__(self, state_factory, max_sessions=8, xvfb=False, display_base=99, screen='1920x1080x24',
+                 settle_factory=None):
+        self.state_factory = state_factory   # () -> fresh VersionedState
+        self.settle_factory = settle_factory # frame bus -> SettleDetector (or None)
+        self.max_sessions = max_sessions
+        self.xvfb = xvfb                     # start an Xvfb for sessions created without a display
+        self.display_base = display_base
+        self.screen = screen
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._reserved = set()               # displays of sessions still being created (Xvfb starting)
+        # The host display, shared with the desktop stream
+        self._sessions[DEFAULT_SESSION] = AgentSession(DEFAULT_SESSION, state_factory(), bus=frame_bus,
+                                                      settle_factory=settle_factory)
+
+    @property
+    def default(self):
+        return self._sessions[DEFAULT_SESSION]
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id or DEFAULT_SESSION)
+
+    def sessions(self):
+        with self._lock:
+            return list(self._sessions.values())
+
+    def _free_display(self):
+        taken = {session.xvfb.number for session in self._sessions.values() if session.xvfb is not None}
+        number = self.display_base
+        while number in taken or f':{number}' in self._reserved or display_in_use(number):
+            number += 1
+        return number
+
+    def create(self, display=None, xvfb=None):
+        """
+        Create a session on the given display, or on a new Xvfb display when
+        xvfb is set (defaults to the manager's setting). RuntimeError when
+        the session limit is reached, the display cannot be started or
+        xdotool (the input backend of a session display) is not installed.
+        """
+        xvfb = self.xvfb if xvfb is None else xvfb
+        if (display is not None or xvfb) and shutil.which('xdotool') is None:
+            raise RuntimeError("xdotool is not installed; cannot send input to a session display")
+        server = None
+        with self._lock:
+            if len(self._sessions) + len(self._reserved) >= self.max_sessions:
+                raise RuntimeError(f"Session limit reached ({self.max_sessions})")
+            if display is not None and (display in self._reserved or
+                                        any(session.display == display for session in self._sessions.values())):
+                raise RuntimeError(f"Display {display} is already bound to a session")
+            if display is None and xvfb:
+                server = XvfbDisplay(self._free_display(), self.screen)
+                display = server.name
+            if display is not None:
+                # Reserve the display; Xvfb starts outside the lock so lookups are not held up meanwhile
+                self._reserved.add(display)
+        try:
+            if server is not None:
+                server.start()
+            session = AgentSession(uuid.uuid4().hex[:12], self.state_factory(), display, xvfb=server,
+                                   settle_factory=self.settle_factory)
+            with self._lock:
+                self._sessions[session.id] = session
+        except Exception:
+            if server is not None:
+                server.stop()
+            raise
+        finally:
+            with self._lock:
+                self._reserved.discard(display)
+        print(f"[Sessions] Created session {session.id} on display {display or 'host'}")
+        return session
+
+    def remove(self, session_id):
+        """Forget a session and stop its Xvfb; the default session cannot be removed"""
+        if session_id == DEFAULT_SESSION:
+            raise ValueError("The default session cannot be removed")
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+        return session
+
+    def find_blob(self, digest):
+        """A content-addressed blob from any session's state"""
+        for session in self.sessions():
+            blob = session.state.blob(digest)
+            if blob is not None:
+                return blob
+        return None
+
+    def close(self):
+        for session in self.sessions():
+            session.close()
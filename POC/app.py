@@ -1,5 +1,5 @@
-from flask import Flask, render_template, request, jsonify, session
-from flask_socketio import SocketIO, emit
+from flask import Flask, render_template, request, jsonify, session, Response
+from flask_socketio import SocketIO, emit, join_room
 import uuid
 from prompt_agent import get_command_steps, get_opposite_command_steps
 from desktop_actions import execute_steps
@@ -9,81 +9,171 @@ import threading
 import time
 import base64
 import io
-import mss
-from PIL import Image
-from agent_loop import agent_autorun, get_agent_state, agent_state, stop_agent_loop
+from desktop_stream import StreamSession
+from agent_loop import start_agent_loop, get_agent_state, stop_agent_loop, close_session, sessions, ocr_cache, trajectory_cache, engine
+from agent_session import DEFAULT_SESSION
+from llm_usage import llm_usage
+from job_queue import JobScheduler, QueueFull
+from config import JOB_QUEUE_MAX, JOB_CONCURRENCY_PER_DISPLAY
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here' # left blank is for now
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+# Agent goals wait here for their display to be free instead of all starting at once
+jobs = JobScheduler(
+    run_fn=lambda job: start_agent_loop(job.goal, session_id=job.session_id),
+    cancel_fn=lambda job: stop_agent_loop(job.session_id),
+    max_queued=JOB_QUEUE_MAX,
+    per_display=JOB_CONCURRENCY_PER_DISPLAY
+)
+
 # Store command history and status (legacy, not used in new agentic mode)
 command_history = {}
 
-# Desktop streaming variables
-desktop_streaming = False
-desktop_stream_thread = None
+# Desktop streaming variables: per agent session, one StreamSession per viewing client
+desktop_stream_sessions = {}   # agent session id -> {sid: StreamSession}
+desktop_stream_lock = threading.Lock()
+desktop_stream_threads = {}    # agent session id -> streaming worker
 
-def capture_desktop():
-    """Capture desktop screenshot and return as base64 encoded image"""
-    try:
-        with mss.mss() as sct:
-            # Capture the entire screen (monitor 1)
-            monitor = sct.monitors[1]
-            screenshot = sct.grab(monitor)
-            
-            # Convert to PIL Image
-            img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
-            
-            # Resize image for better performance (max width 1280)
-            width, height = img.size
-            if width > 1280:
-                ratio = 1280 / width
-                new_height = int(height * ratio)
-                img = img.resize((1280, new_height), Image.Resampling.LANCZOS)
-            
-            # Convert to base64
-            buffer = io.BytesIO()
-            img.save(buffer, format='JPEG', quality=85, optimize=True)
-            img_str = base64.b64encode(buffer.getvalue()).decode()
-            
-            return img_str
-    except Exception as e:
-        print(f"Error capturing desktop: {e}")
-        return None
+def desktop_streaming_worker(session):
+    """Background worker streaming one agent session's display, fed by its frame bus; runs while anyone is viewing"""
+    with session.frame_bus.subscribe() as subscription:
+        while True:
+            with desktop_stream_lock:
+                viewers = list(desktop_stream_sessions.get(session.id, {}).values())
+                if not viewers:
+                    desktop_stream_sessions.pop(session.id, None)
+                    desktop_stream_threads.pop(session.id, None)
+                    return
+            try:
+                frame = subscription.next(timeout=1.0)
+                if frame is None:
+                    continue
+                # Each viewer gets the frame at its own rate and quality, or not at all if it is behind
+                for stream in viewers:
+                    message = stream.next_message(frame)
+                    if message is not None:
+                        event, payload = message
+                        payload['session_id'] = session.id
+                        socketio.emit(event, payload, to=stream.sid)
+            except Exception as e:
+                print(f"Desktop streaming error: {e}")
+                time.sleep(1)
 
-def desktop_streaming_worker():
-    """Background worker for desktop streaming"""
-    global desktop_streaming
-    while desktop_streaming:
-        try:
-            screenshot = capture_desktop()
-            if screenshot:
-                socketio.emit('desktop_frame', {'image': screenshot})
-            time.sleep(0.1)  # 10 FPS
-        except Exception as e:
-            print(f"Desktop streaming error: {e}")
-            time.sleep(1)
+def find_desktop_stream(sid):
+    """(agent session id, StreamSession) this client is viewing, or (None, None)"""
+    with desktop_stream_lock:
+        for session_id, viewers in desktop_stream_sessions.items():
+            if sid in viewers:
+                return session_id, viewers[sid]
+    return None, None
+
+def end_desktop_stream(sid):
+    with desktop_stream_lock:
+        for viewers in desktop_stream_sessions.values():
+            stream = viewers.pop(sid, None)
+            if stream is not None:
+                return stream
+    return None
+
+def session_id_of(data):
+    """Agent session id sent with a Socket.IO event or API request (the default session when absent)"""
+    return (data or {}).get('session_id') or DEFAULT_SESSION
 
 @socketio.on('start_desktop_stream')
-def handle_start_desktop_stream():
-    """Start desktop streaming"""
-    global desktop_streaming, desktop_stream_thread
-    if not desktop_streaming:
-        desktop_streaming = True
-        desktop_stream_thread = threading.Thread(target=desktop_streaming_worker)
-        desktop_stream_thread.daemon = True
-        desktop_stream_thread.start()
-        emit('desktop_stream_status', {'status': 'started'})
-        print("[Desktop Stream] Started desktop streaming")
+def handle_start_desktop_stream(data=None):
+    """Start streaming an agent session's display to this client"""
+    session = sessions.get(session_id_of(data))
+    if session is None:
+        emit('desktop_stream_status', {'status': 'error', 'error': 'Unknown session', 'session_id': session_id_of(data)})
+        return
+    viewing, stream = find_desktop_stream(request.sid)
+    if viewing != session.id:
+        # Switching sessions (or starting): a fresh stream needs a keyframe anyway
+        end_desktop_stream(request.sid)
+        stream = None
+    with desktop_stream_lock:
+        if stream is None:
+            desktop_stream_sessions.setdefault(session.id, {})[request.sid] = StreamSession(request.sid)
+        else:
+            # Restarting viewer needs a full frame to composite deltas onto
+            stream.request_keyframe()
+        if session.id not in desktop_stream_threads:
+            thread = threading.Thread(target=desktop_streaming_worker, args=(session,))
+            thread.daemon = True
+            desktop_stream_threads[session.id] = thread
+            thread.start()
+    emit('desktop_stream_status', {'status': 'started', 'session_id': session.id})
+    print(f"[Desktop Stream] Started desktop streaming of session {session.id} for {request.sid}")
 
 @socketio.on('stop_desktop_stream')
-def handle_stop_desktop_stream():
-    """Stop desktop streaming"""
-    global desktop_streaming
-    desktop_streaming = False
-    emit('desktop_stream_status', {'status': 'stopped'})
-    print("[Desktop Stream] Stopped desktop streaming")
+def handle_stop_desktop_stream(data=None):
+    """Stop desktop streaming for this client"""
+    session_id, _ = find_desktop_stream(request.sid)
+    end_desktop_stream(request.sid)
+    emit('desktop_stream_status', {'status': 'stopped', 'session_id': session_id or session_id_of(data)})
+    print(f"[Desktop Stream] Stopped desktop streaming for {request.sid}")
+
+@socketio.on('desktop_ack')
+def handle_desktop_ack(data):
+    """Client finished compositing a stream message"""
+    _, stream = find_desktop_stream(request.sid)
+    if stream is not None and data and 'seq' in data:
+        stream.ack(data['seq'])
+
+@socketio.on('request_keyframe')
+def handle_request_keyframe(data=None):
+    """Client lost sync with the delta stream"""
+    _, stream = find_desktop_stream(request.sid)
+    if stream is not None:
+        stream.request_keyframe()
+
+# Agent state push: clients in a session's room receive versioned diffs as its state changes
+agent_state_pusher_threads = {}   # agent session id -> pusher thread
+agent_state_pusher_lock = threading.Lock()
+
+def agent_state_room(session_id):
+    return f'agent_state:{session_id}'
+
+def agent_state_pusher(session):
+    """Background worker that pushes only the changed fields of one session's state, blobs by reference"""
+    state = session.state
+    pushed = state.version
+    while sessions.get(session.id) is session:
+        if not state.wait(pushed, timeout=30):
+            continue
+        # Coalesce a burst of field updates from one step into a single diff
+        time.sleep(0.05)
+        version, changes = state.snapshot(since=pushed, inline_blobs=False)
+        socketio.emit('agent_state_diff', {'session_id': session.id, 'version': version,
+                                           'base_version': pushed, 'changes': changes},
+                      to=agent_state_room(session.id))
+        pushed = version
+    with agent_state_pusher_lock:
+        agent_state_pusher_threads.pop(session.id, None)
+
+@socketio.on('subscribe_agent_state')
+def handle_subscribe_agent_state(data=None):
+    """Join a session's agent state room and catch up from the client's version (0 for the full state)"""
+    session = sessions.get(session_id_of(data))
+    if session is None:
+        emit('agent_state_error', {'session_id': session_id_of(data), 'error': 'Unknown session'})
+        return
+    state = session.state
+    since = int((data or {}).get('version') or 0)
+    if since > state.version:
+        # Client state predates a server restart
+        since = 0
+    join_room(agent_state_room(session.id))
+    with agent_state_pusher_lock:
+        if session.id not in agent_state_pusher_threads:
+            thread = threading.Thread(target=agent_state_pusher, args=(session,))
+            thread.daemon = True
+            agent_state_pusher_threads[session.id] = thread
+            thread.start()
+    version, changes = state.snapshot(since=since, inline_blobs=False)
+    emit('agent_state_diff', {'session_id': session.id, 'version': version, 'base_version': since, 'changes': changes})
 
 @socketio.on('connect')
 def handle_connect():
@@ -91,6 +181,7 @@ def handle_connect():
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    end_desktop_stream(request.sid)
     print(f"[SocketIO] Client disconnected: {request.sid}")
 
 @app.route('/')
@@ -103,29 +194,204 @@ def process_command():
     try:
         data = request.json
         user_input = data.get('command', '')
-        # Start the agent loop in a background thread
-        def run_agent():
-            agent_autorun(user_input)
-        thread = threading.Thread(target=run_agent)
-        thread.start()
-        return jsonify({'status': 'agentic_loop_started'})
+        session = sessions.get(session_id_of(data))
+        if session is None:
+            return jsonify({'error': f'Unknown session: {session_id_of(data)}'}), 404
+        try:
+            priority = int(data.get('priority', 0))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'priority must be an integer'}), 400
+        # Queue the goal; it runs on the agent engine once its display is free
+        try:
+            job = jobs.submit(user_input, session.id, session.display, priority)
+        except QueueFull as e:
+            response = jsonify({'error': str(e), 'queue_depth': e.depth,
+                                'position_hint': e.position_hint, 'retry_after_s': e.retry_after})
+            response.headers['Retry-After'] = str(int(e.retry_after) + 1)
+            return response, 429
+        status = jobs.get(job.id)
+        return jsonify({'status': 'agentic_loop_started' if status['state'] == 'running' else 'queued',
+                        'job_id': job.id, 'position': status['position'], 'session_id': session.id})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/agent/state', methods=['GET'])
 def get_agentic_state():
-    # Return the current agent state for the web UI
-    return jsonify(get_agent_state())
+    # Return the current agent state for the web UI and headless monitors.
+    #   ?fields=status,step   only these fields (the ETag then tracks only them)
+    #   ?blobs=ref            screenshot/prompt as {blob, url, bytes} instead of inline
+    #   If-None-Match         304 when nothing in the projection changed
+    #   ?wait=25              with If-None-Match, long-poll up to 25s for a change
+    #   ?session_id=...       another agent session than the default one
+    session = sessions.get(session_id_of(request.args))
+    if session is None:
+        return jsonify({'error': 'Unknown session'}), 404
+    state = session.state
+    fields = request.args.get('fields')
+    fields = [field for field in fields.split(',') if field] if fields else None
+    inline_blobs = request.args.get('blobs', 'inline') != 'ref'
+    try:
+        wait = min(float(request.args.get('wait', 0)), 60.0)
+    except ValueError:
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+    known = None
+    for tag in request.if_none_match.as_set():
+        if tag.isdigit():
+            known = int(tag)
+    if known is not None and known > state.field_version(fields):
+        # Client ETag predates a server restart
+        known = None
+    if known is not None and wait > 0:
+        state.wait(known, fields, timeout=wait)
+    version = state.field_version(fields)
+    if known is not None and version <= known:
+        response = Response(status=304)
+    else:
+        response = jsonify(get_agent_state(fields, inline_blobs, session.id))
+    response.set_etag(str(version))
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/agent/blob/<digest>', methods=['GET'])
+def get_agent_blob(digest):
+    # Content-addressed screenshot/prompt/OCR text referenced from any session's state
+    blob = sessions.find_blob(digest)
+    if blob is None:
+        return jsonify({'error': 'Unknown or expired blob'}), 404
+    data, mimetype = blob
+    response = Response(data, mimetype=mimetype)
+    response.set_etag(digest)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 @app.route('/api/agent/stop', methods=['POST'])
 def stop_agentic_loop():
-    # Stop the currently running agent loop
+    # Stop the agent loop of a session (the default one unless session_id is given)
     try:
-        stop_agent_loop()
-        return jsonify({'status': 'stopped'})
+        session_id = session_id_of(request.get_json(silent=True))
+        if not stop_agent_loop(session_id):
+            return jsonify({'error': f'Unknown session: {session_id}'}), 404
+        return jsonify({'status': 'stopped', 'session_id': session_id})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    # Queued, running and recently finished jobs (queued ones with their position)
+    return jsonify(jobs.jobs())
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    # Drop a queued job, or stop a running one
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>', methods=['PATCH'])
+def reprioritize_job(job_id):
+    # {"priority": 5}: higher priorities run first; only queued jobs can move
+    data = request.get_json(silent=True) or {}
+    try:
+        priority = int(data['priority'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'priority must be an integer'}), 400
+    job = jobs.reprioritize(job_id, priority)
+    if job is None:
+        return jsonify({'error': 'Job is not queued'}), 409 if jobs.get(job_id) else 404
+    return jsonify(job)
+
+@app.route('/api/sessions', methods=['GET'])
+def list_sessions():
+    # All agent sessions with their display, status and goal
+    return jsonify([session.to_dict() for session in sessions.sessions()])
+
+@app.route('/api/sessions', methods=['POST'])
+def create_session():
+    # New agent session: {"display": ":5"} binds an existing X display,
+    # {"xvfb": true} starts a virtual one (the AGENT_XVFB default otherwise)
+    data = request.get_json(silent=True) or {}
+    try:
+        session = sessions.create(display=data.get('display'), xvfb=data.get('xvfb'))
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify(session.to_dict()), 201
+
+@app.route('/api/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    # Stop the session's run and release its display
+    try:
+        session = close_session(session_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if session is None:
+        return jsonify({'error': f'Unknown session: {session_id}'}), 404
+    with desktop_stream_lock:
+        # Its streaming worker exits once it has no viewers left
+        desktop_stream_sessions.pop(session_id, None)
+    return jsonify({'status': 'closed', 'session_id': session_id})
+
+@app.route('/api/diagnostics/jobs', methods=['GET'])
+def get_job_metrics():
+    # Queue depth (per display), wait and run times, and submitted/rejected/finished counts
+    return jsonify(jobs.metrics())
+
+@app.route('/api/diagnostics/agent_engine', methods=['GET'])
+def get_agent_engine_stats():
+    # Runs hosted on the async agent engine (running, completed, cancelled, failed)
+    return jsonify(engine.stats())
+
+@app.route('/api/diagnostics/frame_bus', methods=['GET'])
+def get_frame_bus_stats():
+    # Capture producer statistics (subscribers, frames produced, capture cost) per agent session
+    return jsonify({session.id: session.frame_bus.stats() for session in sessions.sessions()})
+
+@app.route('/api/diagnostics/settle', methods=['GET'])
+def get_settle_stats():
+    # Post-action settle waits per agent session (count, timeouts, average wait)
+    return jsonify({session.id: session.settle.stats() if session.settle else {'enabled': False}
+                    for session in sessions.sessions()})
+
+@app.route('/api/diagnostics/desktop_stream', methods=['GET'])
+def get_desktop_stream_stats():
+    # Per-client tier, fps, bitrate, dropped frames and encoder counters of the desktop stream
+    with desktop_stream_lock:
+        viewers = {session_id: list(streams.values()) for session_id, streams in desktop_stream_sessions.items()}
+    return jsonify({session_id: {stream.sid: stream.get_stats() for stream in streams}
+                    for session_id, streams in viewers.items()})
+
+@app.route('/api/diagnostics/ocr_cache', methods=['GET'])
+def get_ocr_cache_stats():
+    # Persistent OCR cache size, hit rate and Vision upload bytes saved (this process and lifetime)
+    if ocr_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify(ocr_cache.stats())
+
+@app.route('/api/diagnostics/trajectories', methods=['GET'])
+def get_trajectory_cache_stats():
+    # Goals and decisions recorded by the trajectory cache
+    if trajectory_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify(trajectory_cache.stats())
+
+@app.route('/api/diagnostics/llm_usage', methods=['GET'])
+def get_llm_usage_stats():
+    # Prompt, completion and prompt-cache (cached) tokens per kind of LLM call
+    return jsonify(llm_usage.stats())
+
+@app.route('/api/diagnostics/system_info', methods=['GET'])
+def get_system_info_stats():
+    # Cache hits and redetections of the system info provider
+    from system_info import system_info_provider
+    return jsonify(system_info_provider.stats())
+
 # (Optional) Legacy endpoints can be removed or left for compatibility
 @app.route('/api/voice_command', methods=['POST'])
 def get_voice():
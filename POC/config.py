@@ -9,3 +9,80 @@ os.environ["AZURE_OPENAI_API_KEY"] = "EK5IkMH9SMXAHwjXAEel9pUr9v1GQ7ncuM0VojoeOn
 
 AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
+
+# Frame change detection: reuse the previous OCR result when the screen is effectively unchanged
+FRAME_DIFF_TILE_SIZE = int(os.getenv("FRAME_DIFF_TILE_SIZE", "64"))
+FRAME_DIFF_PIXEL_THRESHOLD = int(os.getenv("FRAME_DIFF_PIXEL_THRESHOLD", "24"))
+FRAME_CHANGE_THRESHOLD = float(os.getenv("FRAME_CHANGE_THRESHOLD", "0.0"))
+
+# Incremental OCR: re-recognize only the changed tiles instead of the whole screenshot
+INCREMENTAL_OCR = os.getenv("INCREMENTAL_OCR", "1") == "1"
+INCREMENTAL_OCR_MARGIN = int(os.getenv("INCREMENTAL_OCR_MARGIN", "32"))
+INCREMENTAL_OCR_MAX_DIRTY = float(os.getenv("INCREMENTAL_OCR_MAX_DIRTY", "0.3"))
+
+# Pipelined agent loop: overlap next-step capture/OCR with bookkeeping and run a
+# speculative action call alongside the OCR selector
+AGENT_PIPELINED = os.getenv("AGENT_PIPELINED", "0") == "1"
+AGENT_STEP_DELAY = float(os.getenv("AGENT_STEP_DELAY", "1.0"))
+
+# OCR element ranking: "lexical" (local, milliseconds) or "llm" (extra gpt-4o call per step)
+OCR_RANKER = os.getenv("OCR_RANKER", "lexical")
+# Record every agent step (OCR, screenshot, chosen action) here for ranker_benchmark; empty disables
+AGENT_RECORD_DIR = os.getenv("AGENT_RECORD_DIR", "")
+
+# Persistent OCR cache (SQLite, shared by all agent processes); empty path disables it
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", os.path.expanduser("~/.cache/agenticdesktop/ocr_cache.sqlite3"))
+OCR_CACHE_MAX_MB = int(os.getenv("OCR_CACHE_MAX_MB", "256"))
+
+# Trajectory cache: replay actions of successful runs when goal and screen match; empty path disables it
+TRAJECTORY_CACHE_PATH = os.getenv("TRAJECTORY_CACHE_PATH", os.path.expanduser("~/.cache/agenticdesktop/trajectories.sqlite3"))
+TRAJECTORY_MAX_DISTANCE = int(os.getenv("TRAJECTORY_MAX_DISTANCE", "12"))
+
+# Stream action completions and dispatch the action as soon as its JSON object closes
+LLM_STREAMING = os.getenv("LLM_STREAMING", "1") == "1"
+# A dispatched stream is closed at once, so its usage chunk (cached tokens) is lost. The first and every
+# Nth streamed call are instead read to their end in the background to sample usage (0: never; costs the
+# remaining tokens of the sampled calls)
+LLM_USAGE_SAMPLE_EVERY = int(os.getenv("LLM_USAGE_SAMPLE_EVERY", "10"))
+
+# Async agent engine: all runs share one event loop thread; blocking work (capture,
+# encoding, input injection, SQLite) goes to a bounded pool of this many threads
+AGENT_ENGINE_WORKERS = int(os.getenv("AGENT_ENGINE_WORKERS", "8"))
+
+# Agent sessions: independent agents, each on its own X display
+AGENT_MAX_SESSIONS = int(os.getenv("AGENT_MAX_SESSIONS", "8"))
+# Start an Xvfb server for every session created without an explicit display
+AGENT_XVFB = os.getenv("AGENT_XVFB", "0") == "1"
+AGENT_XVFB_DISPLAY_BASE = int(os.getenv("AGENT_XVFB_DISPLAY_BASE", "99"))
+AGENT_XVFB_SCREEN = os.getenv("AGENT_XVFB_SCREEN", "1920x1080x24")
+
+# Job queue behind /api/process_command: goals beyond JOB_QUEUE_MAX waiting get a 429;
+# at most JOB_CONCURRENCY_PER_DISPLAY runs drive one display at a time
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "16"))
+JOB_CONCURRENCY_PER_DISPLAY = int(os.getenv("JOB_CONCURRENCY_PER_DISPLAY", "1"))
+
+# Action prompt token budget: OCR rows are packed in ranked order until it is used up,
+# and all but the last PROMPT_RECENT_ACTIONS actions are folded into a summary
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+PROMPT_RECENT_ACTIONS = int(os.getenv("PROMPT_RECENT_ACTIONS", "5"))
+
+# Adaptive settle: after an action, wait until the screen is stable for SETTLE_STABLE_S
+# (SETTLE_IDLE_S if nothing changed yet), at most SETTLE_TIMEOUT_S. AGENT_SETTLE=0 restores
+# the fixed sleeps (AGENT_STEP_DELAY after each step, 2 s before typing)
+AGENT_SETTLE = os.getenv("AGENT_SETTLE", "1") == "1"
+SETTLE_STABLE_S = float(os.getenv("SETTLE_STABLE_S", "0.3"))
+SETTLE_IDLE_S = float(os.getenv("SETTLE_IDLE_S", "0.6"))
+SETTLE_TIMEOUT_S = float(os.getenv("SETTLE_TIMEOUT_S", "3.0"))
+SETTLE_INTERVAL_S = float(os.getenv("SETTLE_INTERVAL_S", "0.05"))
+
+# OCR engine: "vision" (Google Cloud Vision) or "tesseract" (local CPU, in warm worker processes)
+OCR_ENGINE = os.getenv("OCR_ENGINE", "vision")
+OCR_LOCAL_WORKERS = int(os.getenv("OCR_LOCAL_WORKERS", "1"))
+TESSERACT_LANG = os.getenv("TESSERACT_LANG", "eng")
+# Tesseract reads small UI text better on an enlarged image; words below the confidence are dropped
+TESSERACT_SCALE = float(os.getenv("TESSERACT_SCALE", "2.0"))
+TESSERACT_MIN_CONFIDENCE = float(os.getenv("TESSERACT_MIN_CONFIDENCE", "50"))
+# Tile-parallel local OCR: frames larger than a tile are split across the OCR_LOCAL_WORKERS processes
+# (0 disables; only used with more than one worker). Neighbouring tiles share an OCR_TILE_OVERLAP px strip.
+OCR_TILE_SIZE = int(os.getenv("OCR_TILE_SIZE", "1024"))
+OCR_TILE_OVERLAP = int(os.getenv("OCR_TILE_OVERLAP", "128"))
@@ -1,5 +1,7 @@
 import pyautogui
 import time
+from input_target import input_target
+from text_index import text_index_for
 
 # Only allow simulated keyboard and mouse actions
 # All high-level actions are removed
@@ -8,6 +10,7 @@ import time
 # {"action": "type", "text": "hello world"}
 # {"action": "press", "keys": ["command", "t"]}  # For Cmd+T (new tab on macOS)
 # {"action": "click_text", "target": "text to click"}
+# {"action": "click_text", "target": "OK", "instance": 2}  # Second of several "OK" elements
 
 # Map LLM key names to pyautogui key names
 KEY_MAP = {
@@ -50,67 +53,32 @@ KEY_MAP = {
     # Add more aliases if needed
 }
 
-def find_text_coordinates(target_text, ocr_annotations):
-    """Find coordinates for a text target using OCR annotations"""
+def find_text_match(target_text, ocr_annotations, instance=None):
+    """Best OCR match for a text target as a TextMatch (coordinates, score, confidence), or None"""
     if not ocr_annotations:
         print(f"[Debug] No OCR annotations available for target: '{target_text}'")
-        return None, None
-    
-    target_text = target_text.strip()
-    print(f"[Debug] Looking for target text: '{target_text}'")
-    print(f"[Debug] Available OCR elements: {len(ocr_annotations)}")
-    
-    # Normalize text for comparison (remove extra spaces, lowercase)
-    target_normalized = ' '.join(target_text.lower().split())
-    
-    # Try exact match first
-    for ann in ocr_annotations:
-        ann_text = ann['text'].strip()
-        ann_normalized = ' '.join(ann_text.lower().split())
-        if ann_normalized == target_normalized:
-            print(f"[Debug] Found exact match: '{ann_text}' at ({ann['x']}, {ann['y']})")
-            return ann['x'], ann['y']
-    
-    # Try case-insensitive exact match
-    for ann in ocr_annotations:
-        ann_text = ann['text'].strip()
-        if ann_text.lower() == target_text.lower():
-            print(f"[Debug] Found case-insensitive exact match: '{ann_text}' at ({ann['x']}, {ann['y']})")
-            return ann['x'], ann['y']
-    
-    # Try partial match (target text is contained in annotation)
-    for ann in ocr_annotations:
-        ann_text = ann['text'].strip()
-        if target_normalized in ' '.join(ann_text.lower().split()):
-            print(f"[Debug] Found partial match (target in annotation): '{ann_text}' contains '{target_text}' at ({ann['x']}, {ann['y']})")
-            return ann['x'], ann['y']
+        return None
     
-    # Try reverse partial match (annotation text is contained in target)
-    for ann in ocr_annotations:
-        ann_text = ann['text'].strip()
-        ann_normalized = ' '.join(ann_text.lower().split())
-        if ann_normalized in target_normalized:
-            print(f"[Debug] Found partial match (annotation in target): '{target_text}' contains '{ann_text}' at ({ann['x']}, {ann['y']})")
-            return ann['x'], ann['y']
-    
-    # Try word-by-word matching for multi-word targets
-    target_words = target_normalized.split()
-    if len(target_words) > 1:
-        for ann in ocr_annotations:
-            ann_text = ann['text'].strip()
-            ann_words = ' '.join(ann_text.lower().split()).split()
-            
-            # Check if all target words are in annotation
-            if all(word in ' '.join(ann_words) for word in target_words):
-                print(f"[Debug] Found word-by-word match: '{ann_text}' contains all words from '{target_text}' at ({ann['x']}, {ann['y']})")
-                return ann['x'], ann['y']
+    index = text_index_for(ocr_annotations)
+    match = index.lookup(target_text, instance)
+    if match is not None:
+        print(f"[Debug] Found {match.kind} match for '{target_text}': '{match.text}' "
+              f"(instance {match.instance}, confidence {match.confidence}) at ({match.x}, {match.y})")
+        return match
     
     # Show what we have for debugging
-    print(f"[Debug] No match found for '{target_text}'. Available elements:")
-    for i, ann in enumerate(ocr_annotations[:10]):  # Show first 10
+    print(f"[Debug] No match found for '{target_text}' among {len(index)} elements. Available elements:")
+    for i, ann in enumerate(index.elements[:10]):  # Show first 10
         print(f"  {i+1}. '{ann['text']}' at ({ann['x']}, {ann['y']})")
     
-    return None, None
+    return None
+
+def find_text_coordinates(target_text, ocr_annotations, instance=None):
+    """Find coordinates for a text target using OCR annotations"""
+    match = find_text_match(target_text, ocr_annotations, instance)
+    if match is None:
+        return None, None
+    return match.x, match.y
 
 def test_click_coordinates(x, y, text="test"):
     """Test function to debug coordinate clicking"""
@@ -131,17 +99,31 @@ def test_click_coordinates(x, y, text="test"):
     pyautogui.click()
     print(f"[Debug] Clicked at ({new_x}, {new_y})")
 
-def execute_steps(steps, ocr_annotations=None):
+def execute_steps(steps, ocr_annotations=None, display=None, settle=None):
+    """
+    Run actions on the given X display (None is the host display pyautogui
+    drives). Before typing, waits for focus: for the screen to settle when a
+    SettleDetector is given, else a fixed delay. ocr_annotations may be a
+    prebuilt TextIndex. Returns the seconds spent waiting.
+    """
     if isinstance(steps, str):
         print("[!] Steps not structured.\n", steps)
-        return
+        return 0.0
+    target = input_target(display)
+    waited = 0.0
     for step in steps:
         action = step.get("action", "").lower()
         if action == "type":
             msg = step.get("text", "")
-            delay = step.get("delay", 2)
-            time.sleep(delay)  # Give time for focus
-            pyautogui.typewrite(msg)
+            if settle is not None and "delay" not in step:
+                result = settle.wait()
+                print(f"[Agent] Screen settled before typing: {result.to_dict()}")
+                waited += result.waited
+            else:
+                delay = step.get("delay", 2)
+                time.sleep(delay)  # Give time for focus
+                waited += delay
+            target.type(msg)
         elif action == "press":
             keys = step.get("keys")
             print("KEYS HERE", keys)
@@ -151,7 +133,7 @@ def execute_steps(steps, ocr_annotations=None):
                 # Map keys to pyautogui names
                 mapped_keys = [KEY_MAP.get(k.lower(), k.lower()) for k in keys]
                 print(f"[Agent] Pressing keys: {mapped_keys}")
-                pyautogui.hotkey(*mapped_keys)
+                target.hotkey(*mapped_keys)
             else:
                 print(f"[!] 'press' action missing or invalid 'keys': {step}")
         elif action == "click_text":
@@ -176,7 +158,7 @@ def execute_steps(steps, ocr_annotations=None):
             # Check if this looks like a keyboard key that should be pressed instead of clicked
             if target_lower in KEY_MAP:
                 print(f"[Agent] Converting click on '{target_text}' to key press")
-                pyautogui.press(KEY_MAP[target_lower])
+                target.press(KEY_MAP[target_lower])
                 continue
             
             # Check for common keyboard key variations
@@ -202,24 +184,24 @@ def execute_steps(steps, ocr_annotations=None):
             
             if target_lower in key_variations:
                 print(f"[Agent] Converting click on '{target_text}' to key press")
-                pyautogui.press(key_variations[target_lower])
+                target.press(key_variations[target_lower])
                 continue
             
             if not ocr_annotations:
                 print(f"[!] No OCR annotations available for click_text action: {step}")
                 continue
             
-            x, y = find_text_coordinates(target_text, ocr_annotations)
-            if x is not None and y is not None:
-                print(f"[Agent] Clicking text '{target_text}' at coordinates ({x}, {y})")
-                pyautogui.click(x=x, y=y)
+            match = find_text_match(target_text, ocr_annotations, step.get("instance"))
+            if match is not None:
+                print(f"[Agent] Clicking text '{target_text}' at coordinates ({match.x}, {match.y})")
+                target.click(match.x, match.y)
             else:
                 print(f"[!] Could not find text '{target_text}' in OCR annotations")
                 # Try to suggest alternatives
                 if ocr_annotations:
                     print(f"[Debug] Similar available elements:")
                     target_words = target_lower.split()
-                    for ann in ocr_annotations[:5]:
+                    for ann in text_index_for(ocr_annotations).elements[:5]:
                         ann_words = ' '.join(ann['text'].lower().split()).split()
                         common_words = set(target_words) & set(ann_words)
                         if common_words:
@@ -231,8 +213,9 @@ def execute_steps(steps, ocr_annotations=None):
             clicks = step.get("clicks", 1)
             interval = step.get("interval", 0.0)
             if x is not None and y is not None:
-                pyautogui.click(x=x, y=y, clicks=clicks, interval=interval, button=button)
+                target.click(x, y, clicks=clicks, interval=interval, button=button)
             else:
                 print(f"[!] Mouse action missing coordinates: {step}")
         else:
             print(f"[!] Unknown or unsupported action: {action} | step: {step}")
+    return waited
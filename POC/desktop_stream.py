@@ -0,0 +1,288 @@
+"""
+Delta-tile desktop streaming.
+
+Instead of a full base64 JPEG every 100 ms, the stream sends one keyframe
+(a full JPEG) and afterwards only the tiles that changed since the previous
+frame, each as its own small JPEG. Payloads carry raw bytes, which
+Socket.IO ships as binary attachments, so there is no base64 overhead.
+An idle desktop costs no bandwidth and no encode time. Periodic keyframes
+let clients resync after a lost or out-of-order update.
+
+Wire format (Socket.IO events):
+
+    desktop_keyframe  {seq, width, height, image: <jpeg bytes>}
+    desktop_delta     {seq, base_seq, width, height,
+                       tiles: [{x, y, w, h, image: <jpeg bytes>}, ...]}
+
+A delta applies on top of the frame numbered base_seq. Clients that do not
+hold that frame should ask for a keyframe.
+
+Every viewer gets its own StreamSession. The client acknowledges each
+message once it is composited ('desktop_ack' {seq}). A session that has too
+many unacknowledged messages drops frames instead of queueing them, and it
+steps down a tier (lower FPS, width and JPEG quality). It climbs back up
+once it has kept pace for a while. A slow viewer therefore only slows
+itself down.
+"""
+
+import io
+import threading
+import time
+from collections import deque
+
+from frame_diff import changed_tiles
+from frame_encoder import STREAM_MAX_WIDTH, STREAM_JPEG_QUALITY
+
+
+# (fps, max_width, jpeg quality), best first
+STREAM_TIERS = (
+    (10, STREAM_MAX_WIDTH, STREAM_JPEG_QUALITY),
+    (6, 1280, 70),
+    (4, 960, 60),
+    (2, 800, 50),
+    (1, 640, 40),
+)
+
+
+def tile_runs(tiles):
+    """Coalesce (tx, ty) tiles into horizontal runs (tx, ty, length), so each run is one JPEG"""
+    runs = []
+    for tx, ty in sorted(tiles, key=lambda t: (t[1], t[0])):
+        if runs and runs[-1][1] == ty and runs[-1][0] + runs[-1][2] == tx:
+            start, row, length = runs[-1]
+            runs[-1] = (start, row, length + 1)
+        else:
+            runs.append((tx, ty, 1))
+    return runs
+
+
+def _jpeg(img, quality):
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+class DeltaStreamEncoder:
+    """
+    Turn a sequence of Frames into keyframe/delta messages.
+
+    encode() returns (event, payload), or None when nothing changed. The
+    previous frame only advances when a message is produced, so slow drifts
+    below pixel_threshold are still picked up once they add up.
+    """
+
+    def __init__(self, tile_size=64, pixel_threshold=8, keyframe_interval=10.0,
+                 max_delta_fraction=0.5, max_width=STREAM_MAX_WIDTH, quality=STREAM_JPEG_QUALITY):
+        self.tile_size = tile_size                    # tile edge in stream pixels; a multiple of 16 keeps JPEG blocks aligned
+        self.pixel_threshold = pixel_threshold        # per-pixel grayscale delta treated as noise
+        self.keyframe_interval = keyframe_interval    # seconds between forced keyframes
+        self.max_delta_fraction = max_delta_fraction  # above this share of changed tiles a keyframe is cheaper
+        self.max_width = max_width
+        self.quality = quality
+        self._lock = threading.Lock()
+        self._previous = None       # grayscale of the last frame sent
+        self._seq = 0
+        self._last_keyframe = 0.0
+        self._keyframe_requested = True
+        self.stats = {'keyframes': 0, 'deltas': 0, 'tiles': 0, 'skipped': 0, 'bytes': 0, 'encode_time': 0.0}
+
+    def request_keyframe(self):
+        """Send a full frame next time, e.g. when a client joins or lost sync"""
+        with self._lock:
+            self._keyframe_requested = True
+
+    def encode(self, frame):
+        with self._lock:
+            start = time.perf_counter()
+            message = self._encode(frame)
+            self.stats['encode_time'] += time.perf_counter() - start
+            return message
+
+    def _encode(self, frame):
+        image = frame.encodings.stream_image(self.max_width)
+        gray = frame.encodings.stream_gray(self.max_width)
+        width, height = image.size
+
+        keyframe = (
+            self._keyframe_requested
+            or self._previous is None
+            or self._previous.size != gray.size
+            or time.monotonic() - self._last_keyframe >= self.keyframe_interval
+        )
+        if not keyframe:
+            tiles, tiles_x, tiles_y = changed_tiles(self._previous, gray, self.tile_size, self.pixel_threshold)
+            if not tiles:
+                self.stats['skipped'] += 1
+                return None
+            keyframe = len(tiles) / (tiles_x * tiles_y) > self.max_delta_fraction
+
+        base_seq = self._seq
+        self._seq += 1
+        self._previous = gray
+
+        if keyframe:
+            self._keyframe_requested = False
+            self._last_keyframe = time.monotonic()
+            data = frame.encodings.stream_jpeg(self.max_width, self.quality)
+            self.stats['keyframes'] += 1
+            self.stats['bytes'] += len(data)
+            return 'desktop_keyframe', {'seq': self._seq, 'width': width, 'height': height, 'image': data}
+
+        size = self.tile_size
+        payload_tiles = []
+        for tx, ty, length in tile_runs(tiles):
+            x, y = tx * size, ty * size
+            w, h = min(length * size, width - x), min(size, height - y)
+            data = _jpeg(image.crop((x, y, x + w, y + h)), self.quality)
+            payload_tiles.append({'x': x, 'y': y, 'w': w, 'h': h, 'image': data})
+            self.stats['bytes'] += len(data)
+        self.stats['deltas'] += 1
+        self.stats['tiles'] += len(tiles)
+        return 'desktop_delta', {
+            'seq': self._seq, 'base_seq': base_seq, 'width': width, 'height': height, 'tiles': payload_tiles
+        }
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['seq'] = self._seq
+        messages = stats['keyframes'] + stats['deltas'] + stats['skipped']
+        stats['avg_encode_ms'] = round(1000 * stats.pop('encode_time') / messages, 2) if messages else 0.0
+        return stats
+
+
+def payload_bytes(payload):
+    """Size of the binary attachments in a keyframe or delta payload"""
+    if 'image' in payload:
+        return len(payload['image'])
+    return sum(len(tile['image']) for tile in payload['tiles'])
+
+
+class StreamSession:
+    """
+    One viewer's stream: its own delta encoder, acknowledgement window and
+    quality tier.
+    """
+
+    def __init__(self, sid, tiers=STREAM_TIERS, max_in_flight=2, ack_timeout=2.0,
+                 degrade_cooldown=1.0, recover_after=3.0, window=5.0):
+        self.sid = sid
+        self.tiers = tiers
+        self.max_in_flight = max_in_flight        # unacknowledged messages before frames are dropped
+        self.ack_timeout = ack_timeout            # seconds before an unacknowledged message counts as lost
+        self.degrade_cooldown = degrade_cooldown  # min seconds between two downgrades
+        self.recover_after = recover_after        # seconds without trouble before stepping back up
+        self.window = window                      # seconds of history for the fps/bitrate figures
+        self.encoder = DeltaStreamEncoder()
+        self.tier = 0
+        self.interval = None
+        self._apply_tier()
+        self._lock = threading.Lock()
+        self._in_flight = {}      # seq -> sent_at
+        self._sent = deque()      # (sent_at, bytes) within window
+        self._last_sent = 0.0
+        self._last_tier_change = time.monotonic()
+        self._last_trouble = time.monotonic()
+        self.rtt = None           # smoothed ack round trip, seconds
+        self.dropped = 0
+        self.lost = 0
+        self.acked = 0
+
+    def _apply_tier(self):
+        fps, max_width, quality = self.tiers[self.tier]
+        self.interval = 1.0 / fps
+        self.encoder.max_width = max_width
+        self.encoder.quality = quality
+
+    def _degrade(self, now):
+        self._last_trouble = now
+        if self.tier < len(self.tiers) - 1 and now - self._last_tier_change >= self.degrade_cooldown:
+            self.tier += 1
+            self._last_tier_change = now
+            self._apply_tier()
+
+    def _recover(self, now):
+        if (self.tier > 0 and now - self._last_trouble >= self.recover_after
+                and now - self._last_tier_change >= self.recover_after):
+            self.tier -= 1
+            self._last_tier_change = now
+            self._apply_tier()
+
+    def _expire(self, now):
+        """Forget messages the client never acknowledged; it may also have lost sync"""
+        expired = [seq for seq, sent_at in self._in_flight.items() if now - sent_at > self.ack_timeout]
+        if expired:
+            for seq in expired:
+                del self._in_flight[seq]
+            self.lost += len(expired)
+            self.encoder.request_keyframe()
+            self._degrade(now)
+
+    def next_message(self, frame, now=None):
+        """
+        Encode frame for this viewer. Returns (event, payload), or None when
+        the frame is not due at the current FPS, nothing changed, or the viewer
+        is behind (in which case the frame is dropped, never queued).
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            # 10% slack so capture jitter does not halve the effective rate
+            if now - self._last_sent < 0.9 * self.interval:
+                return None
+            if len(self._in_flight) >= self.max_in_flight:
+                self.dropped += 1
+                self._degrade(now)
+                return None
+            message = self.encoder.encode(frame)
+            if message is None:
+                return None
+            seq = message[1]['seq']
+            self._in_flight[seq] = now
+            self._sent.append((now, payload_bytes(message[1])))
+            self._prune_sent(now)
+            self._last_sent = now
+            self._recover(now)
+            return message
+
+    def ack(self, seq, now=None):
+        """The client composited message seq (and therefore everything before it)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            sent_at = self._in_flight.get(seq)
+            if sent_at is not None:
+                sample = now - sent_at
+                self.rtt = sample if self.rtt is None else 0.8 * self.rtt + 0.2 * sample
+            for pending in [s for s in self._in_flight if s <= seq]:
+                del self._in_flight[pending]
+                self.acked += 1
+
+    def request_keyframe(self):
+        self.encoder.request_keyframe()
+
+    def _prune_sent(self, now):
+        # Caller holds the lock; also runs per frame, so unpolled viewers do not grow the window
+        while self._sent and now - self._sent[0][0] > self.window:
+            self._sent.popleft()
+
+    def get_stats(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._prune_sent(now)
+            sent_bytes = sum(size for _, size in self._sent)
+            fps, max_width, quality = self.tiers[self.tier]
+            stats = {
+                'tier': self.tier,
+                'target_fps': fps,
+                'max_width': max_width,
+                'quality': quality,
+                'fps': round(len(self._sent) / self.window, 2),
+                'bitrate_kbps': round(8 * sent_bytes / self.window / 1000, 1),
+                'in_flight': len(self._in_flight),
+                'rtt_ms': round(1000 * self.rtt, 1) if self.rtt is not None else None,
+                'acked': self.acked,
+                'dropped': self.dropped,
+                'lost': self.lost,
+            }
+        stats['encoder'] = self.encoder.get_stats()
+        return stats
@@ -0,0 +1,154 @@
+"""
+In-process frame bus.
+
+One producer thread grabs the screen through the capture service and writes
+timestamped Frames into a bounded ring buffer. Subscribers (the desktop
+streamer, the agent loop, diagnostics) read the latest frame or wait for the
+next one. Frames are shared objects, so pixel data is never copied and each
+encoding is computed once per frame (see frame_encoder). Capture cost stays
+flat no matter how many consumers are attached.
+"""
+
+import threading
+import time
+from collections import deque
+
+from screen_capture import screen_capture
+
+
+class Subscription:
+    """A consumer's cursor into the bus; use as a context manager"""
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.last_seq = 0
+
+    def next(self, timeout=1.0):
+        """Wait for a frame newer than the last one this subscriber saw (latest wins, no backlog)"""
+        entry = self.bus.wait_for(self.last_seq, timeout)
+        if entry is None:
+            return None
+        self.last_seq, frame = entry
+        return frame
+
+    def close(self):
+        self.bus._unsubscribe()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FrameBus:
+    def __init__(self, capture=screen_capture, fps=10, capacity=8):
+        self.capture = capture
+        self.interval = 1.0 / fps
+        self._ring = deque(maxlen=capacity)  # (seq, frame), oldest first
+        self._seq = 0
+        self._subscribers = 0
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._thread = None
+        self._grab_lock = threading.Lock()
+        self._frames_produced = 0
+        self._capture_time = 0.0
+
+    def subscribe(self):
+        """Attach a consumer; the producer thread runs while anyone is subscribed"""
+        with self._cond:
+            self._subscribers += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._produce, name='frame-bus', daemon=True)
+                self._thread.start()
+        return Subscription(self)
+
+    def _unsubscribe(self):
+        with self._cond:
+            self._subscribers = max(0, self._subscribers - 1)
+        self._wake.set()
+
+    def _grab_and_publish(self):
+        with self._grab_lock:
+            start = time.perf_counter()
+            frame = self.capture.grab()
+            elapsed = time.perf_counter() - start
+            with self._cond:
+                self._seq += 1
+                self._ring.append((self._seq, frame))
+                self._frames_produced += 1
+                self._capture_time += elapsed
+                self._cond.notify_all()
+            return self._seq, frame
+
+    def _produce(self):
+        while True:
+            with self._cond:
+                if self._subscribers == 0:
+                    self._thread = None
+                    return
+            started = time.monotonic()
+            self._wake.clear()
+            try:
+                self._grab_and_publish()
+            except Exception as e:
+                print(f"[Frame Bus] Capture error: {e}")
+                time.sleep(1)
+            # Sleep out the frame interval, unless someone asks for a fresh frame
+            remaining = self.interval - (time.monotonic() - started)
+            if remaining > 0:
+                self._wake.wait(remaining)
+
+    def latest(self):
+        """(seq, frame) of the newest frame, or None if nothing was captured yet"""
+        with self._cond:
+            return self._ring[-1] if self._ring else None
+
+    def wait_for(self, after_seq, timeout=1.0):
+        """Block until a frame newer than after_seq exists and return (seq, frame), or None on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._ring or self._ring[-1][0] <= after_seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self._ring[-1]
+
+    def fresh_frame(self, timeout=2.0):
+        """
+        Return a frame captured after this call. With a running producer the
+        request just wakes it early; otherwise the caller captures directly
+        and publishes the frame for everyone else.
+        """
+        requested = time.time()
+        with self._cond:
+            producing = self._subscribers > 0
+        if producing:
+            self._wake.set()
+            deadline = time.monotonic() + timeout
+            seq = 0
+            while time.monotonic() < deadline:
+                entry = self.wait_for(seq, deadline - time.monotonic())
+                if entry is None:
+                    break
+                seq, frame = entry
+                if frame.timestamp >= requested:
+                    return frame
+        return self._grab_and_publish()[1]
+
+    def stats(self):
+        with self._cond:
+            produced = self._frames_produced
+            return {
+                'subscribers': self._subscribers,
+                'frames_produced': produced,
+                'buffered': len(self._ring),
+                'latest_seq': self._seq,
+                'avg_capture_ms': round(1000 * self._capture_time / produced, 2) if produced else 0.0,
+            }
+
+
+# Shared bus for the default display
+frame_bus = FrameBus()
@@ -0,0 +1,129 @@
+"""
+Frame change detection for the perception-action loop.
+
+Consecutive screen captures are compared with a perceptual hash (dHash) and a
+tile-level pixel diff on the raw mss buffer, so the agent can tell when the
+screen is effectively identical to the frame it last ran OCR on.
+"""
+
+from PIL import Image, ImageChops
+
+
+def to_grayscale(screenshot):
+    """Convert an mss screenshot (raw BGRA buffer) to a grayscale PIL image"""
+    img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
+    return img.convert("L")
+
+
+def dhash(gray, hash_size=8):
+    """Difference hash of a grayscale image, returned as an int of hash_size**2 bits"""
+    # Cheap box reduction first so the final resize only touches a small image
+    factor = max(1, min(gray.width, gray.height) // (hash_size * 16))
+    small = gray.reduce(factor) if factor > 1 else gray
+    small = small.resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def changed_tiles(previous, current, tile_size, pixel_threshold):
+    """
+    Tiles (tx, ty) of two same-sized grayscale images that contain at least one
+    pixel differing by more than pixel_threshold. Returns (tiles, tiles_x, tiles_y).
+    """
+    tiles_x = -(-current.width // tile_size)
+    tiles_y = -(-current.height // tile_size)
+    diff = ImageChops.difference(current, previous).point(lambda v: 255 if v > pixel_threshold else 0)
+    # Average the binary mask over each tile; any non-zero mean is a changed tile
+    tile_means = diff.convert("F").reduce(tile_size).getdata()
+    tiles = [(i % tiles_x, i // tiles_x) for i, mean in enumerate(tile_means) if mean > 0]
+    return tiles, tiles_x, tiles_y
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count('1')
+
+
+class FrameChange:
+    """Result of comparing a frame against the detector's reference frame"""
+
+    def __init__(self, gray, frame_hash, hash_distance, changed_tiles, tile_count, tile_size, changed):
+        self.gray = gray
+        self.frame_hash = frame_hash
+        self.hash_distance = hash_distance
+        self.changed_tiles = changed_tiles
+        self.tile_count = tile_count
+        self.tile_size = tile_size
+        self.changed = changed
+
+    @property
+    def changed_fraction(self):
+        if not self.tile_count:
+            return 1.0
+        return len(self.changed_tiles) / self.tile_count
+
+    def changed_regions(self):
+        """Pixel rectangles (x1, y1, x2, y2) of the changed tiles, clipped to the frame"""
+        width, height = self.gray.size
+        regions = []
+        for tx, ty in self.changed_tiles:
+            x1 = tx * self.tile_size
+            y1 = ty * self.tile_size
+            regions.append((x1, y1, min(x1 + self.tile_size, width), min(y1 + self.tile_size, height)))
+        return regions
+
+
+class FrameChangeDetector:
+    """
+    Decide whether a new capture differs meaningfully from the reference frame.
+
+    The reference only moves forward when accept() is called, i.e. when the
+    caller actually re-ran OCR on the frame. Small changes therefore cannot
+    accumulate unnoticed over several skipped steps.
+    """
+
+    def __init__(self, tile_size=64, pixel_threshold=24, change_threshold=0.0, max_hash_distance=10):
+        self.tile_size = tile_size                  # tile edge in screenshot pixels
+        self.pixel_threshold = pixel_threshold      # per-pixel grayscale delta treated as noise
+        self.change_threshold = change_threshold    # fraction of tiles that may change and still count as "same"
+        self.max_hash_distance = max_hash_distance  # hash distance above which every tile is considered dirty
+        self.reference = None
+        self.reference_hash = None
+
+    def _tile_grid(self, size):
+        width, height = size
+        return -(-width // self.tile_size), -(-height // self.tile_size)
+
+    def compare(self, screenshot):
+        """Compare an mss screenshot to the reference frame and return a FrameChange"""
+        gray = to_grayscale(screenshot)
+        frame_hash = dhash(gray)
+        tiles_x, tiles_y = self._tile_grid(gray.size)
+        tile_count = tiles_x * tiles_y
+        all_tiles = [(tx, ty) for ty in range(tiles_y) for tx in range(tiles_x)]
+
+        if self.reference is None or self.reference.size != gray.size:
+            return FrameChange(gray, frame_hash, None, all_tiles, tile_count, self.tile_size, True)
+
+        distance = hamming_distance(frame_hash, self.reference_hash)
+        if distance > self.max_hash_distance:
+            # The whole screen moved on; no point diffing tile by tile
+            return FrameChange(gray, frame_hash, distance, all_tiles, tile_count, self.tile_size, True)
+
+        tiles, _, _ = changed_tiles(self.reference, gray, self.tile_size, self.pixel_threshold)
+        changed = len(tiles) / tile_count > self.change_threshold
+        return FrameChange(gray, frame_hash, distance, tiles, tile_count, self.tile_size, changed)
+
+    def accept(self, change):
+        """Make the frame from a FrameChange the new reference"""
+        self.reference = change.gray
+        self.reference_hash = change.frame_hash
+
+    def reset(self):
+        self.reference = None
+        self.reference_hash = None
@@ -0,0 +1,140 @@
+"""
+One capture, many encodings.
+
+A FrameEncoder wraps a single raw BGRA capture and produces each format a
+consumer asks for at most once, sharing the result between the OCR stage, the
+LLM calls, the agent state and the desktop stream:
+
+- png():             lossless full-resolution PNG for OCR
+- llm_image_b64():   JPEG downscaled to the gpt-4o high-detail tile budget
+- stream_jpeg():     width-capped JPEG for the web UI / desktop stream
+- sample_gray():     tiny strided thumbnail for cheap change checks
+"""
+
+import base64
+import hashlib
+import io
+import threading
+
+import mss.tools
+import numpy as np
+from PIL import Image
+
+# gpt-4o (detail=high) fits images in 2048x2048, then scales the shortest side
+# down to 768px before tiling. Anything larger is uploaded only to be discarded.
+LLM_MAX_SIDE = 2048
+LLM_SHORT_SIDE = 768
+LLM_JPEG_QUALITY = 85
+
+STREAM_MAX_WIDTH = 1280
+STREAM_JPEG_QUALITY = 85
+
+
+def llm_target_size(width, height):
+    """Size the model would resize the image to anyway"""
+    scale = min(1.0, LLM_MAX_SIDE / max(width, height))
+    short_side = min(width, height) * scale
+    if short_side > LLM_SHORT_SIDE:
+        scale *= LLM_SHORT_SIDE / short_side
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+class FrameEncoder:
+    def __init__(self, frame):
+        self.frame = frame
+        self._cache = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _memo(self, key, produce):
+        """Compute produce() once per key, even with concurrent callers"""
+        value = self._cache.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self._cache.get(key)
+            if value is None:
+                value = produce()
+                self._cache[key] = value
+        return value
+
+    def rgb_image(self):
+        """The capture as a full-resolution RGB PIL image (shared source for lossy encodes)"""
+        frame = self.frame
+        return self._memo('rgb', lambda: Image.frombytes("RGB", frame.size, frame.bgra, "raw", "BGRX"))
+
+    def fingerprint(self):
+        """Content hash of the raw pixels, the key for content-addressed caches"""
+        frame = self.frame
+        def produce():
+            digest = hashlib.blake2b(repr(frame.size).encode(), digest_size=20)
+            digest.update(frame.bgra)
+            return digest.hexdigest()
+        return self._memo('fingerprint', produce)
+
+    def png(self):
+        """Lossless PNG of the full capture, for OCR"""
+        frame = self.frame
+        return self._memo('png', lambda: mss.tools.to_png(frame.rgb, frame.size))
+
+    def png_b64(self):
+        return self._memo('png_b64', lambda: base64.b64encode(self.png()).decode('utf-8'))
+
+    def _jpeg(self, size, quality):
+        img = self.rgb_image()
+        if img.size != size:
+            img = img.resize(size, Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=quality, optimize=True)
+        return buffer.getvalue()
+
+    def llm_image_b64(self):
+        """Base64 JPEG sized to the gpt-4o image tile budget"""
+        def produce():
+            size = llm_target_size(*self.frame.size)
+            return base64.b64encode(self._jpeg(size, LLM_JPEG_QUALITY)).decode('utf-8')
+        return self._memo('llm', produce)
+
+    def stream_image(self, max_width=STREAM_MAX_WIDTH):
+        """RGB image capped at max_width, the source for stream JPEGs and delta tiles"""
+        def produce():
+            img = self.rgb_image()
+            width, height = img.size
+            if width > max_width:
+                img = img.resize((max_width, int(height * max_width / width)), Image.Resampling.LANCZOS)
+            return img
+        return self._memo(('stream_image', max_width), produce)
+
+    def stream_gray(self, max_width=STREAM_MAX_WIDTH):
+        """Grayscale of stream_image, for diffing consecutive stream frames"""
+        return self._memo(('stream_gray', max_width), lambda: self.stream_image(max_width).convert("L"))
+
+    def sample_gray(self, max_width=320):
+        """
+        Nearest-neighbour thumbnail of at most max_width, read with strides from
+        the raw buffer (green channel as luminance): no full-size conversion or
+        resampling, for sampling the screen many times a second
+        """
+        def produce():
+            frame = self.frame
+            width, height = frame.size
+            step = max(1, -(-width // max_width))
+            pixels = np.frombuffer(frame.bgra, dtype=np.uint8).reshape(height, width, 4)
+            return Image.fromarray(np.ascontiguousarray(pixels[::step, ::step, 1]))
+        return self._memo(('sample_gray', max_width), produce)
+
+    def stream_jpeg(self, max_width=STREAM_MAX_WIDTH, quality=STREAM_JPEG_QUALITY):
+        """JPEG capped at max_width, for the web UI and desktop stream"""
+        def produce():
+            buffer = io.BytesIO()
+            self.stream_image(max_width).save(buffer, format='JPEG', quality=quality, optimize=True)
+            return buffer.getvalue()
+        return self._memo(('stream', max_width, quality), produce)
+
+    def stream_jpeg_b64(self, max_width=STREAM_MAX_WIDTH, quality=STREAM_JPEG_QUALITY):
+        return self._memo(
+            ('stream_b64', max_width, quality),
+            lambda: base64.b64encode(self.stream_jpeg(max_width, quality)).decode()
+        )
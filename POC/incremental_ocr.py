@@ -0,0 +1,131 @@
+"""
+Dirty-region incremental OCR.
+
+Given the tiles that changed since the last OCR'd frame (see frame_diff), plan
+a small set of crop rectangles to re-recognize, then splice the words found in
+those crops into the previous frame's word list. Words in untouched tiles are
+carried over unchanged. The OCR call itself is left to the caller.
+"""
+
+import numpy as np
+
+from ocr_frame import OCRFrame
+
+
+def _intersects(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def group_tiles(tiles):
+    """Group 4-connected tiles and return the tile-space bounding box of each group"""
+    remaining = set(tiles)
+    boxes = []
+    while remaining:
+        stack = [remaining.pop()]
+        min_tx = max_tx = stack[0][0]
+        min_ty = max_ty = stack[0][1]
+        while stack:
+            tx, ty = stack.pop()
+            min_tx, max_tx = min(min_tx, tx), max(max_tx, tx)
+            min_ty, max_ty = min(min_ty, ty), max(max_ty, ty)
+            for neighbor in ((tx + 1, ty), (tx - 1, ty), (tx, ty + 1), (tx, ty - 1)):
+                if neighbor in remaining:
+                    remaining.remove(neighbor)
+                    stack.append(neighbor)
+        boxes.append((min_tx, min_ty, max_tx, max_ty))
+    return boxes
+
+
+class DirtyRegion:
+    """A changed area (in screenshot pixels) and the padded crop sent to OCR"""
+
+    def __init__(self, region, crop):
+        self.region = region  # (x1, y1, x2, y2) whose words are replaced
+        self.crop = crop      # region plus margin, so words crossing the edge are read whole
+
+    def __repr__(self):
+        return f"DirtyRegion(region={self.region}, crop={self.crop})"
+
+
+class IncrementalOCR:
+    """
+    Keeps the word list of the last OCR'd frame and patches it region by region.
+
+    The word list is a pre-merge, word-level OCRFrame, so merging and instance
+    tagging are simply re-run on the spliced list.
+    """
+
+    def __init__(self, margin=32, max_dirty_fraction=0.3, max_regions=16):
+        self.margin = margin                          # crop padding in screenshot pixels
+        self.max_dirty_fraction = max_dirty_fraction  # above this, a full OCR is cheaper
+        self.max_regions = max_regions                # one Vision batch request
+        self.words = None
+
+    def reset(self, words=None):
+        self.words = words
+
+    def plan(self, change):
+        """
+        Return the DirtyRegions to re-OCR for a FrameChange, or None when a full
+        OCR is required (no previous words, size change or too much changed).
+        """
+        if self.words is None or change.hash_distance is None:
+            return None
+        if change.changed_fraction > self.max_dirty_fraction:
+            return None
+
+        width, height = change.gray.size
+        tile = change.tile_size
+        crops = []
+        for min_tx, min_ty, max_tx, max_ty in group_tiles(change.changed_tiles):
+            x1, y1 = min_tx * tile, min_ty * tile
+            x2, y2 = min((max_tx + 1) * tile, width), min((max_ty + 1) * tile, height)
+            crops.append([
+                (x1, y1, x2, y2),
+                (max(0, x1 - self.margin), max(0, y1 - self.margin),
+                 min(width, x2 + self.margin), min(height, y2 + self.margin))
+            ])
+
+        # Coalesce overlapping crops so no area is uploaded twice
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(crops)):
+                for j in range(i + 1, len(crops)):
+                    if _intersects(crops[i][1], crops[j][1]):
+                        a, b = crops[i], crops.pop(j)
+                        a[0] = (min(a[0][0], b[0][0]), min(a[0][1], b[0][1]), max(a[0][2], b[0][2]), max(a[0][3], b[0][3]))
+                        a[1] = (min(a[1][0], b[1][0]), min(a[1][1], b[1][1]), max(a[1][2], b[1][2]), max(a[1][3], b[1][3]))
+                        merged = True
+                        break
+                if merged:
+                    break
+
+        if len(crops) > self.max_regions:
+            return None
+        return [DirtyRegion(region, crop) for region, crop in crops]
+
+    def splice(self, regions, region_words, scale_x, scale_y):
+        """
+        Replace the words inside each dirty region with the freshly recognized ones.
+
+        region_words[i] is the word-level OCRFrame found in regions[i].crop, already
+        offset and scaled to screen coordinates. Returns the updated OCRFrame.
+        """
+        screen_regions = [
+            (r.region[0] * scale_x, r.region[1] * scale_y, r.region[2] * scale_x, r.region[3] * scale_y)
+            for r in regions
+        ]
+
+        stale = np.zeros(len(self.words), dtype=bool)
+        for region in screen_regions:
+            stale |= self.words.intersects(region)
+        kept = self.words.select(~stale)
+        # Words that lie only in the margin were not touched; their old copy is kept
+        added = [words.select(words.intersects(region)) for region, words in zip(screen_regions, region_words)]
+
+        words = OCRFrame.concatenate([kept] + added)
+        print(f"[Incremental OCR] {len(regions)} regions: kept {len(kept)} words, replaced {int(stale.sum())} with {len(words) - len(kept)}")
+        # Keep words in reading order so merging sees them in a stable order
+        self.words = words.select(np.lexsort((words.x, words.y)))
+        return self.words
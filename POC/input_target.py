@@ -0,0 +1,119 @@
+"""
+Where simulated mouse and keyboard input goes.
+
+pyautogui binds to one display per process (the one in $DISPLAY at import
+time), so it can only drive the host session. Agent sessions bound to their
+own X display (e.g. an Xvfb instance) inject input with xdotool instead,
+run with DISPLAY pointed at that display. Both backends accept the same
+pyautogui key names (see desktop_actions.KEY_MAP).
+"""
+
+import os
+import subprocess
+import threading
+
+# pyautogui key names -> X keysyms understood by xdotool
+XDOTOOL_KEYS = {
+    'command': 'super',
+    'win': 'super',
+    'ctrl': 'ctrl',
+    'alt': 'alt',
+    'option': 'alt',
+    'shift': 'shift',
+    'enter': 'Return',
+    'return': 'Return',
+    'tab': 'Tab',
+    'space': 'space',
+    'backspace': 'BackSpace',
+    'delete': 'Delete',
+    'escape': 'Escape',
+    'up': 'Up',
+    'down': 'Down',
+    'left': 'Left',
+    'right': 'Right',
+    'home': 'Home',
+    'end': 'End',
+    'pageup': 'Prior',
+    'pagedown': 'Next',
+    'insert': 'Insert',
+    **{f'f{n}': f'F{n}' for n in range(1, 13)},
+}
+
+XDOTOOL_BUTTONS = {'left': '1', 'middle': '2', 'right': '3'}
+
+
+class PyAutoGUIInput:
+    """Input on the host display through pyautogui"""
+
+    display = None
+
+    def click(self, x, y, clicks=1, interval=0.0, button='left'):
+        import pyautogui
+        pyautogui.click(x=x, y=y, clicks=clicks, interval=interval, button=button)
+
+    def type(self, text):
+        import pyautogui
+        pyautogui.typewrite(text)
+
+    def press(self, key):
+        import pyautogui
+        pyautogui.press(key)
+
+    def hotkey(self, *keys):
+        import pyautogui
+        pyautogui.hotkey(*keys)
+
+
+class XdotoolInput:
+    """Input on a specific X display (e.g. ':99') through xdotool"""
+
+    def __init__(self, display, type_delay_ms=12):
+        self.display = display
+        self.type_delay_ms = type_delay_ms
+
+    @staticmethod
+    def keysym(key):
+        return XDOTOOL_KEYS.get(key.lower(), key)
+
+    def click_command(self, x, y, clicks=1, interval=0.0, button='left'):
+        return ['xdotool', 'mousemove', '--sync', str(int(x)), str(int(y)),
+                'click', '--repeat', str(clicks), '--delay', str(int(interval * 1000)),
+                XDOTOOL_BUTTONS.get(button, '1')]
+
+    def type_command(self, text):
+        return ['xdotool', 'type', '--delay', str(self.type_delay_ms), '--', text]
+
+    def key_command(self, *keys):
+        return ['xdotool', 'key', '+'.join(self.keysym(key) for key in keys)]
+
+    def _run(self, command):
+        env = dict(os.environ, DISPLAY=self.display)
+        result = subprocess.run(command, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"[Input] xdotool on {self.display} failed: {result.stderr.strip()}")
+
+    def click(self, x, y, clicks=1, interval=0.0, button='left'):
+        self._run(self.click_command(x, y, clicks, interval, button))
+
+    def type(self, text):
+        self._run(self.type_command(text))
+
+    def press(self, key):
+        self._run(self.key_command(key))
+
+    def hotkey(self, *keys):
+        self._run(self.key_command(*keys))
+
+
+_targets = {}
+_targets_lock = threading.Lock()
+
+
+def input_target(display=None):
+    """The input backend for a display; None is the host display"""
+    with _targets_lock:
+        target = _targets.get(display)
+        if target is None:
+            target = PyAutoGUIInput() if display is None else XdotoolInput(display)
+            _targets[display] = target
+        return target
@@ -0,0 +1,223 @@
+"""
+Bounded job queue in front of the agent engine.
+
+/api/process_command used to start a run for every POST, so a burst of
+requests had many agents driving the same mouse and keyboard at once. Goals
+are now submitted as jobs. Each job waits in a bounded queue, ordered by
+priority and then by arrival, and starts only when its display has a free
+slot (per_display concurrency) and its session is not already running a
+job. A submit beyond max_queued raises QueueFull, which carries a
+queue-position hint and an estimated wait; the API turns it into a 429.
+
+Queued jobs can be cancelled or reprioritized; cancelling a running job
+stops its run. Queue depth, wait time and run time are kept as metrics.
+"""
+
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+
+
+class QueueFull(Exception):
+    def __init__(self, depth, position_hint, retry_after):
+        super().__init__(f"Job queue is full ({depth} waiting)")
+        self.depth = depth
+        self.position_hint = position_hint    # where the job would have been queued
+        self.retry_after = retry_after        # seconds until a slot is likely free
+
+
+class Job:
+    def __init__(self, goal, session_id, display, priority=0, seq=0):
+        self.id = uuid.uuid4().hex[:12]
+        self.goal = goal
+        self.session_id = session_id
+        self.display = display            # concurrency is limited per display
+        self.priority = priority          # higher runs first
+        self.seq = seq                    # arrival order among equal priorities
+        self.state = 'queued'             # queued, running, finished, failed, cancelled
+        self.result = None                # final agent status of a finished run
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.future = None
+
+    def sort_key(self):
+        return (-self.priority, self.seq)
+
+    def to_dict(self, position=None):
+        now = time.time()
+        return {
+            'job_id': self.id,
+            'goal': self.goal,
+            'session_id': self.session_id,
+            'display': self.display,
+            'priority': self.priority,
+            'state': self.state,
+            'position': position,
+            'result': self.result,
+            'error': self.error,
+            'submitted': self.submitted,
+            'wait_s': round((self.started or now) - self.submitted, 3),
+            'run_s': round((self.finished or now) - self.started, 3) if self.started else None,
+        }
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+
+class JobScheduler:
+    def __init__(self, run_fn, cancel_fn, max_queued=16, per_display=1, keep=200):
+        self.run_fn = run_fn              # job -> concurrent Future of the run
+        self.cancel_fn = cancel_fn        # job -> stop its running run
+        self.max_queued = max_queued
+        self.per_display = per_display
+        self._lock = threading.RLock()
+        self._queue = []                  # queued jobs, kept in priority order
+        self._running = {}                # job id -> Job
+        self._jobs = {}                   # job id -> Job (queued, running and recent)
+        self._history = deque(maxlen=keep)
+        self._seq = itertools.count()
+        self._wait_times = deque(maxlen=keep)
+        self._run_times = deque(maxlen=keep)
+        self.counts = {'submitted': 0, 'rejected': 0, 'finished': 0, 'failed': 0, 'cancelled': 0}
+
+    def submit(self, goal, session_id, display=None, priority=0):
+        """Queue a goal; returns the Job (possibly already running). Raises QueueFull."""
+        with self._lock:
+            if len(self._queue) >= self.max_queued:
+                self.counts['rejected'] += 1
+                ahead = sum(1 for job in self._queue if job.priority >= priority)
+                raise QueueFull(len(self._queue), ahead + 1, self._estimate_wait(len(self._queue)))
+            job = Job(goal, session_id, display, priority, next(self._seq))
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._queue.sort(key=Job.sort_key)
+            self.counts['submitted'] += 1
+            self._dispatch()
+            return job
+
+    def _estimate_wait(self, depth):
+        average = sum(self._run_times) / len(self._run_times) if self._run_times else 30.0
+        return round(average * (depth + 1) / max(1, self.per_display), 1)
+
+    def _busy(self):
+        displays, sessions = {}, set()
+        for job in self._running.values():
+            displays[job.display] = displays.get(job.display, 0) + 1
+            sessions.add(job.session_id)
+        return displays, sessions
+
+    def _dispatch(self):
+        """Start every queued job whose display has a free slot and whose session is idle"""
+        displays, sessions = self._busy()
+        for job in list(self._queue):
+            if job.state != 'queued':
+                continue  # finished by a nested dispatch (a run that completed immediately)
+            if displays.get(job.display, 0) >= self.per_display or job.session_id in sessions:
+                continue
+            self._queue.remove(job)
+            job.state = 'running'
+            job.started = time.time()
+            self._wait_times.append(job.started - job.submitted)
+            self._running[job.id] = job
+            displays[job.display] = displays.get(job.display, 0) + 1
+            sessions.add(job.session_id)
+            try:
+                job.future = self.run_fn(job)
+            except Exception as e:
+                self._finish(job, 'failed', error=str(e))
+                continue
+            job.future.add_done_callback(lambda future, job=job: self._on_done(job, future))
+
+    def _on_done(self, job, future):
+        if future.cancelled():
+            self._finish(job, 'cancelled')
+        elif future.exception() is not None:
+            self._finish(job, 'failed', error=repr(future.exception()))
+        else:
+            self._finish(job, 'finished', result=future.result())
+
+    def _finish(self, job, state, result=None, error=None):
+        with self._lock:
+            if job.state not in ('queued', 'running'):
+                return
+            was_running = self._running.pop(job.id, None) is not None
+            job.state = state
+            job.result = result
+            job.error = error
+            job.finished = time.time()
+            if was_running:
+                self._run_times.append(job.finished - job.started)
+            self.counts[state] += 1
+            self._history.append(job.id)
+            # Forget jobs that dropped out of the history window
+            active = {j.id for j in self._queue} | set(self._running) | set(self._history)
+            for job_id in [job_id for job_id in self._jobs if job_id not in active]:
+                del self._jobs[job_id]
+            self._dispatch()
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict(self._position(job)) if job else None
+
+    def _position(self, job):
+        return self._queue.index(job) + 1 if job.state == 'queued' else None
+
+    def cancel(self, job_id):
+        """Cancel a queued job, or stop a running one; None for an unknown job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.state == 'queued':
+                self._queue.remove(job)
+                self._finish(job, 'cancelled')
+                return job.to_dict()
+            running = job.state == 'running'
+        if running:
+            # The done callback records the cancellation and starts the next job
+            self.cancel_fn(job)
+        return self.get(job_id)
+
+    def reprioritize(self, job_id, priority):
+        """Change a queued job's priority; returns its new state, or None if it is not queued"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != 'queued':
+                return None
+            job.priority = priority
+            self._queue.sort(key=Job.sort_key)
+            return job.to_dict(self._position(job))
+
+    def jobs(self):
+        with self._lock:
+            return [job.to_dict(self._position(job)) for job in self._jobs.values()]
+
+    def metrics(self):
+        with self._lock:
+            depth_by_display = {}
+            for job in self._queue:
+                key = job.display or 'host'
+                depth_by_display[key] = depth_by_display.get(key, 0) + 1
+            waits = list(self._wait_times)
+            runs = list(self._run_times)
+            now = time.time()
+            return {
+                'queue_depth': len(self._queue),
+                'queue_depth_by_display': depth_by_display,
+                'max_queued': self.max_queued,
+                'running': len(self._running),
+                'per_display': self.per_display,
+                'oldest_wait_s': round(now - min(job.submitted for job in self._queue), 3) if self._queue else 0.0,
+                'wait_s': {'avg': round(sum(waits) / len(waits), 3) if waits else None, 'p95': percentile(waits, 0.95)},
+                'run_s': {'avg': round(sum(runs) / len(runs), 3) if runs else None, 'p95': percentile(runs, 0.95)},
+                **self.counts,
+            }
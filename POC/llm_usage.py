@@ -0,0 +1,92 @@
+"""
+Token usage of the LLM calls, including prompt-cache hits.
+
+Each response's `usage` field reports prompt and completion tokens. On
+models with prompt caching, prompt_tokens_details.cached_tokens gives the
+part of the prompt that was served from cache. The tracker totals these per
+call kind (action, selector, command, ...) so the effect of the stable
+prompt prefix (see prompts.py) can be watched as a cached-token ratio.
+
+A streamed call reports usage only in its last chunk, which is lost when
+the stream is closed as soon as the action arrives. UsageSampler picks the
+calls whose stream is instead read to its end by drain_usage.
+"""
+
+import asyncio
+import itertools
+import threading
+from collections import deque
+
+
+def usage_counts(usage):
+    """(prompt, completion, cached) tokens of a usage object or dict; missing fields count as 0"""
+    if usage is None:
+        return 0, 0, 0
+    get = usage.get if isinstance(usage, dict) else lambda name, default=None: getattr(usage, name, default)
+    details = get('prompt_tokens_details')
+    if isinstance(details, dict):
+        cached = details.get('cached_tokens')
+    else:
+        cached = getattr(details, 'cached_tokens', None)
+    return get('prompt_tokens') or 0, get('completion_tokens') or 0, cached or 0
+
+
+class UsageTracker:
+    def __init__(self, keep=50):
+        self._lock = threading.Lock()
+        self._kinds = {}                    # call kind -> running totals
+        self._recent = deque(maxlen=keep)   # latest calls, newest last
+
+    def record(self, kind, usage):
+        """Add one response's usage; responses without usage are ignored"""
+        if usage is None:
+            return
+        prompt, completion, cached = usage_counts(usage)
+        with self._lock:
+            totals = self._kinds.setdefault(kind, {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                                                   'cached_tokens': 0, 'cache_hits': 0})
+            totals['calls'] += 1
+            totals['prompt_tokens'] += prompt
+            totals['completion_tokens'] += completion
+            totals['cached_tokens'] += cached
+            totals['cache_hits'] += 1 if cached else 0
+            self._recent.append({'kind': kind, 'prompt_tokens': prompt, 'completion_tokens': completion,
+                                 'cached_tokens': cached})
+
+    def stats(self):
+        with self._lock:
+            kinds = {kind: dict(totals) for kind, totals in self._kinds.items()}
+            recent = list(self._recent)
+        for totals in kinds.values():
+            prompt = totals['prompt_tokens']
+            totals['cached_ratio'] = round(totals['cached_tokens'] / prompt, 3) if prompt else 0.0
+        return {'kinds': kinds, 'recent': recent}
+
+
+class UsageSampler:
+    """Picks the first and then every Nth streamed call for a usage sample (every=0: none)"""
+
+    def __init__(self, every):
+        self.every = every
+        self._calls = itertools.count()
+
+    def take(self):
+        return self.every > 0 and next(self._calls) % self.every == 0
+
+
+async def drain_usage(stream, kind, tracker, timeout=15):
+    """Read the rest of a dispatched stream for its usage chunk, then close it"""
+    try:
+        async def drain():
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    tracker.record(kind, chunk.usage)
+        await asyncio.wait_for(drain(), timeout)
+    except Exception as e:
+        print(f"[LLM usage] {kind} usage not recorded: {e!r}")
+    finally:
+        await stream.close()
+
+
+# Shared by agent_loop and prompt_agent
+llm_usage = UsageTracker()
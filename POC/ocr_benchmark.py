@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Run OCR engines on the same frames and compare latency and accuracy.
+
+    python ocr_benchmark.py recordings/ --engines vision,tesseract
+    python ocr_benchmark.py --live 10 --engines vision,tesseract
+    python ocr_benchmark.py --live 5 --scaling 1,2,4,8
+
+Frames are the screenshots of recorded agent sessions (see
+session_recorder), or fresh captures of the host screen with --live. No
+human ground truth exists for these frames, so accuracy is measured two
+ways:
+
+- agreement with the first engine, the reference (Vision in practice). A
+  word matches when a reference word has the same normalized text and its
+  box contains the word's center. Precision, recall and F1 are reported.
+- click recall, on recordings only. This is the share of recorded
+  click_text targets that the engine's merged annotations still resolve
+  to an exact or whole-word match: the case where the agent could click
+  the same thing.
+
+--scaling measures tile-parallel local OCR (see ocr_tiles) instead. Each
+frame is read whole on one worker, then tile by tile on pools of the given
+sizes. The report gives each pool's mean latency, its speedup over the
+whole-frame read, and how well the stitched words agree with it.
+"""
+
+import argparse
+import base64
+import io
+import json
+import time
+
+from PIL import Image
+
+from config import OCR_LOCAL_WORKERS, TESSERACT_LANG, TESSERACT_SCALE, TESSERACT_MIN_CONFIDENCE
+from config import OCR_TILE_SIZE, OCR_TILE_OVERLAP
+from ocr_engine import create_ocr_engine, LocalEngine, OCRError
+from ocr_tiles import TileOCR
+from ocr_frame import OCRFrame
+from ocr_processing import build_annotations
+from ocr_ranker import normalize
+from session_recorder import find_sessions, load_session
+from text_index import TextIndex
+
+
+def word_box(vertices):
+    xs = [x for x, _ in vertices]
+    ys = [y for _, y in vertices]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def word_agreement(reference, candidate, slack=4):
+    """(matched, reference count, candidate count): candidate words whose center lies in a same-text reference box"""
+    boxes = {}
+    for text, vertices in reference:
+        boxes.setdefault(normalize(text), []).append(word_box(vertices))
+    matched = 0
+    for text, vertices in candidate:
+        x1, y1, x2, y2 = word_box(vertices)
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        options = boxes.get(normalize(text), [])
+        for position, (rx1, ry1, rx2, ry2) in enumerate(options):
+            if rx1 - slack <= cx <= rx2 + slack and ry1 - slack <= cy <= ry2 + slack:
+                matched += 1
+                del options[position]   # each reference word matches once
+                break
+    return matched, len(reference), len(candidate)
+
+
+def clickable(words, image_height, target):
+    """Whether a click_text target resolves to an exact or whole-word match in the merged annotations"""
+    annotations = build_annotations(OCRFrame.from_words(words, 1.0, 1.0), image_height)
+    match = TextIndex(annotations.to_dicts()).lookup(target)
+    return match is not None and match.kind in ('exact', 'words')
+
+
+def load_frames(recordings):
+    """(png or jpeg bytes, image height, click target or None) per recorded step"""
+    frames = []
+    for directory in find_sessions(recordings):
+        for entry in load_session(directory):
+            if not entry['image_b64']:
+                continue
+            image_bytes = base64.b64decode(entry['image_b64'])
+            action = entry['action']
+            target = str(action.get('target', '')) if action.get('action') == 'click_text' else None
+            frames.append((image_bytes, Image.open(io.BytesIO(image_bytes)).height, target))
+    return frames
+
+
+def live_frames(count, interval=1.0):
+    from screen_capture import screen_capture
+    frames = []
+    for _ in range(count):
+        frame = screen_capture.grab()
+        frames.append((frame.encodings.png(), frame.height, None))
+        time.sleep(interval)
+    return frames
+
+
+def evaluate(engine, frames, reference=None):
+    """Engine report; reference is the reference engine's words per frame (None for the reference itself)"""
+    latencies = []
+    results = []
+    failures = 0
+    for image_bytes, _, _ in frames:
+        start = time.perf_counter()
+        try:
+            results.append(engine.recognize(image_bytes)[1])
+        except OCRError as e:
+            print(f"[{engine.name}] {e}")
+            results.append([])
+            failures += 1
+        latencies.append(time.perf_counter() - start)
+    report = {
+        'engine': engine.name,
+        'frames': len(frames),
+        'failures': failures,
+        'words_per_frame': round(sum(len(words) for words in results) / len(results), 1) if results else None,
+    }
+    ordered = sorted(latencies)
+    report['latency_ms_mean'] = round(1000 * sum(ordered) / len(ordered), 1) if ordered else None
+    report['latency_ms_p95'] = round(1000 * ordered[int(0.95 * (len(ordered) - 1))], 1) if ordered else None
+    if reference is not None:
+        matched = in_reference = in_candidate = 0
+        for ref_words, words in zip(reference, results):
+            m, r, c = word_agreement(ref_words, words)
+            matched, in_reference, in_candidate = matched + m, in_reference + r, in_candidate + c
+        precision = matched / in_candidate if in_candidate else 0.0
+        recall = matched / in_reference if in_reference else 0.0
+        report['precision'] = round(precision, 3)
+        report['recall'] = round(recall, 3)
+        report['f1'] = round(2 * precision * recall / (precision + recall), 3) if precision + recall else 0.0
+    clicks = [(words, height, target) for words, (_, height, target) in zip(results, frames) if target]
+    if clicks:
+        report['click_recall'] = round(sum(clickable(*click) for click in clicks) / len(clicks), 3)
+    return report, results
+
+
+def timed_mean(recognize, frames):
+    """(mean seconds per frame, results) of recognize(image bytes) over the frames"""
+    start = time.perf_counter()
+    results = [recognize(image_bytes) for image_bytes, _, _ in frames]
+    return (time.perf_counter() - start) / len(frames), results
+
+
+def tile_scaling(frames, worker_counts, tile_size=OCR_TILE_SIZE, overlap=OCR_TILE_OVERLAP, **options):
+    """Whole-frame baseline plus one report per tiled worker count"""
+    engine = LocalEngine(1, **options)
+    engine.warm(wait=True)
+    try:
+        baseline, whole = timed_mean(lambda image_bytes: engine.recognize(image_bytes)[1], frames)
+    finally:
+        engine.close()
+    reports = [{'workers': 1, 'tiles': 1, 'latency_ms_mean': round(1000 * baseline, 1), 'speedup': 1.0}]
+    for workers in worker_counts:
+        engine = LocalEngine(workers, **options)
+        engine.warm(wait=True)
+        tiler = TileOCR(engine, tile_size, overlap)
+
+        def read_tiled(image_bytes):
+            return tiler.recognize(Image.open(io.BytesIO(image_bytes)).convert('RGB'))[1]
+        try:
+            latency, tiled = timed_mean(read_tiled, frames)
+        finally:
+            engine.close()
+        matched = in_whole = in_tiled = 0
+        for reference, words in zip(whole, tiled):
+            m, r, c = word_agreement(reference, words)
+            matched, in_whole, in_tiled = matched + m, in_whole + r, in_tiled + c
+        reports.append({
+            'workers': workers,
+            'tiles': len(tiler.plan(Image.open(io.BytesIO(frames[0][0])).size)),
+            'latency_ms_mean': round(1000 * latency, 1),
+            'speedup': round(baseline / latency, 2) if latency else None,
+            'precision': round(matched / in_tiled, 3) if in_tiled else 0.0,
+            'recall': round(matched / in_whole, 3) if in_whole else 0.0,
+        })
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OCR engines on the same frames")
+    parser.add_argument('recordings', nargs='?', help="AGENT_RECORD_DIR, or a single session directory")
+    parser.add_argument('--live', type=int, default=0, help="Capture this many frames of the host screen instead")
+    parser.add_argument('--engines', default='vision,tesseract', help="Comma-separated; the first is the reference")
+    parser.add_argument('--scaling', help="Comma-separated worker counts: measure tile-parallel Tesseract instead")
+    args = parser.parse_args()
+
+    frames = live_frames(args.live) if args.live else load_frames(args.recordings) if args.recordings else []
+    if not frames:
+        print("No frames to compare (give a recordings directory or --live N)")
+        return
+    if args.scaling:
+        print(f"Tile scaling on {len(frames)} frame(s)")
+        reports = tile_scaling(frames, [int(count) for count in args.scaling.split(',')], lang=TESSERACT_LANG,
+                               scale=TESSERACT_SCALE, min_confidence=TESSERACT_MIN_CONFIDENCE)
+        for report in reports:
+            print(json.dumps(report))
+        return
+    print(f"Comparing on {len(frames)} frame(s)")
+    reference = None
+    for name in args.engines.split(','):
+        engine = create_ocr_engine(name, workers=OCR_LOCAL_WORKERS, lang=TESSERACT_LANG,
+                                   scale=TESSERACT_SCALE, min_confidence=TESSERACT_MIN_CONFIDENCE)
+        engine.warm(wait=True)   # time recognition, not worker start-up
+        try:
+            report, results = evaluate(engine, frames, reference)
+        finally:
+            engine.close()
+        reference = results if reference is None else reference
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
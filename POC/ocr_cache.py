@@ -0,0 +1,170 @@
+"""
+Persistent, content-addressed OCR cache.
+
+The same application screens come back run after run, and each time the
+identical pixels used to be sent to Google Vision again. This cache maps a
+hash of the pixels to the raw Vision words (and separately to the
+post-processed annotations), so known screens cost no OCR round trip at all.
+
+Storage is a SQLite database in WAL mode. It survives restarts, and several
+agent processes can share it safely; SQLite's own locking serializes writers.
+Entries are zlib-compressed JSON. Total size is capped, and the least
+recently used entries are evicted first. The total is kept as a counter
+row, updated in the same transaction as each insert and eviction, so a put
+never sums the whole table. Hit/miss counts and the upload bytes saved are
+kept both per process and persistently in the database. Lookups are counted
+in memory and written every flush_every lookups, on stats() and at exit.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+def content_hash(*parts):
+    """Hex digest identifying the given byte strings"""
+    digest = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class OCRCache:
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, timeout=10.0, flush_every=50):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.flush_every = flush_every
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.session = {'hits': 0, 'misses': 0, 'bytes_saved': 0}
+        self._pending = dict.fromkeys(self.session, 0)   # counts not yet written to the database
+        with self._connect() as db:
+            db.execute('''CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )''')
+            db.execute('CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)')
+            db.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            # Running total of entry sizes; a cache created before it existed is summed once here
+            db.execute("INSERT OR IGNORE INTO counters (name, value) "
+                       "SELECT 'entry_bytes', COALESCE(SUM(size), 0) FROM entries")
+        atexit.register(self.flush)
+
+    def _connect(self):
+        """One connection per thread (sqlite3 connections are not shareable across threads)"""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def get(self, key):
+        """Cached value for key (refreshing its LRU position), or None"""
+        db = self._connect()
+        row = db.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            with db:
+                db.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+        except sqlite3.OperationalError:
+            pass  # another process holds the write lock; the LRU position can wait
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key, value):
+        """Store value (JSON-serializable) under key, then evict down to the size cap"""
+        blob = zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+        db = self._connect()
+        with db:
+            db.execute('BEGIN IMMEDIATE')   # the replaced size is read under the write lock
+            replaced = db.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            db.execute('INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)',
+                       (key, blob, len(blob), time.time()))
+            total = self._add_bytes(db, len(blob) - (replaced[0] if replaced else 0))
+            if total > self.max_bytes:
+                self._evict(db, total - self.max_bytes)
+
+    def _add_bytes(self, db, amount):
+        """Adjust the running total of entry sizes (inside the caller's transaction); returns the new total"""
+        db.execute("UPDATE counters SET value = value + ? WHERE name = 'entry_bytes'", (amount,))
+        return db.execute("SELECT value FROM counters WHERE name = 'entry_bytes'").fetchone()[0]
+
+    def _evict(self, db, excess):
+        # Oldest first, walking the last_access index
+        freed = 0
+        victims = []
+        for key, size in db.execute('SELECT key, size FROM entries ORDER BY last_access'):
+            if freed >= excess:
+                break
+            victims.append((key,))
+            freed += size
+        db.executemany('DELETE FROM entries WHERE key = ?', victims)
+        self._add_bytes(db, -freed)
+
+    def record(self, hit, bytes_saved=0):
+        """Count a lookup; bytes_saved is the Vision upload a hit avoided"""
+        name = 'hits' if hit else 'misses'
+        with self._lock:
+            for counts in (self.session, self._pending):
+                counts[name] += 1
+                counts['bytes_saved'] += bytes_saved
+            due = self._pending['hits'] + self._pending['misses'] >= self.flush_every
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Add the lookups counted since the last flush to the persistent counters"""
+        with self._lock:
+            pending, self._pending = self._pending, dict.fromkeys(self._pending, 0)
+        if not any(pending.values()):
+            return
+        db = self._connect()
+        try:
+            with db:
+                db.executemany('INSERT INTO counters (name, value) VALUES (?, ?) '
+                               'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+                               [item for item in pending.items() if item[1]])
+        except sqlite3.OperationalError as e:
+            print(f"[OCR Cache] Could not update counters: {e}")
+            with self._lock:
+                for name, amount in pending.items():
+                    self._pending[name] += amount   # retried with the next flush
+
+    def stats(self):
+        self.flush()
+        db = self._connect()
+        entries = db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        persistent = dict(db.execute('SELECT name, value FROM counters').fetchall())
+        with self._lock:
+            session = dict(self.session)
+
+        def with_rate(counts):
+            lookups = counts.get('hits', 0) + counts.get('misses', 0)
+            return {
+                'hits': counts.get('hits', 0),
+                'misses': counts.get('misses', 0),
+                'hit_rate': round(counts.get('hits', 0) / lookups, 3) if lookups else 0.0,
+                'bytes_saved': counts.get('bytes_saved', 0),
+            }
+
+        return {
+            'path': self.path,
+            'entries': entries,
+            'bytes': persistent.get('entry_bytes', 0),
+            'max_bytes': self.max_bytes,
+            'session': with_rate(session),
+            'lifetime': with_rate(persistent),
+        }
@@ -0,0 +1,289 @@
+"""
+Pluggable OCR engines.
+
+The agent loop used to call Google Vision directly. Every step paid a
+network round trip, and the module would not import without Vision
+credentials. An OCREngine recognizes PNG bytes and returns
+(full_text, words). Words are (text, [[x, y] * 4]) pairs in pixels of the
+image sent: the shape vision_words produces and OCRFrame.from_words and
+the merge stage consume. Engines are interchangeable behind the OCR cache.
+
+- VisionEngine: Google Cloud Vision TEXT_DETECTION. Crops are sent as one
+  batched request.
+- LocalEngine: Tesseract on the CPU, in a pool of warm worker processes.
+  Each worker loads the model once (tesserocr keeps the API open). It falls
+  back to pytesseract, which runs the tesseract binary per image. Recognition
+  runs outside the agent process, so it neither holds the GIL nor needs
+  network access.
+
+OCR_ENGINE picks the engine per deployment. ocr_benchmark runs several
+engines on the same frames and compares latency and agreement.
+"""
+
+import asyncio
+import importlib.util
+import io
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+
+
+class OCRError(Exception):
+    """Recognition failed; the result must not be cached"""
+
+
+class OCREngine:
+    name = 'base'
+    remote = False        # True when recognition is a network call
+    cache_prefix = ''     # OCR cache keys are per engine
+
+    def recognize(self, image_bytes):
+        """(full_text, words) of one PNG; raises OCRError"""
+        raise NotImplementedError
+
+    def recognize_batch(self, images):
+        return [self.recognize(image) for image in images]
+
+    async def arecognize(self, image_bytes):
+        return await asyncio.to_thread(self.recognize, image_bytes)
+
+    async def arecognize_batch(self, images):
+        return list(await asyncio.gather(*(self.arecognize(image) for image in images)))
+
+    def warm(self, wait=False):
+        """Start whatever the first recognition would otherwise wait for"""
+
+    def close(self):
+        pass
+
+
+class VisionEngine(OCREngine):
+    name = 'vision'
+    remote = True
+
+    def __init__(self):
+        # Check for Google Cloud Vision API key
+        credentials = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
+        if not credentials or not os.path.exists(credentials):
+            raise RuntimeError("Google Cloud Vision API key not found. Please set the GOOGLE_APPLICATION_CREDENTIALS environment variable to your service account JSON file.")
+        from google.cloud import vision
+        self.vision = vision
+        self.client = vision.ImageAnnotatorClient()
+        self._async_client = None
+
+    def async_client(self):
+        """The async Vision client, created on first use (its grpc.aio channel binds to the running loop)"""
+        if self._async_client is None:
+            self._async_client = self.vision.ImageAnnotatorAsyncClient()
+        return self._async_client
+
+    def request(self, image_bytes):
+        return self.vision.AnnotateImageRequest(
+            image=self.vision.Image(content=image_bytes),
+            features=[self.vision.Feature(type_=self.vision.Feature.Type.TEXT_DETECTION)]
+        )
+
+    @staticmethod
+    def result(response):
+        from ocr_frame import vision_words
+        if response.error.message:
+            raise OCRError(f"Vision error: {response.error.message}")
+        texts = response.text_annotations
+        return (texts[0].description if texts else ""), vision_words(texts[1:])
+
+    def recognize(self, image_bytes):
+        return self.result(self.client.text_detection(image=self.vision.Image(content=image_bytes)))
+
+    def recognize_batch(self, images):
+        response = self.client.batch_annotate_images(requests=[self.request(image) for image in images])
+        return [self.result(result) for result in response.responses]
+
+    async def arecognize(self, image_bytes):
+        return (await self.arecognize_batch([image_bytes]))[0]
+
+    async def arecognize_batch(self, images):
+        response = await self.async_client().batch_annotate_images(requests=[self.request(image) for image in images])
+        return [self.result(result) for result in response.responses]
+
+
+def tesseract_words(rows, min_confidence=50, scale=1.0):
+    """
+    (full_text, words) from Tesseract word rows (text, confidence, left, top,
+    width, height, line_key), recognized on an image enlarged by scale.
+    Words below min_confidence are dropped. The full text has one line per
+    line_key, in reading order.
+    """
+    words = []
+    lines = {}
+    for text, confidence, left, top, width, height, line in rows:
+        text = str(text).strip()
+        if not text or float(confidence) < min_confidence:
+            continue
+        x1, y1 = left / scale, top / scale
+        x2, y2 = (left + width) / scale, (top + height) / scale
+        words.append((text, [[round(x1), round(y1)], [round(x2), round(y1)], [round(x2), round(y2)], [round(x1), round(y2)]]))
+        lines.setdefault(line, []).append(text)
+    return '\n'.join(' '.join(line) for line in lines.values()), words
+
+
+def pytesseract_rows(data):
+    """Word rows from pytesseract.image_to_data(..., output_type=Output.DICT)"""
+    return [
+        (data['text'][i], data['conf'][i], data['left'][i], data['top'][i], data['width'][i], data['height'][i],
+         (data['block_num'][i], data['par_num'][i], data['line_num'][i]))
+        for i in range(len(data['text'])) if data['level'][i] == 5
+    ]
+
+
+class TesseractBackend:
+    """Tesseract in the current process: tesserocr (model kept loaded) or pytesseract"""
+
+    def __init__(self, lang='eng', psm=11, scale=2.0, min_confidence=50):
+        self.lang = lang
+        self.psm = psm                      # 11: sparse text, suits UI screens better than page layout
+        self.scale = scale                  # UI text is small; Tesseract reads it better enlarged
+        self.min_confidence = min_confidence
+        try:
+            import tesserocr
+            self.tesserocr = tesserocr
+            self.api = tesserocr.PyTessBaseAPI(lang=lang, psm=tesserocr.PSM(psm))
+        except ImportError:
+            import pytesseract
+            self.tesserocr = None
+            self.pytesseract = pytesseract
+
+    def _image(self, image_bytes):
+        from PIL import Image
+        image = Image.open(io.BytesIO(image_bytes)).convert('L')
+        if self.scale != 1.0:
+            image = image.resize((round(image.width * self.scale), round(image.height * self.scale)),
+                                 Image.Resampling.BICUBIC)
+        return image
+
+    def _tesserocr_rows(self, image):
+        RIL = self.tesserocr.RIL
+        self.api.SetImage(image)
+        self.api.Recognize()
+        rows = []
+        line = 0
+        iterator = self.api.GetIterator()
+        for word in self.tesserocr.iterate_level(iterator, RIL.WORD):
+            if word.IsAtBeginningOf(RIL.TEXTLINE):
+                line += 1
+            box = word.BoundingBox(RIL.WORD)
+            if box is None:
+                continue
+            x1, y1, x2, y2 = box
+            rows.append((word.GetUTF8Text(RIL.WORD), word.Confidence(RIL.WORD), x1, y1, x2 - x1, y2 - y1, line))
+        return rows
+
+    def recognize(self, image_bytes):
+        image = self._image(image_bytes)
+        if self.tesserocr is not None:
+            rows = self._tesserocr_rows(image)
+        else:
+            data = self.pytesseract.image_to_data(image, lang=self.lang, config=f'--psm {self.psm}',
+                                                  output_type=self.pytesseract.Output.DICT)
+            rows = pytesseract_rows(data)
+        return tesseract_words(rows, self.min_confidence, self.scale)
+
+
+# The backend of a LocalEngine worker process, created once by its initializer
+_worker_backend = None
+
+
+def _init_worker(options):
+    global _worker_backend
+    _worker_backend = TesseractBackend(**options)
+
+
+def _recognize_in_worker(image_bytes):
+    try:
+        return _worker_backend.recognize(image_bytes)
+    except Exception as e:
+        raise OCRError(f"Tesseract error: {e!r}")
+
+
+class LocalEngine(OCREngine):
+    name = 'tesseract'
+    cache_prefix = 'tesseract:'
+
+    def __init__(self, workers=1, **options):
+        self.workers = workers
+        self.options = options      # TesseractBackend arguments
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            # spawn: the agent process runs threads, which fork does not copy safely
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.options,)
+            )
+        return self._executor
+
+    def warm(self, wait=False):
+        """Start the worker processes and load the model; wait=True blocks until they are ready"""
+        if multiprocessing.parent_process() is not None:
+            return  # a spawned child re-imports the agent modules; it must not start workers of its own
+        if self._executor is not None and not wait:
+            return
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('L', (8, 8), 255).save(buffer, format='PNG')
+        futures = [self._pool().submit(_recognize_in_worker, buffer.getvalue()) for _ in range(self.workers)]
+        if wait:
+            for future in futures:
+                try:
+                    future.result()
+                except (OCRError, BrokenProcessPool) as e:
+                    print(f"[OCR] Local engine not ready: {e!r}")
+
+    def _broken(self, error):
+        # A worker died or could not load Tesseract; release the broken pool and start fresh workers on the next call
+        self.close()
+        return OCRError(f"Tesseract worker failed: {error!r}")
+
+    def recognize(self, image_bytes):
+        try:
+            return self._pool().submit(_recognize_in_worker, image_bytes).result()
+        except BrokenProcessPool as e:
+            raise self._broken(e)
+
+    def recognize_batch(self, images):
+        try:
+            return list(self._pool().map(_recognize_in_worker, images))
+        except BrokenProcessPool as e:
+            raise self._broken(e)
+
+    async def arecognize(self, image_bytes):
+        # Awaits the worker directly; no thread is parked on the result
+        try:
+            return await asyncio.wrap_future(self._pool().submit(_recognize_in_worker, image_bytes))
+        except BrokenProcessPool as e:
+            raise self._broken(e)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def local_engine_available():
+    """Whether a Tesseract backend can load: tesserocr, or pytesseract with the tesseract binary on PATH"""
+    if importlib.util.find_spec('tesserocr') is not None:
+        return True
+    return importlib.util.find_spec('pytesseract') is not None and shutil.which('tesseract') is not None
+
+
+def create_ocr_engine(name='vision', workers=1, **options):
+    """OCR engine by name: 'vision' (Google Cloud Vision) or 'tesseract' (local CPU)"""
+    if name == 'vision':
+        return VisionEngine()     # the local-engine options do not apply
+    if name in ('tesseract', 'local'):
+        return LocalEngine(workers, **options)
+    raise ValueError(f"Unknown OCR engine: {name}")
@@ -0,0 +1,191 @@
+"""
+Array-backed container for OCR elements.
+
+An OCRFrame stores one screen's words or merged UI elements as NumPy
+struct-of-arrays (text list, centers, boxes, merge counts, instance indices)
+instead of one dict with a nested bbox dict per element. The dict shape used
+by the prompt builder, click lookup and web UI is produced lazily, only when
+something actually iterates the frame or needs JSON.
+"""
+
+import numpy as np
+
+
+class OCRFrame:
+    __slots__ = ('text', 'centers', 'boxes', 'merged_from', 'index', 'total_instances', '_dicts', '_index')
+
+    def __init__(self, text, centers, boxes, merged_from=None, index=None, total_instances=None):
+        count = len(text)
+        self.text = list(text)
+        self.centers = np.asarray(centers, dtype=np.int32).reshape(count, 2)  # x, y
+        self.boxes = np.asarray(boxes, dtype=np.int32).reshape(count, 4)      # x1, y1, x2, y2
+        # merged_from == 1 means a single word (no 'merged_from' key in the dict shape)
+        self.merged_from = np.ones(count, dtype=np.int32) if merged_from is None else np.asarray(merged_from, dtype=np.int32)
+        self.index = np.zeros(count, dtype=np.int32) if index is None else np.asarray(index, dtype=np.int32)
+        self.total_instances = np.ones(count, dtype=np.int32) if total_instances is None else np.asarray(total_instances, dtype=np.int32)
+        self._dicts = None
+        self._index = None
+
+    @classmethod
+    def empty(cls):
+        return cls([], np.empty((0, 2)), np.empty((0, 4)))
+
+    @classmethod
+    def from_vision(cls, texts, scale_x, scale_y, offset_x=0, offset_y=0):
+        """
+        Build a word-level frame from Vision text annotations (texts[1:] of a
+        response), in screen coordinates. offset_x/offset_y are the screenshot-pixel
+        origin of the image the annotations came from, for OCR run on a crop.
+        """
+        return cls.from_words(vision_words(texts), scale_x, scale_y, offset_x, offset_y)
+
+    @classmethod
+    def from_words(cls, words, scale_x, scale_y, offset_x=0, offset_y=0):
+        """Build a word-level frame from raw (text, vertices) pairs in screenshot pixels (see vision_words)"""
+        if not words:
+            return cls.empty()
+        points = np.asarray([vertices for _, vertices in words], dtype=np.float64) + (offset_x, offset_y)  # (n, 4, 2)
+        scale = np.array([scale_x, scale_y])
+        # Scale to screen coordinates
+        centers = (points.mean(axis=1) * scale).astype(np.int32)
+        boxes = np.concatenate([points.min(axis=1) * scale, points.max(axis=1) * scale], axis=1).astype(np.int32)
+        return cls([text for text, _ in words], centers, boxes)
+
+    @classmethod
+    def from_dicts(cls, elements):
+        """Build a frame from the legacy list-of-dicts annotation shape"""
+        return cls(
+            [e['text'] for e in elements],
+            [(e['x'], e['y']) for e in elements],
+            [(e['bbox']['x1'], e['bbox']['y1'], e['bbox']['x2'], e['bbox']['y2']) for e in elements],
+            [e.get('merged_from', 1) for e in elements],
+            [e.get('index', 0) for e in elements],
+            [e.get('total_instances', 1) for e in elements],
+        )
+
+    @classmethod
+    def concatenate(cls, frames):
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return cls.empty()
+        return cls(
+            [t for frame in frames for t in frame.text],
+            np.concatenate([frame.centers for frame in frames]),
+            np.concatenate([frame.boxes for frame in frames]),
+            np.concatenate([frame.merged_from for frame in frames]),
+            np.concatenate([frame.index for frame in frames]),
+            np.concatenate([frame.total_instances for frame in frames]),
+        )
+
+    @property
+    def x(self):
+        return self.centers[:, 0]
+
+    @property
+    def y(self):
+        return self.centers[:, 1]
+
+    @property
+    def widths(self):
+        return self.boxes[:, 2] - self.boxes[:, 0]
+
+    @property
+    def heights(self):
+        return self.boxes[:, 3] - self.boxes[:, 1]
+
+    def select(self, indices):
+        """Return a new frame holding the given elements (index array or boolean mask)"""
+        indices = np.asarray(indices)
+        indices = np.flatnonzero(indices) if indices.dtype == bool else indices.astype(np.intp)
+        return OCRFrame(
+            [self.text[i] for i in indices],
+            self.centers[indices],
+            self.boxes[indices],
+            self.merged_from[indices],
+            self.index[indices],
+            self.total_instances[indices],
+        )
+
+    def intersects(self, region):
+        """Boolean mask of elements whose box overlaps region (x1, y1, x2, y2)"""
+        boxes = self.boxes
+        # Zero-size boxes still need to hit the region they sit in
+        x2 = np.maximum(boxes[:, 2], boxes[:, 0] + 1)
+        y2 = np.maximum(boxes[:, 3], boxes[:, 1] + 1)
+        return (boxes[:, 0] < region[2]) & (region[0] < x2) & (boxes[:, 1] < region[3]) & (region[1] < y2)
+
+    def union_groups(self, groups):
+        """
+        Merge each group of element indices into one element: boxes are unioned,
+        texts joined in x order and centers recomputed from the union box.
+        """
+        order = np.concatenate([np.asarray(group) for group in groups])
+        starts = np.cumsum([0] + [len(group) for group in groups[:-1]])
+        boxes = self.boxes[order]
+        union = np.stack([
+            np.minimum.reduceat(boxes[:, 0], starts),
+            np.minimum.reduceat(boxes[:, 1], starts),
+            np.maximum.reduceat(boxes[:, 2], starts),
+            np.maximum.reduceat(boxes[:, 3], starts),
+        ], axis=1)
+        centers = np.stack([(union[:, 0] + union[:, 2]) // 2, (union[:, 1] + union[:, 3]) // 2], axis=1)
+        text = [' '.join(self.text[i] for i in group) for group in groups]
+        return OCRFrame(text, centers, union, [len(group) for group in groups])
+
+    def to_dicts(self):
+        """The legacy annotation shape (list of dicts), built once and memoized"""
+        if self._dicts is None:
+            dicts = []
+            for text, (x, y), (x1, y1, x2, y2), merged, index, total in zip(
+                self.text, self.centers.tolist(), self.boxes.tolist(),
+                self.merged_from.tolist(), self.index.tolist(), self.total_instances.tolist()
+            ):
+                ann = {
+                    'text': text,
+                    'x': x,
+                    'y': y,
+                    'bbox': {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2},
+                    'width': x2 - x1,
+                    'height': y2 - y1,
+                }
+                if merged > 1:
+                    ann['merged_from'] = merged
+                ann['index'] = index
+                ann['total_instances'] = total
+                dicts.append(ann)
+            self._dicts = dicts
+        return self._dicts
+
+    def text_index(self):
+        """Lookup index over the element texts (see text_index), built once and memoized"""
+        if self._index is None:
+            from text_index import TextIndex
+            self._index = TextIndex(self.to_dicts())
+        return self._index
+
+    def __len__(self):
+        return len(self.text)
+
+    def __iter__(self):
+        return iter(self.to_dicts())
+
+    def __getitem__(self, item):
+        return self.to_dicts()[item]
+
+    def __repr__(self):
+        return f"OCRFrame({len(self)} elements)"
+
+
+def vision_words(texts):
+    """Raw (text, [[x, y] * 4]) pairs from Vision text annotations, in screenshot pixels (JSON-friendly)"""
+    words = []
+    for text in texts:
+        text_content = text.description.strip()
+        if text_content:
+            words.append((text_content, [[vertex.x, vertex.y] for vertex in text.bounding_poly.vertices]))
+    return words
+
+
+def as_dicts(value):
+    """Serialize an OCRFrame to the legacy list-of-dicts shape; other values pass through"""
+    return value.to_dicts() if isinstance(value, OCRFrame) else value
@@ -0,0 +1,215 @@
+"""
+OCR post-processing: turn raw word boxes into clickable UI elements.
+
+Kept free of any OCR backend so the filtering/merging rules can be reused for
+full-frame and incremental OCR alike, and exercised without API credentials.
+All stages take and return OCRFrame instances.
+"""
+
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+# Filter out UI control elements that shouldn't be clicked
+UI_CONTROL_WORDS = {
+    'stop', 'start', 'pause', 'reset', 'clear', 'close', 'exit', 'quit',
+    'cancel', 'abort', 'terminate', 'kill', 'end', 'finish', 'done',
+    'refresh', 'reload', 'update', 'save', 'load', 'import', 'export'
+}
+
+# Common UI elements that should not be merged with others
+UI_ELEMENT_WORDS = {
+    'images', 'videos', 'news', 'maps', 'books', 'flights', 'finance',
+    'all', 'web', 'search', 'home', 'back', 'forward', 'reload',
+    'file', 'edit', 'view', 'help', 'tools', 'options', 'settings',
+    'profile', 'account', 'login', 'logout', 'sign', 'register'
+}
+
+# Parameters for merging - much more conservative for UI elements
+MAX_HORIZONTAL_GAP = 30  # pixels between words horizontally (reduced from 80)
+MAX_VERTICAL_GAP = 15    # pixels between words vertically (reduced from 25)
+MAX_HEIGHT_DIFF = 10     # max height difference for same line (reduced from 20)
+
+_INF = float('inf')
+
+
+def filter_text_elements(frame, screen_height):
+    """Drop UI controls and short elements in the top/bottom edge bands"""
+    if not len(frame):
+        return frame
+    # Skip if it's a single word that matches UI controls
+    is_control = np.array([
+        text.lower().strip() in UI_CONTROL_WORDS and len(text.split()) == 1
+        for text in frame.text
+    ])
+    # Skip if it's positioned in typical UI control areas (top/bottom edges)...
+    in_edge_band = (frame.y < 50) | (frame.y > screen_height - 100)
+    # ...but allow it if it's clearly part of the main content
+    is_content = (frame.widths > 200) | (np.array([len(text) for text in frame.text]) > 10)
+    edge_ui = ~is_control & in_edge_band & ~is_content
+
+    for i in np.flatnonzero(is_control):
+        print(f"[OCR Filter] Skipping UI control: '{frame.text[i]}'")
+    for i in np.flatnonzero(edge_ui):
+        print(f"[OCR Filter] Skipping edge UI element: '{frame.text[i]}' at y={frame.y[i]}")
+
+    return frame.select(~is_control & ~edge_ui)
+
+
+def _merges_with(text, x, y, x1, x2, other_text, other_x, other_y, other_x1, other_x2):
+    """The pairwise merge rule: can the other word join the group anchored at this one?"""
+    # Check if elements are on roughly the same line
+    height_diff = abs(y - other_y)
+    if height_diff > MAX_HEIGHT_DIFF:
+        return False
+
+    # Check horizontal distance
+    if x < other_x:
+        gap = other_x1 - x2
+    else:
+        gap = x1 - other_x2
+
+    # Much more conservative merging - only merge if very close
+    if gap > MAX_HORIZONTAL_GAP or gap < -5:  # Reduced overlap tolerance
+        return False
+
+    # Additional check: don't merge if both elements are short (likely UI elements)
+    if len(text) <= 8 and len(other_text) <= 8:
+        # For short elements, require even smaller gap
+        if gap > 15:  # Very small gap for short elements
+            return False
+        # Check if either element is a UI element that shouldn't be merged
+        if (text.lower().strip() in UI_ELEMENT_WORDS or other_text.lower().strip() in UI_ELEMENT_WORDS):
+            # Don't merge UI elements like tabs
+            print(f"[OCR Merge] Skipping merge of UI elements: '{text}' and '{other_text}'")
+            return False
+
+    # For longer elements, use normal gap
+    return True
+
+
+class _RowBuckets:
+    """
+    Words bucketed into horizontal rows of MAX_HEIGHT_DIFF pixels, each row
+    kept sorted by left and right bbox edge. Any word within MAX_HEIGHT_DIFF
+    of a given y lives in that y's row or one of its two neighbours.
+    """
+
+    def __init__(self, ys, x1s, x2s):
+        rows = {}
+        # Sweep top to bottom, dropping each word into its row
+        for j in sorted(range(len(ys)), key=ys.__getitem__):
+            rows.setdefault(ys[j] // MAX_HEIGHT_DIFF, []).append(j)
+        self.rows = {}
+        for key, members in rows.items():
+            by_x1 = sorted((x1s[j], j) for j in members)
+            by_x2 = sorted((x2s[j], j) for j in members)
+            self.rows[key] = (by_x1, by_x2)
+
+    def neighbors(self, y, x1, x2):
+        """Indices of words whose gap to the box (x1, x2) at y could fall within the merge tolerance"""
+        key = y // MAX_HEIGHT_DIFF
+        found = set()
+        for row_key in (key - 1, key, key + 1):
+            row = self.rows.get(row_key)
+            if row is None:
+                continue
+            by_x1, by_x2 = row
+            # Words to the right: gap = other.x1 - x2
+            lo = bisect_left(by_x1, (x2 - 5, -1))
+            hi = bisect_right(by_x1, (x2 + MAX_HORIZONTAL_GAP, _INF))
+            found.update(j for _, j in by_x1[lo:hi])
+            # Words to the left: gap = x1 - other.x2
+            lo = bisect_left(by_x2, (x1 - MAX_HORIZONTAL_GAP, -1))
+            hi = bisect_right(by_x2, (x1 + 5, _INF))
+            found.update(j for _, j in by_x2[lo:hi])
+        return found
+
+
+def merge_text_elements(frame):
+    """
+    Merge nearby words on the same line into multi-word UI elements.
+
+    Each ungrouped word (in input order) anchors a group and absorbs every
+    later ungrouped word that passes _merges_with against the anchor. Instead
+    of testing all pairs, candidates come from row buckets and x-sorted
+    neighbour scans, so the pass is O(n log n) on dense screens.
+    """
+    if not len(frame):
+        return frame
+    texts = frame.text
+    xs, ys = frame.x.tolist(), frame.y.tolist()
+    x1s, x2s = frame.boxes[:, 0].tolist(), frame.boxes[:, 2].tolist()
+    buckets = _RowBuckets(ys, x1s, x2s)
+
+    groups = []
+    used_indices = set()
+    for i in range(len(texts)):
+        if i in used_indices:
+            continue
+
+        # Start a new group
+        group = [i]
+        used_indices.add(i)
+
+        # Find nearby elements horizontally (likely same line), in input order
+        for j in sorted(buckets.neighbors(ys[i], x1s[i], x2s[i])):
+            if j in used_indices:
+                continue
+            if _merges_with(texts[i], xs[i], ys[i], x1s[i], x2s[i], texts[j], xs[j], ys[j], x1s[j], x2s[j]):
+                group.append(j)
+                used_indices.add(j)
+
+        # Sort group by x position
+        group.sort(key=xs.__getitem__)
+        groups.append(group)
+
+    # Single words are carried over as-is; multi-word groups get a unioned box
+    merged = frame.select([group[0] for group in groups])
+    multi = [k for k, group in enumerate(groups) if len(group) > 1]
+    if multi:
+        unions = frame.union_groups([groups[k] for k in multi])
+        merged.centers[multi] = unions.centers
+        merged.boxes[multi] = unions.boxes
+        merged.merged_from[multi] = unions.merged_from
+        for k, text in zip(multi, unions.text):
+            merged.text[k] = text
+    return merged
+
+
+def tag_instances(frame):
+    """Add index/total_instances for identical text and sort in reading order"""
+    text_groups = {}
+    for i, text_content in enumerate(frame.text):
+        text_groups.setdefault(text_content, []).append(i)
+
+    # Add instance info, grouping identical text together
+    order = [i for instances in text_groups.values() for i in instances]
+    index = np.zeros(len(frame), dtype=np.int32)
+    total = np.ones(len(frame), dtype=np.int32)
+    for instances in text_groups.values():
+        if len(instances) > 1:
+            index[instances] = np.arange(len(instances))
+            total[instances] = len(instances)
+    tagged = frame.select(order)
+    tagged.index = index[order]
+    tagged.total_instances = total[order]
+
+    # Sort by y position (top to bottom) then x position (left to right); lexsort is stable
+    return tagged.select(np.lexsort((tagged.x, tagged.y)))
+
+
+def build_annotations(words, screen_height):
+    """Run the full filter -> merge -> instance tagging pipeline on a word-level OCRFrame"""
+    words = filter_text_elements(words, screen_height)
+    merged_elements = merge_text_elements(words)
+    annotations = tag_instances(merged_elements)
+
+    # Debug output
+    print(f"[OCR Debug] Found {len(merged_elements)} merged elements from {len(words)} individual words")
+    for i in range(min(10, len(annotations))):  # Show first 10
+        merged_from = annotations.merged_from[i]
+        merged_info = f" (merged from {merged_from} words)" if merged_from > 1 else ""
+        print(f"  {i+1}. '{annotations.text[i]}' at ({annotations.x[i]}, {annotations.y[i]}){merged_info}")
+
+    return annotations
@@ -0,0 +1,195 @@
+"""
+Rank OCR annotations by relevance to the goal.
+
+The agent used to spend a second gpt-4o vision call per step just to order
+the OCR elements. LexicalRanker does the same job in-process in a few
+milliseconds by combining:
+
+- BM25 over the annotation words, queried with the goal (plus what was typed)
+- character trigram similarity, so OCR misspellings still match
+- a phrase bonus when a multi-word annotation appears verbatim in the goal
+- a weak spatial prior towards the middle of the screen
+- a recency bonus for text that was not on screen at the previous step
+- a penalty for targets that were already clicked twice
+
+LLMRanker keeps the old behaviour as an opt-in strategy (OCR_RANKER=llm).
+Both share the rank() interface, so ranker_benchmark can replay the same
+recorded sessions through each of them.
+"""
+
+import asyncio
+import math
+import re
+from collections import Counter
+
+from ocr_frame import as_dicts
+
+_WORD = re.compile(r"\w+")
+STOPWORDS = frozenset({'a', 'an', 'and', 'the', 'to', 'of', 'in', 'on', 'for', 'with', 'my', 'me', 'please', 'then', 'or', 'it'})
+
+
+def tokenize(text):
+    return [token for token in _WORD.findall(text.lower()) if token not in STOPWORDS]
+
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigram_similarity(a, b):
+    """Jaccard similarity of the character trigrams of two tokens"""
+    ta, tb = trigrams(a), trigrams(b)
+    return len(ta & tb) / len(ta | tb)
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+class OCRRanker:
+    """Interface: order annotations by relevance to the goal"""
+
+    name = 'base'
+    remote = False  # True when rank() makes a network call (worth running concurrently)
+
+    def rank(self, goal, annotations, actions_taken=(), image_b64=None):
+        """Return the relevant annotations as dicts, most relevant first"""
+        raise NotImplementedError
+
+    async def arank(self, goal, annotations, actions_taken=(), image_b64=None):
+        """rank() for the async engine; local rankers are fast enough to run on the loop"""
+        return self.rank(goal, annotations, actions_taken, image_b64)
+
+    def reset(self):
+        """Forget per-run state before a new goal"""
+
+
+class LexicalRanker(OCRRanker):
+    name = 'lexical'
+
+    def __init__(self, top_k=40, k1=1.2, b=0.75, fuzzy_threshold=0.45,
+                 phrase_weight=1.5, spatial_weight=0.2, recency_weight=0.3, repeat_penalty=1.0):
+        self.top_k = top_k
+        self.k1 = k1
+        self.b = b
+        self.fuzzy_threshold = fuzzy_threshold  # trigram similarity below this is ignored
+        self.phrase_weight = phrase_weight
+        self.spatial_weight = spatial_weight
+        self.recency_weight = recency_weight
+        self.repeat_penalty = repeat_penalty
+        self._previous = None                   # annotation keys seen at the previous step
+
+    def reset(self):
+        self._previous = None
+
+    @staticmethod
+    def _key(ann):
+        # Coarse position so a word that shifts a few pixels still counts as "old"
+        return normalize(ann['text']), ann['x'] // 32, ann['y'] // 32
+
+    def _query(self, goal, actions_taken):
+        """Weighted query terms: the goal, plus typed text at half weight"""
+        query = Counter(tokenize(goal))
+        for action in actions_taken:
+            if action.get('action') == 'type':
+                for token in tokenize(str(action.get('text', ''))):
+                    query[token] += 0.5
+        return query
+
+    def _bm25(self, query, docs):
+        n = len(docs)
+        avg_len = sum(len(doc) for doc in docs) / n or 1.0
+        df = Counter(token for doc in docs for token in set(doc))
+        scores = []
+        for doc in docs:
+            tf = Counter(doc)
+            score = 0.0
+            for term, weight in query.items():
+                freq = tf.get(term)
+                if not freq:
+                    continue
+                idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+                score += weight * idf * freq * (self.k1 + 1) / (freq + self.k1 * (1 - self.b + self.b * len(doc) / avg_len))
+            scores.append(score)
+        return scores
+
+    def _fuzzy(self, query, doc):
+        """Best trigram match per query term (exact hits are BM25's job)"""
+        score = 0.0
+        for term, weight in query.items():
+            if len(term) < 3:
+                continue
+            best = max((trigram_similarity(term, token) for token in doc if token != term and len(token) >= 3), default=0.0)
+            if best >= self.fuzzy_threshold:
+                score += weight * best
+        return score
+
+    def rank(self, goal, annotations, actions_taken=(), image_b64=None):
+        annotations = as_dicts(annotations)
+        if not annotations:
+            self._previous = set()
+            return []
+        query = self._query(goal, actions_taken)
+        goal_text = normalize(goal)
+        clicks = Counter(normalize(str(a.get('target', ''))) for a in actions_taken if a.get('action') == 'click_text')
+
+        docs = [tokenize(ann['text']) for ann in annotations]
+        bm25 = self._bm25(query, docs)
+        top = max(bm25) or 1.0
+
+        xs = [ann['x'] for ann in annotations]
+        ys = [ann['y'] for ann in annotations]
+        cx, cy = (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+        reach = math.hypot(max(xs) - cx, max(ys) - cy) or 1.0
+
+        keys = [self._key(ann) for ann in annotations]
+        previous = self._previous
+
+        scored = []
+        for i, ann in enumerate(annotations):
+            text = normalize(ann['text'])
+            score = bm25[i] / top + self._fuzzy(query, docs[i])
+            if len(docs[i]) > 1 and text in goal_text:
+                score += self.phrase_weight
+            score += self.spatial_weight * (1 - math.hypot(ann['x'] - cx, ann['y'] - cy) / reach)
+            if previous is not None and keys[i] not in previous:
+                score += self.recency_weight
+            if clicks.get(text, 0) >= 2:
+                score -= self.repeat_penalty
+            scored.append((score, i))
+
+        self._previous = set(keys)
+        # Stable on ties: reading order wins
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [annotations[i] for _, i in scored[:self.top_k]]
+
+
+class LLMRanker(OCRRanker):
+    """The gpt-4o selector call, kept as an opt-in strategy"""
+
+    name = 'llm'
+    remote = True
+
+    def __init__(self, select_fn, async_select_fn=None):
+        self.select_fn = select_fn              # select_relevant_ocr_elements(goal, annotations, image_b64)
+        self.async_select_fn = async_select_fn  # coroutine variant used by the async engine
+
+    def rank(self, goal, annotations, actions_taken=(), image_b64=None):
+        return self.select_fn(goal, annotations, image_b64)
+
+    async def arank(self, goal, annotations, actions_taken=(), image_b64=None):
+        if self.async_select_fn is None:
+            return await asyncio.to_thread(self.rank, goal, annotations, actions_taken, image_b64)
+        return await self.async_select_fn(goal, annotations, image_b64)
+
+
+def create_ranker(name, select_fn=None, async_select_fn=None):
+    """Build the ranker configured by OCR_RANKER ('lexical' or 'llm')"""
+    if name == 'llm':
+        if select_fn is None:
+            raise ValueError("The llm ranker needs the selector function")
+        return LLMRanker(select_fn, async_select_fn)
+    if name == 'lexical':
+        return LexicalRanker()
+    raise ValueError(f"Unknown OCR ranker: {name}")
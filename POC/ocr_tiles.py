@@ -0,0 +1,264 @@
+"""
+Tile-parallel OCR for large screens.
+
+A local engine reads one image on one core, so on a 4K or multi-monitor
+desktop a full-frame OCR dominates the step. TileOCR cuts the frame into
+a grid of overlapping tiles and sends them to the engine as one batch.
+A LocalEngine's warm worker pool recognizes the batch in parallel. The
+words of all tiles are then stitched back into one word list in frame
+pixels, which the usual merge stage (build_annotations) consumes.
+
+Each tile owns a core area. Tiles overlap by `overlap` pixels at every
+inner seam, so a word that crosses a seam is usually read whole by at
+least one tile. A word that touches a tile's inner edge (a cut) is a
+piece. Stitching then works in three steps:
+
+1. Whole words are deduplicated: a word read by two tiles in their
+   shared strip is kept once.
+2. Pieces that lie inside a kept whole word are dropped.
+3. Pieces left over belong to a word no tile read whole. Pieces on the
+   same line are joined left to right, and the text they both read in
+   the overlap is only kept once.
+
+Only words near a seam can be duplicates or pieces. A whole word that
+lies inside its tile's core is kept without any comparison. The other
+words are compared only with words in the same cells of a coarse spatial
+grid, so stitching stays linear on dense 4K screens.
+"""
+
+import asyncio
+import io
+import math
+
+
+def plan_tiles(width, height, tile_size=1024, overlap=128):
+    """
+    Overlapping tiles covering a width x height image, in reading order.
+    Returns (tile, core) box pairs (x1, y1, x2, y2). The cores partition the
+    image; each tile is its core grown by overlap // 2 at the inner seams.
+    """
+    cols = max(1, math.ceil(width / tile_size))
+    rows = max(1, math.ceil(height / tile_size))
+    xs = [round(width * i / cols) for i in range(cols + 1)]
+    ys = [round(height * i / rows) for i in range(rows + 1)]
+    grow = overlap // 2
+    tiles = []
+    for row in range(rows):
+        for col in range(cols):
+            core = (xs[col], ys[row], xs[col + 1], ys[row + 1])
+            tile = (max(0, core[0] - grow), max(0, core[1] - grow),
+                    min(width, core[2] + grow), min(height, core[3] + grow))
+            tiles.append((tile, core))
+    return tiles
+
+
+def encode_tiles(image, tiles):
+    """PNG bytes of each tile of a PIL image (fast compression: the bytes only travel to a local worker)"""
+    pngs = []
+    for tile, _ in tiles:
+        buffer = io.BytesIO()
+        image.crop(tile).save(buffer, format='PNG', compress_level=1)
+        pngs.append(buffer.getvalue())
+    return pngs
+
+
+def _area(box):
+    return max(0, box[2] - box[0]) * max(0, box[3] - box[1])
+
+
+def _overlap(a, b):
+    return _area((max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])))
+
+
+def _vertical_overlap(a, b):
+    return max(0, min(a[3], b[3]) - max(a[1], b[1])) / max(1, min(a[3] - a[1], b[3] - b[1]))
+
+
+def _vertices(box):
+    x1, y1, x2, y2 = box
+    return [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+
+
+class TileWord:
+    """A word of one tile, in frame pixels"""
+
+    def __init__(self, text, box, tile, cut, owned=False):
+        self.text = text
+        self.box = box      # (x1, y1, x2, y2)
+        self.tile = tile    # position of the tile that read it
+        self.cut = cut      # touches an inner edge of its tile, so it may be truncated
+        self.owned = owned  # inside its tile's core: no other tile can read it whole
+
+
+def tile_words(tiles, results, width, height, edge=3):
+    """TileWords of every tile's (full_text, words) result, moved to frame pixels"""
+    found = []
+    for position, ((tile, core), (_, words)) in enumerate(zip(tiles, results)):
+        tx1, ty1, tx2, ty2 = tile
+        for text, vertices in words:
+            xs = [x for x, _ in vertices]
+            ys = [y for _, y in vertices]
+            box = (tx1 + min(xs), ty1 + min(ys), tx1 + max(xs), ty1 + max(ys))
+            cut = ((tx1 > 0 and box[0] - tx1 <= edge) or (tx2 < width and tx2 - box[2] <= edge) or
+                   (ty1 > 0 and box[1] - ty1 <= edge) or (ty2 < height and ty2 - box[3] <= edge))
+            owned = core[0] <= box[0] and core[1] <= box[1] and box[2] <= core[2] and box[3] <= core[3]
+            found.append(TileWord(text, box, position, cut, owned and not cut))
+    return found
+
+
+def join_texts(left, right, left_box, right_box):
+    """
+    The text of a word read as two pieces, left one first. Both pieces read
+    the overlap of their boxes, so about that share of right's characters
+    is already at the end of left. The longest suffix of left that starts
+    right is dropped from right when its length fits that estimate (a
+    coincidental one-letter match does not); otherwise the estimate is.
+    """
+    shared = max(0, left_box[2] - right_box[0]) / max(1, right_box[2] - right_box[0])
+    expected = shared * len(right)
+    a, b = left.lower(), right.lower()
+    for size in range(min(len(a), len(b)), 0, -1):
+        if a.endswith(b[:size]) and abs(size - expected) < 1 + expected / 2:
+            return left + right[size:]
+    return left + right[round(expected):]
+
+
+def _stitch_group(pieces):
+    """One (text, box) from pieces that are parts of the same word"""
+    pieces = sorted(pieces, key=lambda piece: piece.box[0])
+    side_by_side = all(
+        _vertical_overlap(a.box, b.box) >= 0.5 and b.box[0] > a.box[0] and b.box[2] > a.box[2]
+        for a, b in zip(pieces, pieces[1:])
+    )
+    if not side_by_side:
+        # Cut across its height: keep the piece that shows most of the glyphs
+        best = max(pieces, key=lambda piece: _area(piece.box))
+        return best.text, best.box
+    text, box = pieces[0].text, pieces[0].box
+    for piece in pieces[1:]:
+        text = join_texts(text, piece.text, box, piece.box)
+        box = (min(box[0], piece.box[0]), min(box[1], piece.box[1]),
+               max(box[2], piece.box[2]), max(box[3], piece.box[3]))
+    return text, box
+
+
+class _Grid:
+    """Items bucketed by the coarse cells their boxes cover"""
+
+    def __init__(self, cell=128):
+        self.cell = cell
+        self.cells = {}
+
+    def _keys(self, box):
+        cell = self.cell
+        for cx in range(int(box[0] // cell), int(box[2] // cell) + 1):
+            for cy in range(int(box[1] // cell), int(box[3] // cell) + 1):
+                yield cx, cy
+
+    def add(self, item, box):
+        for key in self._keys(box):
+            self.cells.setdefault(key, []).append(item)
+
+    def near(self, box):
+        """Items sharing a cell with box, each once"""
+        seen = set()
+        for key in self._keys(box):
+            for item in self.cells.get(key, ()):
+                if item not in seen:
+                    seen.add(item)
+                    yield item
+
+
+def stitch_words(found, edge=3, cell=128):
+    """Deduplicated (text, box) pairs of the TileWords of all tiles"""
+    kept = _Grid(cell)
+    keep = []
+    for word in found:
+        if word.owned:
+            kept.add(word, word.box)
+            keep.append(word)
+    for word in found:
+        if word.cut or word.owned:
+            continue
+        # The same word read whole by the neighbouring tile (possibly read a little differently)
+        duplicate = any(
+            other.tile != word.tile and _overlap(word.box, other.box) >= 0.5 * min(_area(word.box), _area(other.box))
+            for other in kept.near(word.box)
+        )
+        if not duplicate:
+            kept.add(word, word.box)
+            keep.append(word)
+    keep = set(keep)
+
+    pieces = [word for word in found if word.cut and not any(
+        _overlap(word.box, other.box) >= 0.5 * _area(word.box) for other in kept.near(word.box)
+    )]
+    # Group the pieces of each word: boxes that touch, from different tiles (union-find over the grid)
+    parent = list(range(len(pieces)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    placed = _Grid(cell)
+    for i, piece in enumerate(pieces):
+        grown = (piece.box[0] - edge, piece.box[1] - edge, piece.box[2] + edge, piece.box[3] + edge)
+        for j in placed.near(grown):
+            if pieces[j].tile != piece.tile and _overlap(grown, pieces[j].box) > 0:
+                parent[root(j)] = root(i)
+        placed.add(i, piece.box)
+    groups = {}
+    for i, piece in enumerate(pieces):
+        groups.setdefault(root(i), []).append(piece)
+
+    return ([(word.text, word.box) for word in found if word in keep] +
+            [_stitch_group(group) for group in groups.values()])
+
+
+def reading_text(words):
+    """Full text of (text, box) words: one line per row of text, top to bottom, left to right"""
+    lines = []
+    for text, box in sorted(words, key=lambda word: ((word[1][1] + word[1][3]) / 2, word[1][0])):
+        center = (box[1] + box[3]) / 2
+        if lines and abs(center - lines[-1][0]) <= (box[3] - box[1]) / 2:
+            lines[-1][1].append((box[0], text))
+        else:
+            lines.append((center, [(box[0], text)]))
+    return '\n'.join(' '.join(text for _, text in sorted(line)) for _, line in lines)
+
+
+def stitch_tiles(tiles, results, width, height, edge=3):
+    """(full_text, words) of the whole image from the per-tile OCR results, words as (text, vertices)"""
+    words = stitch_words(tile_words(tiles, results, width, height, edge), edge)
+    return reading_text(words), [(text, _vertices(box)) for text, box in words]
+
+
+class TileOCR:
+    def __init__(self, engine, tile_size=1024, overlap=128, edge=3):
+        self.engine = engine
+        self.tile_size = tile_size  # longest tile side before overlap, in screenshot pixels
+        self.overlap = overlap      # width of the strip two neighbouring tiles both read
+        self.edge = edge            # a word this close to a cut counts as a piece
+
+    def plan(self, size):
+        return plan_tiles(size[0], size[1], self.tile_size, self.overlap)
+
+    def applies(self, size):
+        """Whether an image of this size is split at all"""
+        return len(self.plan(size)) > 1
+
+    def recognize(self, image):
+        """(full_text, words, request bytes) of a PIL image, recognized tile by tile; raises OCRError"""
+        tiles = self.plan(image.size)
+        pngs = encode_tiles(image, tiles)
+        results = self.engine.recognize_batch(pngs)
+        return stitch_tiles(tiles, results, image.width, image.height, self.edge) + (sum(map(len, pngs)),)
+
+    async def arecognize(self, image):
+        tiles = self.plan(image.size)
+        pngs = await asyncio.to_thread(encode_tiles, image, tiles)
+        results = await self.engine.arecognize_batch(pngs)
+        full_text, words = await asyncio.to_thread(stitch_tiles, tiles, results, image.width, image.height, self.edge)
+        return full_text, words, sum(map(len, pngs))
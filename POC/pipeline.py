@@ -0,0 +1,100 @@
+"""
+Stage timing for the agent loop.
+
+Each step records how long every stage (capture, ocr, select, action, execute,
+settle, ...) took. When stages overlap, as in the pipelined loop, their sum
+exceeds the step's wall-clock time. The difference is the time saved compared
+with running the same stages one after another. The serial loop records the
+same figures, so both modes can be compared directly.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class StepTiming:
+    def __init__(self, step):
+        self.step = step
+        self.stages = {}          # stage name -> seconds (summed if a stage runs twice)
+        self.metrics = {}         # other per-step figures, e.g. time_to_first_action
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage; safe to use from several threads at once"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def metric(self, name, seconds):
+        with self._lock:
+            self.metrics[name] = seconds
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def summary(self):
+        with self._lock:
+            stages = dict(self.stages)
+            metrics = dict(self.metrics)
+        serial = sum(stages.values())
+        wall = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        return {
+            'step': self.step,
+            'stages': {name: round(seconds, 3) for name, seconds in stages.items()},
+            'serial_s': round(serial, 3),
+            'wall_s': round(wall, 3),
+            'saved_s': round(max(0.0, serial - wall), 3),
+            **{f'{name}_s': round(seconds, 3) for name, seconds in metrics.items()},
+        }
+
+
+class PipelineReport:
+    """Rolling per-step summaries plus run totals"""
+
+    def __init__(self, mode, keep=20):
+        self.mode = mode
+        self.steps = deque(maxlen=keep)
+        self.total_serial = 0.0
+        self.total_wall = 0.0
+        self.speculation_hits = 0
+        self.speculation_misses = 0
+        self.first_action_total = 0.0
+        self.first_action_steps = 0
+
+    def add(self, timing):
+        summary = timing.summary()
+        self.steps.append(summary)
+        self.total_serial += summary['serial_s']
+        self.total_wall += summary['wall_s']
+        if 'time_to_first_action_s' in summary:
+            self.first_action_total += summary['time_to_first_action_s']
+            self.first_action_steps += 1
+        return summary
+
+    def to_dict(self):
+        saved = max(0.0, self.total_serial - self.total_wall)
+        return {
+            'mode': self.mode,
+            'steps': list(self.steps),
+            'total_serial_s': round(self.total_serial, 3),
+            'total_wall_s': round(self.total_wall, 3),
+            'saved_s': round(saved, 3),
+            'saved_ratio': round(saved / self.total_serial, 3) if self.total_serial else 0.0,
+            'speculation_hits': self.speculation_hits,
+            'speculation_misses': self.speculation_misses,
+            'avg_time_to_first_action_s': (
+                round(self.first_action_total / self.first_action_steps, 3) if self.first_action_steps else None
+            ),
+        }
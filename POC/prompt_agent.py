@@ -1,6 +1,8 @@
 from openai import AzureOpenAI
 from config import AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT
 from safety_constants import SAFETY_PROMPT, SAFETY_REFUSAL_MESSAGE
+from prompts import COMMAND_SYSTEM_PROMPT, OPPOSITE_SYSTEM_PROMPT, planner_messages
+from llm_usage import llm_usage
 import json
 import re
 import ast
@@ -44,63 +46,24 @@ def check_moderation_scores(response):
                         return False
     return True
 
-def get_command_steps(prompt):
+def system_context():
+    """The OS and installed apps, sent after the static system prompts so their prefix stays cacheable"""
     try:
-        from system_info import get_system_info, get_best_app_for_task
-        system_info = get_system_info()
-        os_type = system_info['os']
-        
-        # Build dynamic context from actual system
-        available_apps_text = ""
-        for category, apps in system_info['available_apps'].items():
-            if apps:
-                available_apps_text += f"{category}: {', '.join(apps[:2])}; "
-        
-        current_os_info = f"{os_type} with {system_info.get('desktop_environment', 'unknown')} desktop"
-        if available_apps_text:
-            current_os_info += f". Available apps: {available_apps_text.rstrip('; ')}"
+        from system_info import system_info_provider
+        return system_info_provider.planner_context()
     except ImportError:
         # Fallback if system_info module isn't available
         import platform
         os_type = platform.system().lower()
-        current_os_info = f"{os_type} system"
-    
-    system_prompt = (
-        f"You are an intelligent OS automation agent running on {os_type} ({current_os_info}). "
-        "Convert user tasks into a JSON list of step objects with smart context awareness. "
-        "Each step should have an 'action' key and relevant parameters. "
-        
-        "Available actions: "
-        "- open_app: Opens applications (be smart about app names for different OS) "
-        "- search: Opens web browser with search query "
-        "- type: Types text "
-        "- press: Presses keyboard keys "
-        "- file_search: Searches for files with glob patterns "
-        "- file_copy: Copies files (src, dst) "
-        "- file_move: Moves files (src, destination_path) "
-        "- select_file: Selects a file for operations "
-        "- locate_file: Finds files by name in directory "
-        "- navigate: Changes directory "
-        "- open_file: Opens files with default application "
-        
-        "Be intelligent about: "
-        "1. App names (calculator vs gnome-calculator vs kcalc) "
-        "2. File paths (use ~ for home, expand common folder names) "
-        "3. Combining multiple actions for complex tasks "
-        "4. Error handling and alternative approaches "
-        
-        "Example: [{\"action\": \"open_app\", \"app\": \"calculator\"}, {\"action\": \"search\", \"query\": \"weather forecast\"}]"
-    )
+        return f"{os_type} ({os_type} system)"
 
+def get_command_steps(prompt):
     response = client.chat.completions.create(
         model="gpt-4.1-nano",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "system", "content": SAFETY_PROMPT},
-            {"role": "user", "content": prompt}
-        ],
+        messages=planner_messages(COMMAND_SYSTEM_PROMPT, system_context(), prompt, static_messages=[SAFETY_PROMPT]),
         temperature=0.2
     )
+    llm_usage.record('command', response.usage)
     
     # TODO: Re-enable safety checks for Azure OpenAI
     # # Check if the response is flagged by OpenAI's safety systems
@@ -140,62 +103,12 @@ def get_command_steps(prompt):
 
 
 def get_opposite_command_steps(command_steps):
-    try:
-        from system_info import get_system_info, get_best_app_for_task
-        system_info = get_system_info()
-        os_type = system_info['os']
-        
-        # Build dynamic context from actual system
-        available_apps_text = ""
-        for category, apps in system_info['available_apps'].items():
-            if apps:
-                available_apps_text += f"{category}: {', '.join(apps[:2])}; "
-        
-        current_os_info = f"{os_type} with {system_info.get('desktop_environment', 'unknown')} desktop"
-        if available_apps_text:
-            current_os_info += f". Available apps: {available_apps_text.rstrip('; ')}"
-    except ImportError:
-        # Fallback if system_info module isn't available
-        import platform
-        os_type = platform.system().lower()
-        current_os_info = f"{os_type} system"
-    
-    system_prompt = (
-        f"You are an intelligent OS automation agent running on {os_type} ({current_os_info}). "
-        "Convert the following steps JSON list into a steps JSON list of the opposite steps. Use valid JSON and use smart context awareness. "
-        "Each step should have an 'action' key and relevant parameters. "
-        
-        "Available actions: "
-        "- open_app: Opens applications (be smart about app names for different OS) "
-        "- search: Opens web browser with search query "
-        "- type: Types text "
-        "- press: Presses keyboard keys "
-        "- file_search: Searches for files with glob patterns "
-        "- file_copy: Copies files (src, dst) "
-        "- file_move: Moves files (src, destination_path) "
-        "- select_file: Selects a file for operations "
-        "- locate_file: Finds files by name in directory "
-        "- navigate: Changes directory "
-        "- open_file: Opens files with default application "
-        
-        "Be intelligent about: "
-        "1. App names (calculator vs gnome-calculator vs kcalc) "
-        "2. File paths (use ~ for home, expand common folder names) "
-        "3. Combining multiple actions for complex tasks "
-        "4. Error handling and alternative approaches "
-        
-        "Example: input [{\"action\": \"open_app\", \"app\": \"calculator\"}, {\"action\": \"search\", \"query\": \"weather forecast\"}]"
-        "Example: output [{\"action\": \"close_app\", \"app\": \"calculator\"}, {\"action\": \"close_tab\", \"query\": \"weather forecast\"}]"
-    )
-
     response = client.chat.completions.create(
         model="gpt-4.1-nano",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": json.dumps(command_steps)}
-        ],
+        messages=planner_messages(OPPOSITE_SYSTEM_PROMPT, system_context(), json.dumps(command_steps)),
         temperature=0.2
     )
+    llm_usage.record('opposite', response.usage)
     # Try to extract JSON from the response
     content = response.choices[0].message.content
 
@@ -0,0 +1,163 @@
+"""
+Token-budgeted prompt compiler.
+
+The action prompt used to inline the whole action history as indented JSON
+and one verbose line per OCR element, so it grew with both the step count
+and the screen density. The compiler fills a template under a fixed token
+budget:
+
+- the last few actions are kept verbatim (compact JSON, one per line); all
+  older ones are folded into a short rolling summary
+- OCR elements become rows of a compact table, packed in ranked order
+  until the budget is used up; the rest are dropped and counted
+- the token count of the result is reported alongside the text
+
+The static system prompt (see prompts.py) is sent ahead of the compiled
+text. It can be passed as prefix so its tokens count against the budget,
+but it is never part of the filled template.
+
+Tokens are counted with tiktoken when it is installed; otherwise a
+conservative estimate is used (see estimate_tokens).
+"""
+
+import json
+import math
+import re
+from collections import Counter
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding('o200k_base')   # gpt-4o
+except ImportError:
+    _ENCODING = None
+
+_PIECE = re.compile(r"\w+|[^\w\s]+")
+
+
+def estimate_tokens(text):
+    """Rough GPT token count: ~4 characters per word piece, ~2 per run of punctuation"""
+    total = 0
+    for piece in _PIECE.findall(text):
+        total += math.ceil(len(piece) / (4 if piece[0].isalnum() or piece[0] == '_' else 2))
+    return total + text.count('\n')
+
+
+def count_tokens(text):
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return estimate_tokens(text)
+
+
+OCR_TABLE_HEADER = "id|text|x|y|instance"
+
+
+def ocr_row(position, ann):
+    """One OCR element as a table row; instance is 'k/n' when the text appears n times"""
+    text = ' '.join(str(ann['text']).split()).replace('|', '/')
+    instance = f"{ann.get('index', 0) + 1}/{ann['total_instances']}" if ann.get('total_instances', 1) > 1 else ''
+    return f"{position}|{text}|{ann['x']}|{ann['y']}|{instance}"
+
+
+def describe_action(action):
+    kind = action.get('action')
+    if kind == 'type':
+        text = str(action.get('text', ''))
+        return f"typed '{text[:40]}{'...' if len(text) > 40 else ''}'"
+    if kind == 'press':
+        keys = action.get('keys')
+        keys = [keys] if isinstance(keys, str) else keys or []
+        return f"pressed {'+'.join(str(key) for key in keys)}"
+    if kind == 'click_text':
+        return f"clicked '{action.get('target', '')}'"
+    return kind or 'unknown'
+
+
+def summarize_actions(actions, max_items=12):
+    """Rolling summary of older actions: distinct actions in first-seen order, with repeat counts"""
+    if not actions:
+        return ''
+    counts = Counter(describe_action(action) for action in actions)
+    items = [f"{text} x{count}" if count > 1 else text for text, count in counts.items()]
+    if len(items) > max_items:
+        items = items[:max_items] + [f"{len(items) - max_items} other distinct actions"]
+    return f"Steps 1-{len(actions)} (summarized): " + '; '.join(items)
+
+
+class CompiledPrompt:
+    def __init__(self, text, tokens, budget, ocr_included, ocr_total, actions_verbatim, actions_summarized,
+                 prefix_tokens=0):
+        self.text = text
+        self.tokens = tokens                    # prefix plus text
+        self.prefix_tokens = prefix_tokens
+        self.budget = budget
+        self.ocr_included = ocr_included
+        self.ocr_total = ocr_total
+        self.actions_verbatim = actions_verbatim
+        self.actions_summarized = actions_summarized
+
+    def report(self):
+        return {
+            'tokens': self.tokens,
+            'prefix_tokens': self.prefix_tokens,
+            'budget': self.budget,
+            'exact': _ENCODING is not None,
+            'ocr_included': self.ocr_included,
+            'ocr_total': self.ocr_total,
+            'actions_verbatim': self.actions_verbatim,
+            'actions_summarized': self.actions_summarized,
+        }
+
+
+class PromptCompiler:
+    def __init__(self, budget=3000, recent_actions=5, count=count_tokens):
+        self.budget = budget                    # tokens for the whole prompt text
+        self.recent_actions = recent_actions    # newest actions kept verbatim
+        self.count = count
+
+    def history(self, actions_taken):
+        """Older actions summarized, the newest ones verbatim"""
+        if not actions_taken:
+            return "(none yet)", 0, 0
+        split = max(0, len(actions_taken) - self.recent_actions)
+        lines = []
+        if split:
+            lines.append(summarize_actions(actions_taken[:split]))
+        for step, action in enumerate(actions_taken[split:], start=split + 1):
+            lines.append(f"{step}. {json.dumps(action, separators=(',', ':'))}")
+        return '\n'.join(lines), len(actions_taken) - split, split
+
+    def ocr(self, ocr_annotations, budget):
+        """The OCR table, highest ranked rows first, within budget tokens"""
+        if not ocr_annotations:
+            return "- NO TEXT ELEMENTS DETECTED ON SCREEN", 0
+        rows = [OCR_TABLE_HEADER]
+        # Reserve room for the omission note
+        remaining = budget - self.count(OCR_TABLE_HEADER) - 16
+        included = 0
+        for position, ann in enumerate(ocr_annotations, start=1):
+            row = ocr_row(position, ann)
+            cost = self.count(row) + 1
+            if cost > remaining:
+                break
+            rows.append(row)
+            remaining -= cost
+            included += 1
+        omitted = len(ocr_annotations) - included
+        if omitted:
+            rows.append(f"({omitted} lower-ranked elements omitted)")
+        return '\n'.join(rows), included
+
+    def compile(self, template, actions_taken, ocr_annotations, prefix='', **fields):
+        """
+        Fill template ({history}, {ocr} and any other str.format fields)
+        within the budget, less the tokens of prefix. The prefix, the fixed
+        text and the history are always kept; OCR rows get whatever budget
+        is left.
+        """
+        prefix_tokens = self.count(prefix) if prefix else 0
+        history, verbatim, summarized = self.history(actions_taken)
+        fixed = template.format(history=history, ocr='', **fields)
+        ocr_text, included = self.ocr(ocr_annotations, self.budget - prefix_tokens - self.count(fixed))
+        text = template.format(history=history, ocr=ocr_text, **fields)
+        return CompiledPrompt(text, prefix_tokens + self.count(text), self.budget, included, len(ocr_annotations),
+                              verbatim, summarized, prefix_tokens)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Replay recorded agent sessions through OCR rankers and compare them.
+
+    python ranker_benchmark.py recordings/ --rankers lexical,llm
+
+For every recorded step the ranker is timed. For each click_text step, the
+benchmark checks whether the target the agent actually clicked is in the
+ranked list, and at which position. Success rate is the share of clicks
+whose target survived ranking (the action LLM can only click listed text),
+and MRR is the mean reciprocal rank of that target. The recorded actions
+come from whatever ranker was live when the session was recorded, so compare
+rankers on the same sessions rather than across recordings.
+"""
+
+import argparse
+import json
+import time
+
+from ocr_ranker import create_ranker, normalize
+from session_recorder import find_sessions, load_session
+
+
+def target_rank(target, ranked):
+    """Position of the clicked target in a ranked list, or None"""
+    target = normalize(target)
+    for position, ann in enumerate(ranked):
+        text = normalize(ann['text'])
+        if text == target or target in text:
+            return position
+    return None
+
+
+def evaluate(ranker, sessions):
+    latencies = []
+    clicks = hits = hits_at_5 = 0
+    reciprocal_ranks = 0.0
+    for directory in sessions:
+        ranker.reset()
+        for entry in load_session(directory):
+            start = time.perf_counter()
+            ranked = ranker.rank(entry['goal'], entry['ocr_annotations'], entry['actions_taken'], entry['image_b64'])
+            latencies.append(time.perf_counter() - start)
+            action = entry['action']
+            if action.get('action') != 'click_text':
+                continue
+            clicks += 1
+            position = target_rank(str(action.get('target', '')), ranked)
+            if position is not None:
+                hits += 1
+                hits_at_5 += position < 5
+                reciprocal_ranks += 1 / (position + 1)
+    latencies.sort()
+    return {
+        'ranker': ranker.name,
+        'steps': len(latencies),
+        'clicks': clicks,
+        'success_rate': round(hits / clicks, 3) if clicks else None,
+        'hit_at_5': round(hits_at_5 / clicks, 3) if clicks else None,
+        'mrr': round(reciprocal_ranks / clicks, 3) if clicks else None,
+        'latency_ms_mean': round(1000 * sum(latencies) / len(latencies), 2) if latencies else None,
+        'latency_ms_p95': round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 2) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OCR rankers on recorded agent sessions")
+    parser.add_argument('recordings', help="AGENT_RECORD_DIR, or a single session directory")
+    parser.add_argument('--rankers', default='lexical', help="Comma-separated: lexical,llm")
+    args = parser.parse_args()
+
+    sessions = find_sessions(args.recordings)
+    if not sessions:
+        print(f"No recorded sessions found in {args.recordings}")
+        return
+    print(f"Replaying {len(sessions)} session(s)")
+    for name in args.rankers.split(','):
+        select_fn = None
+        if name == 'llm':
+            # Imported lazily: needs Vision/Azure credentials
+            from agent_loop import select_relevant_ocr_elements
+            select_fn = select_relevant_ocr_elements
+        print(json.dumps(evaluate(create_ranker(name, select_fn), sessions), indent=2))
+
+
+if __name__ == "__main__":
+    main()
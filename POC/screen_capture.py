@@ -0,0 +1,206 @@
+"""
+Long-lived screen capture service.
+
+Opening an mss context and enumerating monitors on every grab is wasted work,
+so the service keeps one mss handle and caches the monitor geometry and HiDPI
+scale factor. Geometry is re-read on the open handle when the grabbed size
+stops matching the cache, and the layout is re-checked every geometry_ttl
+seconds. The handle is reopened only when a grab fails, e.g. after the X
+connection was lost.
+
+On Linux, mss 7 keeps one X connection per thread in a class-level dict and
+falls back to the main thread's, whatever display the handle was opened for,
+so captures of two displays on a shared thread pool could read the wrong one.
+DisplayMSS owns the connection to its own display instead, and closes it
+with XCloseDisplay (mss's own close() releases nothing). All mss grabs run
+under mss's global lock, so one handle is safely shared by every thread.
+"""
+
+import sys
+import threading
+import time
+
+import mss
+
+from frame_encoder import FrameEncoder
+
+
+if sys.platform.startswith('linux'):
+    import ctypes
+
+    import mss.base
+    import mss.linux
+
+    class DisplayMSS(mss.linux.MSS):
+        """An mss handle bound to the X connection it opened for its display"""
+
+        __slots__ = {'_display', '_closed'}
+
+        def __init__(self, display=None):
+            self._display = None
+            self._closed = False
+            try:
+                super().__init__(display)
+            except Exception:
+                self.close()
+                raise
+
+        def _get_display(self, disp=None):
+            # mss passes the display name only on the first call, from __init__
+            if self._display is None:
+                if self._closed:
+                    raise mss.ScreenShotError("Capture handle is closed")
+                display = self.xlib.XOpenDisplay(disp)
+                if not display:
+                    raise mss.ScreenShotError(f"Cannot open display {disp!r}")
+                self._display = display
+            return self._display
+
+        def close(self):
+            # Under mss's lock, so no grab is using the connection while it closes
+            with mss.base.lock:
+                self._closed = True
+                if self._display:
+                    self.xlib.XCloseDisplay.argtypes = [ctypes.POINTER(mss.linux.Display)]
+                    self.xlib.XCloseDisplay(self._display)
+                self._display = None
+else:
+    DisplayMSS = None
+
+
+def open_mss(display=None):
+    """An mss handle for an X display (e.g. ':1'); None uses the default"""
+    if DisplayMSS is not None:
+        return DisplayMSS(display)
+    return mss.mss()
+
+
+class Frame:
+    """A raw capture plus the metadata needed to map it back to screen coordinates"""
+
+    __slots__ = ('screenshot', 'monitor', 'scale_x', 'scale_y', 'timestamp', 'encodings')
+
+    def __init__(self, screenshot, monitor, scale_x, scale_y, timestamp):
+        self.screenshot = screenshot
+        self.monitor = monitor
+        self.scale_x = scale_x
+        self.scale_y = scale_y
+        self.timestamp = timestamp
+        # Memoized PNG/JPEG encodings shared by every consumer of this frame
+        self.encodings = FrameEncoder(self)
+
+    @property
+    def size(self):
+        return self.screenshot.size
+
+    @property
+    def width(self):
+        return self.screenshot.width
+
+    @property
+    def height(self):
+        return self.screenshot.height
+
+    @property
+    def bgra(self):
+        return self.screenshot.bgra
+
+    @property
+    def rgb(self):
+        return self.screenshot.rgb
+
+    @property
+    def screen_width(self):
+        return self.monitor['width']
+
+    @property
+    def screen_height(self):
+        return self.monitor['height']
+
+
+class ScreenCapture:
+    def __init__(self, monitor_index=1, display=None, geometry_ttl=5.0):
+        self.monitor_index = monitor_index
+        self.display = display            # X display (e.g. ':1'); None uses the default
+        self.geometry_ttl = geometry_ttl
+        self._sct = None                  # mss handle, shared by every capturing thread
+        self._lock = threading.Lock()
+        self._layout_lock = threading.Lock()
+        self._geometry = None             # (monitor, shot_size, scale_x, scale_y, cached_at)
+
+    def _handle(self, stale=None):
+        """The open mss handle; a stale handle (one that failed) is closed and replaced"""
+        with self._lock:
+            if stale is not None and self._sct is stale:
+                stale.close()
+                self._sct = None
+            if self._sct is None:
+                self._sct = open_mss(self.display)
+            return self._sct
+
+    def _read_monitor(self, sct):
+        """The monitor's current layout; mss caches the layout per handle, so the cache is dropped first"""
+        with self._layout_lock:
+            sct._monitors = []
+            return dict(sct.monitors[self.monitor_index])
+
+    def _refresh_geometry(self, sct):
+        """Re-read the monitor layout, grab once and cache the resulting scale"""
+        monitor = self._read_monitor(sct)
+        screenshot = sct.grab(monitor)
+        scale_x = monitor['width'] / screenshot.width
+        scale_y = monitor['height'] / screenshot.height
+        print(f"[Capture] Monitor: {monitor}, Screenshot: {screenshot.width}x{screenshot.height}, "
+              f"Scale: x={scale_x:.3f}, y={scale_y:.3f}")
+        with self._lock:
+            self._geometry = (monitor, screenshot.size, scale_x, scale_y, time.monotonic())
+        return screenshot
+
+    def _grab_cached(self, sct):
+        geometry = self._geometry
+        if geometry is None:
+            return self._refresh_geometry(sct)
+        monitor, size, scale_x, scale_y, checked_at = geometry
+        if time.monotonic() - checked_at > self.geometry_ttl:
+            # Monitors moved or resized without changing the grabbed size are caught here
+            if self._read_monitor(sct) != monitor:
+                return self._refresh_geometry(sct)
+            with self._lock:
+                self._geometry = (monitor, size, scale_x, scale_y, time.monotonic())
+        screenshot = sct.grab(monitor)
+        if screenshot.size != size:
+            # Display geometry changed under us
+            return self._refresh_geometry(sct)
+        return screenshot
+
+    def grab(self):
+        """Grab the monitor and return a Frame with its scale metadata"""
+        # Timestamp the start of the grab, so "captured after X" really means after
+        captured_at = time.time()
+        sct = self._handle()
+        try:
+            screenshot = self._grab_cached(sct)
+        except mss.ScreenShotError:
+            # The connection failed (or another thread replaced the handle): reopen and re-read
+            sct = self._handle(stale=sct)
+            screenshot = self._refresh_geometry(sct)
+        monitor, _, scale_x, scale_y, _ = self._geometry
+        return Frame(screenshot, monitor, scale_x, scale_y, captured_at)
+
+    def geometry(self):
+        """Return (monitor, scale_x, scale_y), grabbing once if nothing is cached yet"""
+        if self._geometry is None:
+            self.grab()
+        monitor, _, scale_x, scale_y, _ = self._geometry
+        return monitor, scale_x, scale_y
+
+    def close(self):
+        """Close the mss handle; a later grab opens a new one"""
+        with self._lock:
+            sct, self._sct = self._sct, None
+        if sct is not None:
+            sct.close()
+
+
+# Shared service for the default display
+screen_capture = ScreenCapture()
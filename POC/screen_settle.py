@@ -0,0 +1,113 @@
+"""
+Adaptive wait for the screen to settle after an action.
+
+The executor slept a fixed 2 s before every 'type' action, and the agent
+loop slept AGENT_STEP_DELAY after every step. On a fast screen that time
+is wasted; a slow app launch can outlast it. SettleDetector instead
+samples low-resolution grayscale frames and returns as soon as the
+screen has been stable for stable_window seconds. The wait is always
+bounded by timeout.
+
+An action does not always change the screen at once: a launcher can take
+a few hundred milliseconds to open its window. Until a first change has
+been seen, the screen must therefore stay quiet for the longer
+idle_window before it counts as settled. A blinking caret or a small
+spinner changes fewer pixels than change_fraction of the thumbnail, so it
+does not keep the wait going.
+"""
+
+import threading
+import time
+
+from PIL import ImageChops
+
+
+class SettleResult:
+    def __init__(self, waited, stable, changed, samples):
+        self.waited = waited      # seconds spent waiting
+        self.stable = stable      # False when the timeout ended the wait
+        self.changed = changed    # the screen changed at least once while waiting
+        self.samples = samples    # frames compared
+
+    def to_dict(self):
+        return {'waited_s': round(self.waited, 3), 'stable': self.stable,
+                'changed': self.changed, 'samples': self.samples}
+
+
+def changed_fraction(previous, current, pixel_threshold):
+    """Fraction of pixels of two same-sized grayscale images that differ by more than pixel_threshold"""
+    if previous.size != current.size:
+        return 1.0
+    diff = ImageChops.difference(previous, current).point(lambda v: 255 if v > pixel_threshold else 0)
+    return diff.histogram()[255] / (current.width * current.height)
+
+
+class SettleDetector:
+    def __init__(self, sample, stable_window=0.3, idle_window=0.6, timeout=3.0, interval=0.05,
+                 pixel_threshold=24, change_fraction=0.002, clock=time.monotonic, sleep=time.sleep):
+        self.sample = sample                    # () -> low-resolution grayscale PIL image of the screen
+        self.stable_window = stable_window      # quiet time after the last change
+        self.idle_window = idle_window          # quiet time when nothing changed yet
+        self.timeout = timeout
+        self.interval = interval                # pause between samples
+        self.pixel_threshold = pixel_threshold  # per-pixel grayscale delta treated as noise
+        self.change_fraction = change_fraction  # changed-pixel share that counts as a change
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.timeouts = 0
+        self.total_waited = 0.0
+
+    def wait(self, timeout=None):
+        """Block until the screen is stable (or the timeout passes) and return a SettleResult"""
+        timeout = self.timeout if timeout is None else timeout
+        start = self.clock()
+        previous = self.sample()
+        samples = 1
+        last_change = None
+        stable = False
+        while True:
+            now = self.clock()
+            quiet = now - (start if last_change is None else last_change)
+            if quiet >= (self.idle_window if last_change is None else self.stable_window):
+                stable = True
+                break
+            if now - start >= timeout:
+                break
+            self.sleep(min(self.interval, timeout - (now - start)))
+            current = self.sample()
+            samples += 1
+            if changed_fraction(previous, current, self.pixel_threshold) > self.change_fraction:
+                last_change = self.clock()
+            previous = current
+        result = SettleResult(self.clock() - start, stable, last_change is not None, samples)
+        with self._lock:
+            self.waits += 1
+            self.timeouts += 0 if stable else 1
+            self.total_waited += result.waited
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'avg_wait_s': round(self.total_waited / self.waits, 3) if self.waits else 0.0,
+            }
+
+
+def bus_sampler(bus, max_width=320, max_age=0.15):
+    """
+    Sample a frame bus as tiny grayscale thumbnails. While the bus producer
+    runs (someone is streaming the display), its newest frame is reused if
+    it is at most max_age seconds old; otherwise a frame is grabbed.
+    """
+    def sample():
+        latest = bus.latest()
+        if latest is not None and time.time() - latest[1].timestamp <= max_age:
+            frame = latest[1]
+        else:
+            frame = bus.fresh_frame()
+        return frame.encodings.sample_gray(max_width)
+    return sample
@@ -0,0 +1,66 @@
+"""
+Record agent runs for offline replay.
+
+With AGENT_RECORD_DIR set, every step of agent_autorun is appended to
+<dir>/<session id>/steps.jsonl, with the goal, the OCR annotations, the
+actions taken so far and the action the agent chose. The LLM screenshot is
+saved next to it as step_<n>.jpg. ranker_benchmark replays these sessions
+through different OCR rankers.
+"""
+
+import base64
+import json
+import os
+import time
+import uuid
+
+from ocr_frame import as_dicts
+
+
+class SessionRecorder:
+    def __init__(self, root, session_id=None):
+        self.session_id = session_id or time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6]
+        self.directory = os.path.join(root, self.session_id)
+        os.makedirs(self.directory, exist_ok=True)
+        self._steps_path = os.path.join(self.directory, 'steps.jsonl')
+
+    def record(self, step, goal, actions_taken, ocr_annotations, image_b64, action):
+        image_file = None
+        if image_b64:
+            image_file = f'step_{step}.jpg'
+            with open(os.path.join(self.directory, image_file), 'wb') as f:
+                f.write(base64.b64decode(image_b64))
+        entry = {
+            'step': step,
+            'goal': goal,
+            'actions_taken': actions_taken,
+            'ocr_annotations': as_dicts(ocr_annotations),
+            'image': image_file,
+            'action': action,
+        }
+        with open(self._steps_path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+
+def load_session(directory):
+    """Yield the recorded steps of one session, with image_b64 filled in"""
+    with open(os.path.join(directory, 'steps.jsonl')) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            entry['image_b64'] = None
+            if entry.get('image'):
+                with open(os.path.join(directory, entry['image']), 'rb') as img:
+                    entry['image_b64'] = base64.b64encode(img.read()).decode('utf-8')
+            yield entry
+
+
+def find_sessions(root):
+    """Session directories under root (or root itself if it is one), oldest first"""
+    if os.path.exists(os.path.join(root, 'steps.jsonl')):
+        return [root]
+    return sorted(
+        os.path.join(root, name) for name in os.listdir(root)
+        if os.path.exists(os.path.join(root, name, 'steps.jsonl'))
+    )
@@ -0,0 +1,129 @@
+"""
+Versioned agent state.
+
+Every assignment to a field bumps a global version and records it as that
+field's version, so "what changed since version N" is just the fields whose
+version exceeds N. No history is kept. This drives:
+
+- Socket.IO pushes of compact diffs (only the changed fields)
+- ETag / If-None-Match and long-poll on the REST endpoint, per projection
+- content-addressed blobs: big fields (screenshot, prompt) are replaced by a
+  hash reference and served separately, so browsers cache them and clients
+  that do not need them never download them
+
+Mutating a value in place (e.g. list.append) is invisible to the store;
+assign a new value instead.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class VersionedState:
+    def __init__(self, initial, blob_fields=None, serialize=None, max_blobs=32):
+        self._values = dict(initial)
+        self._field_versions = {key: 0 for key in self._values}
+        self.version = 0
+        # field -> (mimetype, to_bytes); non-empty values are served by hash
+        self.blob_fields = blob_fields or {}
+        self._serialize = serialize or (lambda value: value)
+        self._blob_refs = {}                # field -> digest of the current value
+        self._blobs = OrderedDict()         # digest -> (bytes, mimetype), LRU
+        self.max_blobs = max_blobs
+        self._cond = threading.Condition()
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __setitem__(self, key, value):
+        with self._cond:
+            old = self._values.get(key)
+            if key in self._values and (old is value or (_is_scalar(value) and old == value)):
+                return
+            self._values[key] = value
+            self.version += 1
+            self._field_versions[key] = self.version
+            if key in self.blob_fields:
+                self._store_blob(key, value)
+            self._cond.notify_all()
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def keys(self):
+        return self._values.keys()
+
+    def items(self):
+        return self._values.items()
+
+    def _store_blob(self, key, value):
+        if not value:
+            self._blob_refs.pop(key, None)
+            return
+        mimetype, to_bytes = self.blob_fields[key]
+        data = to_bytes(value)
+        digest = hashlib.sha1(data).hexdigest()
+        self._blob_refs[key] = digest
+        self._blobs[digest] = (data, mimetype)
+        self._blobs.move_to_end(digest)
+        while len(self._blobs) > self.max_blobs:
+            self._blobs.popitem(last=False)
+
+    def blob(self, digest):
+        """(bytes, mimetype) of a blob referenced by a recent state, or None"""
+        with self._cond:
+            return self._blobs.get(digest)
+
+    def blob_ref(self, key):
+        digest = self._blob_refs.get(key)
+        data, _ = self._blobs.get(digest, (b'', None))
+        return {'blob': digest, 'url': f'/api/agent/blob/{digest}', 'bytes': len(data)}
+
+    def field_version(self, fields=None):
+        """Version of the newest change among fields (all fields when None); the projection's ETag"""
+        with self._cond:
+            return self._projection_version(fields)
+
+    def _projection_version(self, fields):
+        if fields is None:
+            return self.version
+        return max((self._field_versions.get(key, 0) for key in fields), default=0)
+
+    def snapshot(self, fields=None, since=0, inline_blobs=True):
+        """
+        Return (version, values) with the fields changed after version `since`
+        (everything when 0), limited to `fields` if given. Blob fields are
+        inlined, or replaced by {'blob', 'url', 'bytes'} references.
+        """
+        with self._cond:
+            keys = self._values.keys() if fields is None else [key for key in fields if key in self._values]
+            values = {}
+            for key in keys:
+                if self._field_versions[key] <= since:
+                    continue
+                if not inline_blobs and key in self._blob_refs:
+                    values[key] = self.blob_ref(key)
+                else:
+                    values[key] = self._values[key]
+            version = self.version
+        return version, {key: self._serialize(value) for key, value in values.items()}
+
+    def wait(self, after_version, fields=None, timeout=30.0):
+        """Block until one of fields changes past after_version; False on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._projection_version(fields) <= after_version:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+
+def _is_scalar(value):
+    return value is None or isinstance(value, (str, bytes, int, float, bool))
@@ -0,0 +1,57 @@
+"""
+Incremental JSON object scanner for streamed LLM output.
+
+The action model answers with a single JSON object, possibly wrapped in prose
+or a ```json fence. Fed chunk by chunk, JSONObjectScanner tracks brace depth
+(ignoring braces inside strings) and returns the first top-level object the
+moment its closing brace arrives, so the caller can act on it and drop the
+rest of the stream.
+"""
+
+import json
+
+
+class JSONObjectScanner:
+    def __init__(self):
+        self.text = ''          # everything received so far
+        self._pos = 0           # next character to scan
+        self._start = None      # index of the '{' opening the current object
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk):
+        """Add a chunk; return the first complete object (a dict) once it closes, else None"""
+        self.text += chunk
+        text = self.text
+        while self._pos < len(text):
+            char = text[self._pos]
+            self._pos += 1
+            if self._start is None:
+                if char == '{':
+                    self._start = self._pos - 1
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = text[self._start:self._pos]
+                    self._start = None
+                    try:
+                        value = json.loads(candidate)
+                    except json.JSONDecodeError:
+                        continue  # not JSON after all (e.g. prose with braces); keep scanning
+                    if isinstance(value, dict):
+                        return value
+        return None
@@ -2,9 +2,10 @@ import platform
 import subprocess
 import os
 import shutil
+import threading
 
-def get_system_info():
-    """Get comprehensive system information for context-aware automation"""
+def collect_system_info():
+    """Get comprehensive system information for context-aware automation (uncached; see SystemInfo)"""
     info = {
         'os': platform.system().lower(),
         'os_version': platform.version(),
@@ -79,14 +80,104 @@ def get_common_directories():
     
     return existing_dirs
 
+def watched_paths():
+    """PATH entries (installing or removing an app changes their mtime) and the home directory"""
+    path = os.environ.get('PATH', '')
+    dirs = [entry for entry in path.split(os.pathsep) if entry]
+    return path, dirs + [os.path.expanduser('~')]
+
+def environment_fingerprint():
+    """Cheap key for the detected system: PATH plus the mtime of every watched directory"""
+    path, dirs = watched_paths()
+    mtimes = []
+    for directory in dirs:
+        try:
+            mtimes.append(os.stat(directory).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return (path, tuple(dirs), tuple(mtimes))
+
+def prompt_snippet(info):
+    """One-line system description for the action prompt"""
+    return f"OS: {info['os']} {info['os_version']} | Arch: {info['architecture']} | Desktop: {info.get('desktop_environment', 'unknown')}"
+
+def planner_context(info):
+    """OS, desktop and a few installed apps per category, for the step planner"""
+    os_type = info['os']
+    available_apps_text = ""
+    for category, apps in info['available_apps'].items():
+        if apps:
+            available_apps_text += f"{category}: {', '.join(apps[:2])}; "
+    current_os_info = f"{os_type} with {info.get('desktop_environment', 'unknown')} desktop"
+    if available_apps_text:
+        current_os_info += f". Available apps: {available_apps_text.rstrip('; ')}"
+    return f"{os_type} ({current_os_info})"
+
+class SystemInfo:
+    """
+    Memoized system information. Detection (about 40 PATH lookups plus
+    directory and platform queries) runs once; each later call only stats
+    the watched directories and redetects when PATH, a PATH directory or
+    the home directory changed. The prompt snippets are computed together
+    with the info they describe.
+    """
+
+    def __init__(self, collect=collect_system_info, fingerprint=environment_fingerprint):
+        self.collect = collect
+        self.fingerprint = fingerprint
+        self._lock = threading.Lock()
+        self._key = None
+        self._info = None
+        self._snippets = {}
+        self.hits = 0
+        self.refreshes = 0
+
+    def _current(self):
+        key = self.fingerprint()
+        with self._lock:
+            if self._info is not None and key == self._key:
+                self.hits += 1
+                return self._info, self._snippets
+        info = self.collect()
+        snippets = {'prompt': prompt_snippet(info), 'planner': planner_context(info)}
+        with self._lock:
+            self._key, self._info, self._snippets = key, info, snippets
+            self.refreshes += 1
+        return info, snippets
+
+    def info(self):
+        """The system info dict; shared between callers, so treat it as read-only"""
+        return self._current()[0]
+
+    def prompt_snippet(self):
+        return self._current()[1]['prompt']
+
+    def planner_context(self):
+        return self._current()[1]['planner']
+
+    def best_app(self, task_type):
+        apps = self.info()['available_apps']
+        if task_type in apps and apps[task_type]:
+            return apps[task_type][0]  # Return the first available app
+        return None
+
+    def invalidate(self):
+        with self._lock:
+            self._key = self._info = None
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'refreshes': self.refreshes, 'watched_dirs': len(self._key[1]) if self._key else 0}
+
+system_info_provider = SystemInfo()
+
+def get_system_info():
+    """Get comprehensive system information for context-aware automation (cached)"""
+    return system_info_provider.info()
+
 def get_best_app_for_task(task_type):
     """Get the best available application for a specific task"""
-    apps = detect_available_apps()
-    
-    if task_type in apps and apps[task_type]:
-        return apps[task_type][0]  # Return the first available app
-    
-    return None
+    return system_info_provider.best_app(task_type)
 
 def print_system_summary():
     """Print a summary of system capabilities"""
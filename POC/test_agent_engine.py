@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the async agent engine: many runs on one loop thread,
+cancellation while a run is awaiting, and keyed replacement of runs
+"""
+
+import sys
+import os
+import asyncio
+import threading
+import time
+from concurrent.futures import CancelledError
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agent_engine import AgentEngine
+
+
+def test_agent_engine():
+    """Test that concurrent runs share one thread and a cancel interrupts an in-flight await"""
+    print("=== AGENT ENGINE TEST ===")
+
+    engine = AgentEngine(workers=2)
+    threads_before = threading.active_count()
+
+    async def fake_run(seconds):
+        # Stand-in for a run waiting on Vision/gpt-4o, plus a blocking step off the loop
+        await asyncio.sleep(seconds)
+        await asyncio.to_thread(time.sleep, 0.01)
+        return threading.current_thread().name
+
+    start = time.perf_counter()
+    futures = [engine.submit(fake_run(0.2), key=f'run-{i}') for i in range(50)]
+    names = {future.result(timeout=5) for future in futures}
+    elapsed = time.perf_counter() - start
+    print(f"  50 runs in {elapsed:.2f}s on threads {names}, {threading.active_count() - threads_before} new threads")
+    assert names == {'agent-engine'}
+    assert elapsed < 2.0
+    # One loop thread plus at most the bounded worker pool, not one thread per run
+    assert threading.active_count() - threads_before <= 1 + engine.workers
+
+    stopped = threading.Event()
+
+    async def long_request():
+        try:
+            await asyncio.sleep(30)
+        finally:
+            stopped.set()
+
+    future = engine.submit(long_request(), key='agent')
+    time.sleep(0.05)
+    assert engine.running('agent')
+    start = time.perf_counter()
+    assert engine.cancel('agent')
+    assert stopped.wait(1.0)
+    print(f"  Cancelled mid-await after {time.perf_counter() - start:.3f}s")
+    try:
+        future.result(timeout=1)
+        assert False, "cancelled run returned a result"
+    except CancelledError:
+        pass
+
+    # Submitting under a busy key replaces the run
+    first = engine.submit(long_request(), key='agent')
+    second = engine.submit(fake_run(0.01), key='agent')
+    assert second.result(timeout=5) == 'agent-engine'
+    assert first.cancelled()
+    assert not engine.running('agent')
+    assert not engine.cancel('agent')
+
+    stats = engine.stats()
+    print(f"  Stats: {stats}")
+    assert stats['completed'] == 51 and stats['cancelled'] == 2 and stats['running'] == 0
+
+    return True
+
+if __name__ == "__main__":
+    test_agent_engine()
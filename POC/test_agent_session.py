@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test script to verify agent session isolation, display binding and the
+xdotool input commands used for sessions on their own display
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agent_session import SessionManager, DEFAULT_SESSION
+from frame_bus import frame_bus
+from input_target import XdotoolInput, PyAutoGUIInput, input_target
+from state_store import VersionedState
+
+
+def new_state():
+    return VersionedState({'goal': None, 'status': 'idle', 'step': 0, 'stop_requested': False,
+                           'llm_prompt': ''},
+                          blob_fields={'llm_prompt': ('text/plain; charset=utf-8', str.encode)})
+
+
+def test_session_isolation():
+    """Test that sessions have separate state, displays and frame buses"""
+    print("=== AGENT SESSION TEST ===")
+
+    manager = SessionManager(new_state, max_sessions=3)
+    default = manager.default
+    assert default.id == DEFAULT_SESSION and default.display is None
+    assert default.frame_bus is frame_bus
+
+    # Input on a session display goes through xdotool: without it the session is refused up front
+    if shutil.which('xdotool') is None:
+        try:
+            manager.create(display=':91')
+            assert False, "session created without xdotool"
+        except RuntimeError as e:
+            print(f"  Input: {e}")
+        assert not manager._reserved and len(manager.sessions()) == 1
+        with tempfile.TemporaryDirectory() as bin_dir:
+            # The rest only binds displays, so a placeholder xdotool on PATH is enough
+            xdotool = os.path.join(bin_dir, 'xdotool')
+            with open(xdotool, 'w') as f:
+                f.write('#!/bin/sh\n')
+            os.chmod(xdotool, 0o755)
+            path = os.environ['PATH']
+            os.environ['PATH'] = bin_dir + os.pathsep + path
+            try:
+                return check_sessions(manager, default)
+            finally:
+                os.environ['PATH'] = path
+    return check_sessions(manager, default)
+
+def check_sessions(manager, default):
+    first = manager.create(display=':91')
+    second = manager.create(display=':92')
+    print(f"  Sessions: {[session.to_dict() for session in manager.sessions()]}")
+    assert first.id != second.id and manager.get(first.id) is first
+    assert first.frame_bus is not second.frame_bus
+    assert first.frame_bus.capture.display == ':91'
+
+    first.state['goal'] = 'open calculator'
+    first.state['stop_requested'] = True
+    assert second.state['goal'] is None and not second.state['stop_requested']
+    assert default.state['goal'] is None
+
+    # Blobs are content-addressed, so any session's blob can be found by digest
+    second.state['llm_prompt'] = 'prompt of the second session'
+    digest = second.state.blob_ref('llm_prompt')['blob']
+    assert manager.find_blob(digest)[0] == b'prompt of the second session'
+
+    try:
+        manager.create(display=':93')
+        assert False, "session limit not enforced"
+    except RuntimeError as e:
+        print(f"  Limit: {e}")
+
+    assert manager.remove(first.id) is first
+    assert manager.get(first.id) is None
+    try:
+        manager.create(display=':92')
+        assert False, "display bound twice"
+    except RuntimeError as e:
+        print(f"  Display: {e}")
+    try:
+        manager.remove(DEFAULT_SESSION)
+        assert False, "default session removed"
+    except ValueError:
+        pass
+
+    # A display that fails to start releases its reservation
+    if shutil.which('Xvfb') is None:
+        try:
+            manager.create(xvfb=True)
+            assert False, "Xvfb started without Xvfb"
+        except RuntimeError as e:
+            print(f"  Xvfb: {e}")
+        assert not manager._reserved and len(manager.sessions()) == 2
+
+    return True
+
+def test_xdotool_commands():
+    """Test that input for a session display maps to xdotool commands with X keysyms"""
+    print("=== XDOTOOL INPUT TEST ===")
+
+    target = input_target(':91')
+    assert isinstance(target, XdotoolInput) and target is input_target(':91')
+    assert isinstance(input_target(None), PyAutoGUIInput)
+
+    assert target.key_command('ctrl', 'w') == ['xdotool', 'key', 'ctrl+w']
+    assert target.key_command('enter') == ['xdotool', 'key', 'Return']
+    assert target.key_command('command', 'pageup') == ['xdotool', 'key', 'super+Prior']
+    assert target.key_command('f5') == ['xdotool', 'key', 'F5']
+    assert target.type_command('-n hello') == ['xdotool', 'type', '--delay', '12', '--', '-n hello']
+    command = target.click_command(100.6, 200, clicks=2, interval=0.1, button='right')
+    print(f"  Click: {command}")
+    assert command == ['xdotool', 'mousemove', '--sync', '100', '200', 'click', '--repeat', '2', '--delay', '100', '3']
+
+    return True
+
+if __name__ == "__main__":
+    test_session_isolation()
+    test_xdotool_commands()
@@ -1,62 +1,178 @@
 #!/usr/bin/env python3
 """
 Test script to verify conservative merging algorithm
+
+The sweep-line merge in ocr_processing is checked against the original
+nested-loop implementation (kept below as the reference) on the existing
+scenarios and on dense randomized screens.
 """
 
 import sys
 import os
+import random
+import time
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from ocr_frame import OCRFrame
+from ocr_processing import merge_text_elements, UI_ELEMENT_WORDS
+
+# Simulate OCR data that might cause over-merging
+# This represents a scenario like Google search tabs
+SIMULATED_OCR_DATA = [
+    # Tab-like elements that should NOT be merged
+    {'text': 'All', 'x': 100, 'y': 50, 'bbox': {'x1': 95, 'y1': 45, 'x2': 115, 'y2': 65}},
+    {'text': 'Images', 'x': 150, 'y': 50, 'bbox': {'x1': 140, 'y1': 45, 'x2': 170, 'y2': 65}},
+    {'text': 'Videos', 'x': 200, 'y': 50, 'bbox': {'x1': 190, 'y1': 45, 'x2': 220, 'y2': 65}},
+    {'text': 'News', 'x': 250, 'y': 50, 'bbox': {'x1': 240, 'y1': 45, 'x2': 270, 'y2': 65}},
+
+    # Content that SHOULD be merged (multi-word phrases)
+    {'text': 'Search', 'x': 100, 'y': 150, 'bbox': {'x1': 95, 'y1': 145, 'x2': 125, 'y2': 165}},
+    {'text': 'results', 'x': 130, 'y': 150, 'bbox': {'x1': 125, 'y1': 145, 'x2': 155, 'y2': 165}},
+
+    # Another multi-word phrase
+    {'text': 'Google', 'x': 200, 'y': 200, 'bbox': {'x1': 195, 'y1': 195, 'x2': 225, 'y2': 215}},
+    {'text': 'Chrome', 'x': 230, 'y': 200, 'bbox': {'x1': 225, 'y1': 195, 'x2': 255, 'y2': 215}},
+]
+
+
+def reference_merge(text_elements):
+    """The original O(n^2) merge loop from ocr_screen_with_coordinates"""
+    merged_elements = []
+    used_indices = set()
+    max_horizontal_gap = 30
+    max_height_diff = 10
+
+    for i, element in enumerate(text_elements):
+        if i in used_indices:
+            continue
+        group = [element]
+        used_indices.add(i)
+        for j, other_element in enumerate(text_elements):
+            if j in used_indices:
+                continue
+            height_diff = abs(element['y'] - other_element['y'])
+            if height_diff <= max_height_diff:
+                if element['x'] < other_element['x']:
+                    gap = other_element['bbox']['x1'] - element['bbox']['x2']
+                else:
+                    gap = element['bbox']['x1'] - other_element['bbox']['x2']
+                if gap <= max_horizontal_gap and gap >= -5:
+                    if len(element['text']) <= 8 and len(other_element['text']) <= 8:
+                        if gap <= 15:
+                            element_lower = element['text'].lower().strip()
+                            other_lower = other_element['text'].lower().strip()
+                            if (element_lower in UI_ELEMENT_WORDS or other_lower in UI_ELEMENT_WORDS):
+                                continue
+                            group.append(other_element)
+                            used_indices.add(j)
+                    else:
+                        group.append(other_element)
+                        used_indices.add(j)
+        group.sort(key=lambda x: x['x'])
+        if len(group) == 1:
+            merged_elements.append(group[0])
+        else:
+            min_x = min(elem['bbox']['x1'] for elem in group)
+            max_x = max(elem['bbox']['x2'] for elem in group)
+            min_y = min(elem['bbox']['y1'] for elem in group)
+            max_y = max(elem['bbox']['y2'] for elem in group)
+            merged_elements.append({
+                'text': ' '.join(elem['text'] for elem in group),
+                'x': (min_x + max_x) // 2,
+                'y': (min_y + max_y) // 2,
+                'bbox': {'x1': min_x, 'y1': min_y, 'x2': max_x, 'y2': max_y},
+                'width': max_x - min_x,
+                'height': max_y - min_y,
+                'merged_from': len(group)
+            })
+    return merged_elements
+
+
+def random_screen(seed, rows=60, words_per_row=40):
+    """Dense spreadsheet/IDE-like screen with jittered word positions and widths"""
+    rng = random.Random(seed)
+    vocabulary = ['File', 'Edit', 'total', 'revenue', 'Q3', 'def', 'return', 'self',
+                  'search', 'results', 'Images', 'x', '42', 'configuration', 'a', 'Settings']
+    words = []
+    for row in range(rows):
+        y = 20 + row * 18 + rng.randint(-6, 6)
+        x = rng.randint(0, 20)
+        for _ in range(words_per_row):
+            text = rng.choice(vocabulary)
+            width = 6 * len(text) + rng.randint(0, 8)
+            height = rng.randint(10, 16)
+            words.append({
+                'text': text,
+                'x': x + width // 2,
+                'y': y + rng.randint(-4, 4),
+                'bbox': {'x1': x, 'y1': y - height // 2, 'x2': x + width, 'y2': y + height // 2},
+            })
+            x += width + rng.randint(-6, 40)
+    rng.shuffle(words)
+    return words
+
+
+def sweep_merge(text_elements):
+    """Run the OCRFrame-based merge on legacy dicts and return legacy dicts"""
+    return merge_text_elements(OCRFrame.from_dicts(text_elements)).to_dicts()
+
+
+def normalized(text_elements):
+    """Round-trip reference output through OCRFrame so both sides share one dict shape"""
+    return OCRFrame.from_dicts(text_elements).to_dicts()
+
+
 def test_conservative_merging():
     """Test that the merging algorithm is conservative enough for UI elements"""
     print("=== CONSERVATIVE MERGING TEST ===")
-    
-    # Simulate OCR data that might cause over-merging
-    # This represents a scenario like Google search tabs
-    simulated_ocr_data = [
-        # Tab-like elements that should NOT be merged
-        {'text': 'All', 'x': 100, 'y': 50, 'bbox': {'x1': 95, 'y1': 45, 'x2': 115, 'y2': 65}},
-        {'text': 'Images', 'x': 150, 'y': 50, 'bbox': {'x1': 140, 'y1': 45, 'x2': 170, 'y2': 65}},
-        {'text': 'Videos', 'x': 200, 'y': 50, 'bbox': {'x1': 190, 'y1': 45, 'x2': 220, 'y2': 65}},
-        {'text': 'News', 'x': 250, 'y': 50, 'bbox': {'x1': 240, 'y1': 45, 'x2': 270, 'y2': 65}},
-        
-        # Content that SHOULD be merged (multi-word phrases)
-        {'text': 'Search', 'x': 100, 'y': 150, 'bbox': {'x1': 95, 'y1': 145, 'x2': 125, 'y2': 165}},
-        {'text': 'results', 'x': 130, 'y': 150, 'bbox': {'x1': 125, 'y1': 145, 'x2': 155, 'y2': 165}},
-        
-        # Another multi-word phrase
-        {'text': 'Google', 'x': 200, 'y': 200, 'bbox': {'x1': 195, 'y1': 195, 'x2': 225, 'y2': 215}},
-        {'text': 'Chrome', 'x': 230, 'y': 200, 'bbox': {'x1': 225, 'y1': 195, 'x2': 255, 'y2': 215}},
-    ]
-    
+
     print("Simulated OCR data:")
-    for i, element in enumerate(simulated_ocr_data):
+    for i, element in enumerate(SIMULATED_OCR_DATA):
         print(f"  {i+1}. '{element['text']}' at ({element['x']}, {element['y']})")
-    
+
     print(f"\nExpected behavior:")
     print(f"  ✓ 'All', 'Images', 'Videos', 'News' should remain separate (tabs)")
-    print(f"  ✓ 'Search results' should be merged (content)")
+    print(f"  ✓ 'Search' stays separate (UI element word), 'results' on its own")
     print(f"  ✓ 'Google Chrome' should be merged (content)")
-    
-    # Test the merging logic manually
-    print(f"\nTesting merging logic:")
-    
-    # Check if UI elements would be merged
-    ui_element_words = {
-        'images', 'videos', 'news', 'maps', 'books', 'flights', 'finance',
-        'all', 'web', 'search', 'home', 'back', 'forward', 'reload',
-        'file', 'edit', 'view', 'help', 'tools', 'options', 'settings',
-        'profile', 'account', 'login', 'logout', 'sign', 'register'
-    }
-    
-    for i, element in enumerate(simulated_ocr_data):
-        element_lower = element['text'].lower().strip()
-        if element_lower in ui_element_words:
-            print(f"  ✓ '{element['text']}' identified as UI element (should not be merged)")
-        else:
-            print(f"  - '{element['text']}' is content (may be merged if close)")
-    
+
+    merged = sweep_merge(SIMULATED_OCR_DATA)
+    texts = [element['text'] for element in merged]
+    print(f"\nMerged elements: {texts}")
+
+    for tab in ['All', 'Images', 'Videos', 'News']:
+        assert tab in texts, f"tab '{tab}' must not be merged"
+    assert 'Google Chrome' in texts
+    assert merged == normalized(reference_merge(SIMULATED_OCR_DATA))
+
+    return True
+
+
+def test_sweep_merge_matches_reference():
+    """Regression: the sweep-line merge produces exactly the reference groups"""
+    print("=== SWEEP-LINE MERGE REGRESSION TEST ===")
+
+    for seed in range(5):
+        words = random_screen(seed)
+
+        start = time.perf_counter()
+        expected = reference_merge(words)
+        reference_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = sweep_merge(words)
+        sweep_time = time.perf_counter() - start
+
+        print(f"  seed {seed}: {len(words)} words -> {len(actual)} elements, "
+              f"reference {reference_time * 1000:.1f} ms, sweep {sweep_time * 1000:.1f} ms")
+        assert actual == normalized(expected), f"merge mismatch for seed {seed}"
+
+    # Degenerate inputs
+    assert sweep_merge([]) == []
+    single = [SIMULATED_OCR_DATA[0]]
+    assert sweep_merge(single) == normalized(reference_merge(single))
+
     return True
 
 if __name__ == "__main__":
-    test_conservative_merging() 
\ No newline at end of file
+    test_conservative_merging()
+    test_sweep_merge_matches_reference()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test script to verify keyframe/delta desktop streaming
+"""
+
+import io
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+
+import time
+
+from desktop_stream import DeltaStreamEncoder, StreamSession, tile_runs
+from frame_encoder import FrameEncoder
+
+
+class FakeFrame:
+    """Just enough of a screen_capture.Frame for the encoder (BGRA buffer + size)"""
+
+    def __init__(self, width, height, painted=()):
+        self.size = (width, height)
+        img = Image.new("RGB", self.size, (40, 40, 40))
+        for x1, y1, x2, y2 in painted:
+            img.paste((250, 250, 250), (x1, y1, x2, y2))
+        self.bgra = img.convert("RGBA").tobytes("raw", "BGRA")
+        self.encodings = FrameEncoder(self)
+
+
+def test_desktop_stream():
+    """Test that only changed tiles are sent after the first keyframe"""
+    print("=== DESKTOP STREAM TEST ===")
+
+    assert tile_runs([(3, 0), (1, 0), (2, 0), (0, 2)]) == [(1, 0, 3), (0, 2, 1)]
+
+    encoder = DeltaStreamEncoder(tile_size=64, keyframe_interval=3600)
+
+    event, payload = encoder.encode(FakeFrame(640, 480))
+    print(f"  First frame: {event}, {len(payload['image'])} bytes")
+    assert event == 'desktop_keyframe'
+    assert (payload['seq'], payload['width'], payload['height']) == (1, 640, 480)
+    assert isinstance(payload['image'], bytes)
+
+    # Identical frame: nothing to send
+    assert encoder.encode(FakeFrame(640, 480)) is None
+
+    # A small edit spanning two horizontally adjacent tiles -> one run
+    event, payload = encoder.encode(FakeFrame(640, 480, painted=[(100, 70, 150, 90)]))
+    print(f"  Small edit: {event}, tiles {[(t['x'], t['y'], t['w'], t['h']) for t in payload['tiles']]}")
+    assert event == 'desktop_delta'
+    assert (payload['seq'], payload['base_seq']) == (2, 1)
+    assert [(t['x'], t['y'], t['w'], t['h']) for t in payload['tiles']] == [(64, 64, 128, 64)]
+    tile = Image.open(io.BytesIO(payload['tiles'][0]['image']))
+    assert tile.size == (128, 64)
+
+    # Most of the screen changed -> a keyframe is cheaper than tiles
+    event, payload = encoder.encode(FakeFrame(640, 480, painted=[(0, 0, 640, 400)]))
+    assert event == 'desktop_keyframe'
+    assert payload['seq'] == 3
+
+    # A new viewer asks for a full frame even though nothing changed
+    encoder.request_keyframe()
+    event, _ = encoder.encode(FakeFrame(640, 480, painted=[(0, 0, 640, 400)]))
+    assert event == 'desktop_keyframe'
+
+    stats = encoder.get_stats()
+    print(f"  Stats: {stats}")
+    assert (stats['keyframes'], stats['deltas'], stats['skipped'], stats['tiles']) == (3, 1, 1, 2)
+
+    return True
+
+
+def test_stream_session_backpressure():
+    """Test that a viewer that stops acking drops frames, degrades, and recovers once it catches up"""
+    print("=== STREAM SESSION BACKPRESSURE TEST ===")
+
+    session = StreamSession('sid-1', max_in_flight=2, ack_timeout=60, degrade_cooldown=1.0, recover_after=3.0)
+    now = time.monotonic()
+    frames = [FakeFrame(640, 480, painted=[(0, 0, 64 * (i % 3 + 1), 64)]) for i in range(2)]
+
+    # Two messages go out unacknowledged, the third frame is dropped rather than queued
+    assert session.next_message(frames[0], now)[0] == 'desktop_keyframe'
+    assert session.next_message(frames[1], now + 0.1)[0] == 'desktop_delta'
+    assert session.next_message(frames[0], now + 1.2) is None
+    stats = session.get_stats(now + 1.2)
+    print(f"  Behind: {stats}")
+    assert stats['dropped'] == 1 and stats['in_flight'] == 2
+    assert stats['tier'] == 1 and stats['target_fps'] < 10
+
+    # Frames arriving faster than the degraded rate are not sent
+    session.ack(2, now + 1.3)
+    assert session.next_message(frames[0], now + 1.3) is not None
+    assert session.next_message(frames[1], now + 1.35) is None
+
+    # Acking keeps the window open; after a quiet period the tier climbs back up
+    for i in range(1, 20):
+        t = now + 1.3 + i * 0.5
+        message = session.next_message(frames[i % 2], t)
+        if message is not None:
+            session.ack(message[1]['seq'], t + 0.01)
+    # The send history stays within the window even though nobody polled the stats meanwhile
+    assert all(t - sent_at <= session.window for sent_at, _ in session._sent)
+    stats = session.get_stats(now + 11)
+    print(f"  Caught up: {stats}")
+    assert stats['tier'] == 0 and stats['dropped'] == 1
+    assert stats['rtt_ms'] is not None and stats['bitrate_kbps'] > 0
+
+    return True
+
+if __name__ == "__main__":
+    test_desktop_stream()
+    test_stream_session_backpressure()
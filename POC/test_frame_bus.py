@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the shared frame bus
+"""
+
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from frame_bus import FrameBus
+
+
+class FakeFrame:
+    def __init__(self, number):
+        self.number = number
+        self.timestamp = time.time()
+
+
+class FakeCapture:
+    """Counts grabs so we can check capture cost is independent of subscriber count"""
+
+    def __init__(self):
+        self.grabs = 0
+        self.lock = threading.Lock()
+
+    def grab(self):
+        with self.lock:
+            self.grabs += 1
+            return FakeFrame(self.grabs)
+
+
+def test_frame_bus():
+    """Test that many subscribers share one producer and see the same frame objects"""
+    print("=== FRAME BUS TEST ===")
+
+    capture = FakeCapture()
+    bus = FrameBus(capture=capture, fps=50, capacity=4)
+
+    # Without subscribers there is no producer; fresh_frame captures directly
+    frame = bus.fresh_frame()
+    print(f"  Direct fresh frame: #{frame.number}")
+    assert capture.grabs == 1
+    assert bus.latest()[1] is frame
+
+    subscribers = [bus.subscribe() for _ in range(5)]
+    seen = [sub.next(timeout=1.0) for sub in subscribers]
+    assert all(frame is not None for frame in seen)
+
+    time.sleep(0.3)
+    grabs_with_five = capture.grabs
+    print(f"  Grabs after 0.3s with 5 subscribers: {grabs_with_five}")
+    # ~50 FPS regardless of subscriber count (generous bounds for slow CI)
+    assert grabs_with_five < 40
+
+    # Subscribers read the latest frame, not a backlog, and share the object
+    frames = [sub.next(timeout=1.0) for sub in subscribers]
+    assert len({id(frame) for frame in frames}) <= 2
+
+    # fresh_frame returns a frame captured after the request
+    requested = time.time()
+    frame = bus.fresh_frame()
+    assert frame.timestamp >= requested
+
+    stats = bus.stats()
+    print(f"  Stats: {stats}")
+    assert stats['subscribers'] == 5
+    assert stats['buffered'] <= 4
+
+    for sub in subscribers:
+        sub.close()
+    time.sleep(0.1)
+    settled = capture.grabs
+    time.sleep(0.2)
+    print(f"  Grabs after unsubscribing: {capture.grabs - settled}")
+    assert capture.grabs == settled, "producer must stop without subscribers"
+
+    return True
+
+if __name__ == "__main__":
+    test_frame_bus()
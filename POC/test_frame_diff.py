@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script to verify frame change detection
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from frame_diff import FrameChangeDetector
+
+
+class FakeScreenshot:
+    """Minimal stand-in for an mss screenshot (BGRA buffer + size)"""
+
+    def __init__(self, width, height, fill=0):
+        self.size = (width, height)
+        self.bgra = bytearray([fill, fill, fill, 255] * (width * height))
+
+    def paint(self, x1, y1, x2, y2, value):
+        width = self.size[0]
+        for y in range(y1, y2):
+            for x in range(x1, x2):
+                offset = (y * width + x) * 4
+                self.bgra[offset:offset + 3] = bytes([value, value, value])
+
+
+def test_frame_change_detection():
+    """Test that identical frames are skipped and small edits are localized to tiles"""
+    print("=== FRAME CHANGE DETECTION TEST ===")
+
+    detector = FrameChangeDetector(tile_size=32, pixel_threshold=24, change_threshold=0.0)
+
+    first = FakeScreenshot(128, 96, fill=40)
+    change = detector.compare(first)
+    print(f"  First frame changed: {change.changed}")
+    assert change.changed, "first frame must always count as changed"
+    detector.accept(change)
+
+    same = FakeScreenshot(128, 96, fill=40)
+    change = detector.compare(same)
+    print(f"  Identical frame changed: {change.changed} ({len(change.changed_tiles)} tiles)")
+    assert not change.changed
+    assert change.changed_tiles == []
+
+    # A small edit (e.g. a typed character) should dirty exactly one tile
+    edited = FakeScreenshot(128, 96, fill=40)
+    edited.paint(40, 40, 50, 50, 220)
+    change = detector.compare(edited)
+    print(f"  Edited frame changed: {change.changed}, tiles: {change.changed_tiles}")
+    assert change.changed
+    assert change.changed_tiles == [(1, 1)]
+    assert change.changed_regions() == [(32, 32, 64, 64)]
+
+    # Noise below the pixel threshold is ignored
+    noisy = FakeScreenshot(128, 96, fill=50)
+    change = detector.compare(noisy)
+    print(f"  Noisy frame changed: {change.changed}")
+    assert not change.changed
+
+    # A configurable threshold lets small changes count as "same"
+    lenient = FrameChangeDetector(tile_size=32, change_threshold=0.1)
+    lenient.accept(lenient.compare(first))
+    change = lenient.compare(edited)
+    print(f"  Lenient detector changed: {change.changed} ({change.changed_fraction:.1%})")
+    assert not change.changed
+
+    return True
+
+if __name__ == "__main__":
+    test_frame_change_detection()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script to verify dirty-region planning and splicing for incremental OCR
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+from frame_diff import FrameChange
+from incremental_ocr import IncrementalOCR, group_tiles
+from ocr_frame import OCRFrame
+
+
+def word(text, x1, y1, x2, y2):
+    return {
+        'text': text, 'x': (x1 + x2) // 2, 'y': (y1 + y2) // 2,
+        'bbox': {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2},
+        'width': x2 - x1, 'height': y2 - y1
+    }
+
+
+def test_incremental_ocr():
+    """Test that only words in changed tiles are replaced"""
+    print("=== INCREMENTAL OCR TEST ===")
+
+    # Adjacent tiles collapse into one box, isolated tiles stay separate
+    boxes = sorted(group_tiles([(0, 0), (1, 0), (5, 5)]))
+    print(f"  Tile groups: {boxes}")
+    assert boxes == [(0, 0, 1, 0), (5, 5, 5, 5)]
+
+    previous_words = OCRFrame.from_dicts([
+        word('Search', 10, 10, 60, 30),
+        word('hello', 300, 200, 350, 220),
+        word('Footer', 10, 400, 70, 420),
+    ])
+    incremental = IncrementalOCR(margin=16, max_dirty_fraction=0.5)
+    gray = Image.new('L', (512, 512))
+
+    # No previous words: must fall back to full OCR
+    change = FrameChange(gray, 0, 0, [(2, 3)], 16, 128, True)
+    assert incremental.plan(change) is None
+
+    incremental.reset(previous_words)
+    regions = incremental.plan(change)
+    print(f"  Planned regions: {regions}")
+    assert len(regions) == 1
+    assert regions[0].region == (256, 384, 384, 512)
+
+    # Tile (2, 1) covers the 'hello' word
+    change = FrameChange(gray, 0, 0, [(2, 1)], 16, 128, True)
+    regions = incremental.plan(change)
+    assert regions[0].region == (256, 128, 384, 256)
+    assert regions[0].crop == (240, 112, 400, 272)
+
+    # The crop re-reads the edited word plus a word that only sits in the margin
+    crop_words = OCRFrame.from_dicts([word('hello world', 300, 200, 390, 220), word('margin', 385, 120, 399, 126)])
+    words = incremental.splice(regions, [crop_words], 1.0, 1.0)
+    texts = words.text
+    print(f"  Spliced words: {texts}")
+    assert texts == ['Search', 'hello world', 'Footer']
+
+    # Too much of the screen changed: a full OCR is cheaper
+    change = FrameChange(gray, 0, 0, [(x, y) for x in range(4) for y in range(3)], 16, 128, True)
+    assert incremental.plan(change) is None
+
+    return True
+
+if __name__ == "__main__":
+    test_incremental_ocr()
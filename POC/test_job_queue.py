@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script to verify job admission control: per-display concurrency,
+priorities, cancellation, the queue-full rejection and metrics
+"""
+
+import sys
+import os
+from concurrent.futures import Future
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from job_queue import JobScheduler, QueueFull
+
+
+def test_job_queue():
+    """Test that jobs wait for their display, run in priority order and are bounded"""
+    print("=== JOB QUEUE TEST ===")
+
+    runs = {}         # job id -> Future the test completes by hand (pending, like an engine run)
+
+    def run(job):
+        runs[job.id] = Future()
+        return runs[job.id]
+
+    def stop(job):
+        runs[job.id].cancel()
+
+    scheduler = JobScheduler(run, stop, max_queued=3, per_display=1)
+
+    first = scheduler.submit('open calculator', 'default', None)
+    assert first.state == 'running'
+    # Same display: waits. Another display: runs at once.
+    low = scheduler.submit('open notes', 'default', None)
+    other = scheduler.submit('open browser', 's1', ':91')
+    high = scheduler.submit('open mail', 'default', None, priority=5)
+    assert low.state == 'queued' and other.state == 'running'
+    assert scheduler.get(high.id)['position'] == 1 and scheduler.get(low.id)['position'] == 2
+
+    # Reprioritize the low job above the high one
+    assert scheduler.reprioritize(low.id, 10)['position'] == 1
+    assert scheduler.reprioritize(first.id, 10) is None  # running jobs do not move
+
+    scheduler.submit('open files', 'default', None)
+    try:
+        scheduler.submit('one too many', 'default', None, priority=7)
+        assert False, "queue bound not enforced"
+    except QueueFull as e:
+        print(f"  Rejected: {e}, position hint {e.position_hint}, retry after {e.retry_after}s")
+        assert e.depth == 3 and e.position_hint == 2 and e.retry_after > 0
+
+    # Finishing the first run starts the highest-priority waiting job on that display
+    runs[first.id].set_result('done')
+    assert scheduler.get(first.id)['state'] == 'finished' and scheduler.get(first.id)['result'] == 'done'
+    assert scheduler.get(low.id)['state'] == 'running'
+
+    # Cancelling a queued job removes it; cancelling a running job stops its run
+    assert scheduler.cancel(high.id)['state'] == 'cancelled'
+    assert scheduler.cancel(low.id)['state'] == 'cancelled'
+    assert scheduler.cancel('missing') is None
+    runs[other.id].set_exception(RuntimeError('Vision unavailable'))
+    assert scheduler.get(other.id)['state'] == 'failed'
+
+    metrics = scheduler.metrics()
+    print(f"  Metrics: {metrics}")
+    assert metrics['submitted'] == 5 and metrics['rejected'] == 1
+    assert metrics['finished'] == 1 and metrics['failed'] == 1 and metrics['cancelled'] == 2
+    assert metrics['running'] == 1 and metrics['queue_depth'] == 0
+    assert metrics['wait_s']['avg'] is not None and metrics['run_s']['p95'] is not None
+
+    return True
+
+if __name__ == "__main__":
+    test_job_queue()
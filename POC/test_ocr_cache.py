@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the persistent OCR cache
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+from multiprocessing import Pool
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ocr_cache import OCRCache, content_hash
+
+
+def fill(args):
+    path, worker = args
+    cache = OCRCache(path)
+    for i in range(20):
+        cache.put(f'frame:{worker}:{i}', {'full_text': f'word {i}', 'words': [['word', [[0, 0], [1, 0], [1, 1], [0, 1]]]]})
+        cache.record(False)
+    cache.flush()
+    return worker
+
+
+def stored_bytes(path):
+    with sqlite3.connect(path) as db:
+        return db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+
+def test_ocr_cache():
+    """Test hits survive reopening, concurrent writers, LRU eviction, the running size total and stats"""
+    print("=== OCR CACHE TEST ===")
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'ocr', 'cache.sqlite3')
+        key = 'frame:' + content_hash(b'same pixels')
+        assert key == 'frame:' + content_hash(b'same pixels')
+
+        cache = OCRCache(path)
+        assert cache.get(key) is None
+        cache.put(key, {'full_text': 'Hello', 'words': [['Hello', [[0, 0], [10, 0], [10, 5], [0, 5]]]], 'request_bytes': 1234})
+        cache.record(False)
+        cache.flush()   # as at exit
+
+        # A fresh instance (restart / other process) sees the entry
+        reopened = OCRCache(path)
+        value = reopened.get(key)
+        assert value['words'][0][0] == 'Hello'
+        reopened.record(True, value['request_bytes'])
+        stats = reopened.stats()
+        print(f"  Stats: {stats}")
+        assert stats['session'] == {'hits': 1, 'misses': 0, 'hit_rate': 1.0, 'bytes_saved': 1234}
+        assert stats['lifetime']['hits'] == 1 and stats['lifetime']['misses'] == 1
+
+        # Several processes writing at once
+        with Pool(4) as pool:
+            assert sorted(pool.map(fill, [(path, w) for w in range(4)])) == [0, 1, 2, 3]
+        stats = OCRCache(path).stats()
+        assert stats['entries'] == 81 and stats['lifetime']['misses'] == 81
+        assert stats['bytes'] == stored_bytes(path)
+
+        # Lookups are written in batches, not one transaction each
+        batched = OCRCache(path, flush_every=5)
+        for _ in range(4):
+            batched.record(False)
+        assert OCRCache(path).stats()['lifetime']['misses'] == 81
+        batched.record(True, 10)
+        assert OCRCache(path).stats()['lifetime']['misses'] == 85
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'cache.sqlite3')
+        cache = OCRCache(path, max_bytes=2000)
+        noise = os.urandom(300).hex()  # incompressible payload
+        for i in range(10):
+            cache.put(f'k{i}', {'blob': noise + str(i)})
+            if i == 1:
+                cache.get('k0')  # touch: k0 becomes more recent than k1
+        cache.put('k9', {'blob': noise})  # replacing an entry counts only the new size
+        stats = cache.stats()
+        print(f"  After eviction: {stats['entries']} entries, {stats['bytes']} bytes")
+        assert stats['bytes'] <= 2000 and stats['bytes'] == stored_bytes(path)
+        assert cache.get('k9') is not None
+        assert cache.get('k1') is None
+
+    return True
+
+if __name__ == "__main__":
+    test_ocr_cache()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the OCR engine interface: Tesseract rows to word
+boxes, engine selection, the local worker pool and the engine comparison
+"""
+
+import sys
+import os
+import asyncio
+import importlib.util
+import io
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+from ocr_engine import OCREngine, LocalEngine, OCRError, create_ocr_engine, pytesseract_rows, tesseract_words
+from ocr_benchmark import evaluate, word_agreement
+
+
+def box(x1, y1, x2, y2):
+    return [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+
+
+class ScriptedEngine(OCREngine):
+    """Returns prepared words per frame, in call order"""
+
+    def __init__(self, name, results):
+        self.name = name
+        self.results = list(results)
+
+    def recognize(self, image_bytes):
+        words = self.results.pop(0)
+        if words is None:
+            raise OCRError("no text layer")
+        return ' '.join(text for text, _ in words), words
+
+
+def test_tesseract_words():
+    """Test that Tesseract rows become word boxes in the original image's pixels"""
+    print("=== TESSERACT WORDS TEST ===")
+
+    data = {
+        'level': [1, 5, 5, 5, 5],
+        'text': ['', 'File', 'Edit', '~', 'Save'],
+        'conf': [-1, 96, 91, 12, 88],
+        'left': [0, 20, 100, 150, 20],
+        'top': [0, 10, 10, 10, 60],
+        'width': [400, 60, 60, 10, 80],
+        'height': [200, 30, 30, 30, 30],
+        'block_num': [0, 1, 1, 1, 1], 'par_num': [0, 1, 1, 1, 1], 'line_num': [0, 1, 1, 1, 2],
+    }
+    full_text, words = tesseract_words(pytesseract_rows(data), min_confidence=50, scale=2.0)
+    print(f"  {full_text!r}: {words}")
+    assert full_text == 'File Edit\nSave'
+    assert words[0] == ('File', box(10, 5, 40, 20))
+    assert [text for text, _ in words] == ['File', 'Edit', 'Save']  # the low-confidence '~' is dropped
+
+    try:
+        create_ocr_engine('easyocr')
+        assert False, "unknown engine accepted"
+    except ValueError:
+        pass
+
+    return True
+
+
+def test_local_engine():
+    """Test that the local engine answers from its worker process, or fails as an OCRError"""
+    print("=== LOCAL ENGINE TEST ===")
+
+    buffer = io.BytesIO()
+    Image.new('L', (120, 40), 255).save(buffer, format='PNG')
+    engine = create_ocr_engine('tesseract', workers=1)
+    assert isinstance(engine, LocalEngine) and engine.cache_prefix == 'tesseract:'
+    available = any(importlib.util.find_spec(name) for name in ('tesserocr', 'pytesseract'))
+    try:
+        full_text, words = engine.recognize(buffer.getvalue())
+        print(f"  Blank image: {full_text!r}, {words}")
+        assert available and words == []
+    except OCRError as e:
+        print(f"  Tesseract not installed here: {e}")
+        assert not available and engine._executor is None   # the broken pool was shut down
+    finally:
+        engine.close()
+
+    # Warming starts the workers once; callers may warm on every run
+    engine = create_ocr_engine('tesseract', workers=1)
+    assert engine._executor is None    # nothing starts until warmed
+    engine.warm()
+    pool = engine._executor
+    engine.warm()
+    assert pool is not None and engine._executor is pool
+    engine.close()
+
+    return True
+
+
+def test_engine_comparison():
+    """Test that a candidate engine is scored against the reference engine's words"""
+    print("=== OCR ENGINE COMPARISON TEST ===")
+
+    reference_words = [
+        [('File', box(10, 10, 50, 30)), ('Edit', box(60, 10, 100, 30)), ('Submit', box(200, 300, 280, 330))],
+        [('Open', box(10, 10, 60, 30))],
+    ]
+    candidate_words = [
+        # 'Edit' misread, 'Submit' slightly shifted, one extra word
+        [('File', box(12, 11, 51, 29)), ('Fdit', box(60, 10, 100, 30)), ('Submit', box(204, 302, 284, 333)),
+         ('x', box(500, 500, 505, 505))],
+        None,
+    ]
+    assert word_agreement(reference_words[0], candidate_words[0]) == (2, 3, 4)
+
+    frames = [(b'frame-1', 800, 'Submit'), (b'frame-2', 800, None)]
+    reference, results = evaluate(ScriptedEngine('vision', reference_words), frames)
+    report, _ = evaluate(ScriptedEngine('tesseract', candidate_words), frames, results)
+    print(f"  Reference: {reference}")
+    print(f"  Candidate: {report}")
+    assert reference['click_recall'] == 1.0 and 'f1' not in reference
+    assert report['failures'] == 1 and report['precision'] == 0.5 and report['recall'] == 0.5
+    assert report['click_recall'] == 1.0 and report['latency_ms_mean'] is not None
+
+    # The default async methods run the blocking recognize off the loop
+    engine = ScriptedEngine('scripted', reference_words)
+    results = asyncio.run(engine.arecognize_batch([b'a', b'b']))
+    assert [len(words) for _, words in results] == [3, 1]
+
+    return True
+
+if __name__ == "__main__":
+    test_tesseract_words()
+    test_local_engine()
+    test_engine_comparison()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the array-backed OCRFrame pipeline
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ocr_frame import OCRFrame, as_dicts
+from ocr_processing import build_annotations
+
+
+def word(text, x1, y1, x2, y2):
+    return {
+        'text': text, 'x': (x1 + x2) // 2, 'y': (y1 + y2) // 2,
+        'bbox': {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2},
+        'width': x2 - x1, 'height': y2 - y1
+    }
+
+
+def test_ocr_frame_pipeline():
+    """Test filtering, merging and instance tagging on an OCRFrame"""
+    print("=== OCR FRAME PIPELINE TEST ===")
+
+    words = OCRFrame.from_dicts([
+        word('Tab', 10, 5, 40, 25),                # top edge band, short -> dropped
+        word('A very long page title', 10, 10, 300, 30),  # top edge band, long -> kept
+        word('STOP', 500, 300, 540, 320),          # UI control -> dropped
+        word('Open', 100, 200, 140, 220),
+        word('settings', 145, 200, 210, 220),      # UI element word, short pair -> not merged
+        word('Submit', 100, 400, 150, 420),
+        word('Submit', 300, 400, 350, 420),        # second instance
+        word('Privacy', 100, 600, 150, 620),
+        word('policy', 155, 600, 200, 620),        # merged with 'Privacy'
+        word('Footer', 100, 1000, 150, 1020),      # bottom edge band -> dropped
+    ])
+
+    annotations = build_annotations(words, screen_height=1080)
+    dicts = as_dicts(annotations)
+    texts = [ann['text'] for ann in dicts]
+    print(f"  Annotations: {texts}")
+
+    assert texts == ['A very long page title', 'Open', 'settings', 'Submit', 'Submit', 'Privacy policy']
+    submit = [ann for ann in dicts if ann['text'] == 'Submit']
+    assert [(ann['index'], ann['total_instances']) for ann in submit] == [(0, 2), (1, 2)]
+
+    merged = dicts[-1]
+    print(f"  Merged element: {merged}")
+    assert merged['merged_from'] == 2
+    assert merged['bbox'] == {'x1': 100, 'y1': 600, 'x2': 200, 'y2': 620}
+    assert (merged['x'], merged['y']) == (150, 610)
+    assert 'merged_from' not in dicts[1]
+
+    # Dict view is lazy and memoized
+    assert annotations.to_dicts() is annotations.to_dicts()
+    assert annotations[0]['text'] == 'A very long page title'
+    assert len(annotations) == 6
+
+    return True
+
+if __name__ == "__main__":
+    test_ocr_frame_pipeline()
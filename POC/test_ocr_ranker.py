@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the local OCR ranker and the ranker benchmark
+"""
+
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ocr_ranker import LexicalRanker
+from ranker_benchmark import evaluate
+from session_recorder import SessionRecorder, find_sessions
+
+
+def ann(text, x, y):
+    return {'text': text, 'x': x, 'y': y, 'bbox': {'x1': x - 20, 'y1': y - 8, 'x2': x + 20, 'y2': y + 8},
+            'index': 0, 'total_instances': 1}
+
+
+SCREEN = [
+    ann('File', 20, 10), ann('Edit', 60, 10), ann('View', 100, 10),
+    ann('Calculatr', 400, 300),               # OCR misspelling
+    ann('Settings', 600, 500), ann('Privacy policy', 700, 900),
+    ann('Search the web', 640, 200),
+]
+
+
+def test_lexical_ranker():
+    """Test lexical, fuzzy, phrase, recency and repeat-click scoring"""
+    print("=== LEXICAL RANKER TEST ===")
+    ranker = LexicalRanker(top_k=5)
+
+    start = time.perf_counter()
+    ranked = ranker.rank('open the calculator app', SCREEN)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"  Ranked in {elapsed:.2f}ms: {[a['text'] for a in ranked]}")
+    assert ranked[0]['text'] == 'Calculatr'
+    assert len(ranked) == 5
+
+    ranked = ranker.rank('click Privacy policy', SCREEN)
+    assert ranked[0]['text'] == 'Privacy policy'
+
+    # New text on screen gets a recency bonus over unchanged text with the same score
+    ranker.reset()
+    ranker.rank('edit the view', SCREEN)
+    ranked = ranker.rank('edit the view', SCREEN + [ann('View', 100, 400)])
+    views = [(a['x'], a['y']) for a in ranked if a['text'] == 'View']
+    assert views[0] == (100, 400)
+
+    # Targets already clicked twice drop below fresh matches
+    clicks = [{'action': 'click_text', 'target': 'Settings'}] * 2
+    ranked = ranker.rank('open settings or search', SCREEN, clicks)
+    assert ranked[0]['text'] == 'Search the web'
+
+    return True
+
+
+def test_ranker_benchmark():
+    """Test replaying a recorded session through the lexical ranker"""
+    print("=== RANKER BENCHMARK TEST ===")
+    with tempfile.TemporaryDirectory() as root:
+        recorder = SessionRecorder(root)
+        recorder.record(0, 'open settings', [], SCREEN, None, {'action': 'click_text', 'target': 'Settings'})
+        recorder.record(1, 'open settings', [{'action': 'click_text', 'target': 'Settings'}], SCREEN, None,
+                        {'action': 'press', 'keys': ['enter']})
+        sessions = find_sessions(root)
+        assert len(sessions) == 1
+        result = evaluate(LexicalRanker(), sessions)
+    print(f"  Result: {result}")
+    assert result['steps'] == 2 and result['clicks'] == 1
+    assert result['success_rate'] == 1.0 and result['mrr'] == 1.0
+    assert result['latency_ms_mean'] < 50
+
+    return True
+
+if __name__ == "__main__":
+    test_lexical_ranker()
+    test_ranker_benchmark()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script to verify tile-parallel OCR: the tile grid, and stitching the
+words of overlapping tiles back into one word list
+"""
+
+import sys
+import os
+import asyncio
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+from ocr_engine import OCREngine
+from ocr_tiles import TileOCR, TileWord, join_texts, plan_tiles, stitch_tiles, stitch_words
+
+
+class LayoutEngine(OCREngine):
+    """
+    Reads a known layout of (text, box) words in frame pixels. Tiles come in
+    plan order; a word cut by a tile keeps the characters the tile shows.
+    """
+
+    def __init__(self, layout, tiles):
+        self.layout = layout
+        self.tiles = tiles
+
+    def read(self, tile):
+        tx1, ty1, tx2, ty2 = tile
+        words = []
+        for text, (x1, y1, x2, y2) in self.layout:
+            vx1, vy1, vx2, vy2 = max(x1, tx1), max(y1, ty1), min(x2, tx2), min(y2, ty2)
+            if vx2 <= vx1 or (vy2 - vy1) < 0.6 * (y2 - y1):
+                continue  # not in the tile, or too little of its height to read
+            first = round(len(text) * (vx1 - x1) / (x2 - x1))
+            last = round(len(text) * (vx2 - x1) / (x2 - x1))
+            if last > first:
+                words.append((text[first:last], [[vx1 - tx1, vy1 - ty1], [vx2 - tx1, vy1 - ty1],
+                                                 [vx2 - tx1, vy2 - ty1], [vx1 - tx1, vy2 - ty1]]))
+        return ' '.join(text for text, _ in words), words
+
+    def recognize_batch(self, images):
+        assert len(images) == len(self.tiles)
+        return [self.read(tile) for tile, _ in self.tiles]
+
+    async def arecognize_batch(self, images):
+        return self.recognize_batch(images)
+
+
+def test_tile_plan():
+    """Test that the tile cores partition the frame and neighbouring tiles overlap"""
+    print("=== TILE PLAN TEST ===")
+
+    tiles = plan_tiles(3840, 2160, tile_size=1024, overlap=128)
+    print(f"  4K: {len(tiles)} tiles, first {tiles[0]}")
+    assert len(tiles) == 12
+    assert sum((c[2] - c[0]) * (c[3] - c[1]) for _, c in tiles) == 3840 * 2160
+    assert tiles[0] == ((0, 0, 1024, 784), (0, 0, 960, 720))
+    assert tiles[5][0] == (896, 656, 1984, 1504)
+    assert plan_tiles(800, 600, tile_size=1024) == [((0, 0, 800, 600), (0, 0, 800, 600))]
+
+    return True
+
+
+def test_seam_stitching():
+    """Test that words read by two tiles are kept once and words cut by a seam are joined"""
+    print("=== SEAM STITCHING TEST ===")
+
+    assert join_texts('Docum', 'cument', (900, 0, 1010, 20), (960, 0, 1060, 20)) == 'Document'
+    assert join_texts('Prefer', 'ferences', (900, 0, 1000, 20), (950, 0, 1110, 20)) == 'Preferences'
+    # 'work' misread as 'uork': the box overlap says two characters are shared
+    assert join_texts('Netwo', 'uork', (900, 0, 1000, 20), (960, 0, 1040, 20)) == 'Network'
+
+    found = [
+        TileWord('Edit', (970, 10, 1010, 30), 0, False),      # in the shared strip: both tiles read it
+        TileWord('Edit', (970, 10, 1010, 30), 1, False),
+        TileWord('Open', (1016, 50, 1070, 70), 0, True),      # cut in tile 0, read whole by tile 1
+        TileWord('Open', (960, 50, 1070, 70), 1, False),
+        TileWord('Applicat', (880, 90, 1024, 110), 0, True),  # no tile read it whole
+        TileWord('cations', (896, 90, 1100, 110), 1, True),
+    ]
+    words = stitch_words(found)
+    print(f"  Stitched: {words}")
+    assert words == [('Edit', (970, 10, 1010, 30)), ('Open', (960, 50, 1070, 70)),
+                     ('Applications', (880, 90, 1100, 110))]
+
+    return True
+
+
+def test_tile_ocr():
+    """Test that a tiled read of a laid-out frame finds every word once, in frame pixels"""
+    print("=== TILE OCR TEST ===")
+
+    image = Image.new('RGB', (2048, 1200), 'white')
+    layout = [
+        ('File', (10, 10, 50, 30)),
+        ('Preferences', (950, 500, 1110, 520)),       # across the vertical seam at x=1024
+        ('Terminal', (1500, 590, 1600, 610)),         # across the horizontal seam at y=600
+        ('Ok', (1010, 700, 1040, 720)),               # inside the shared strip
+        ('Downloads', (1900, 1150, 2040, 1170)),
+    ]
+    engine = LayoutEngine(layout, plan_tiles(2048, 1200, tile_size=1024, overlap=128))
+    tiler = TileOCR(engine, tile_size=1024, overlap=128)
+    assert tiler.applies(image.size) and not tiler.applies((1000, 800))
+
+    full_text, words, request_bytes = tiler.recognize(image)
+    print(f"  {full_text!r}, {request_bytes} bytes in {len(engine.tiles)} tiles")
+    found = {text: vertices[0] + vertices[2] for text, vertices in words}
+    assert found == {text: list(box) for text, box in layout}
+    assert full_text == 'File\nPreferences\nTerminal\nOk\nDownloads'
+
+    assert asyncio.run(tiler.arecognize(image))[:2] == (full_text, words)
+
+    return True
+
+def test_dense_stitching():
+    """Test that stitching a word-dense 4K frame stays fast (only seam words are compared)"""
+    print("=== DENSE STITCHING TEST ===")
+
+    layout = [(f"w{col}x{row}", (col * 50 + 5, row * 22 + 3, col * 50 + 45, row * 22 + 19))
+              for col in range(76) for row in range(98)]
+    tiles = plan_tiles(3840, 2160, tile_size=1024, overlap=128)
+    engine = LayoutEngine(layout, tiles)
+    results = engine.recognize_batch([None] * len(tiles))
+
+    start = time.perf_counter()
+    full_text, words = stitch_tiles(tiles, results, 3840, 2160)
+    elapsed = time.perf_counter() - start
+    print(f"  {len(layout)} words from {sum(len(w) for _, w in results)} tile words stitched in {elapsed:.3f}s")
+    assert sorted(text for text, _ in words) == sorted(text for text, _ in layout)
+    assert elapsed < 1.0
+
+    return True
+
+if __name__ == "__main__":
+    test_tile_plan()
+    test_seam_stitching()
+    test_tile_ocr()
+    test_dense_stitching()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test script to verify pipeline stage timing and overlap accounting
+"""
+
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pipeline import StepTiming, PipelineReport
+
+
+def test_pipeline_overlap():
+    """Test that concurrent stages show up as time saved and serial stages do not"""
+    print("=== PIPELINE TIMING TEST ===")
+
+    report = PipelineReport('pipelined')
+
+    serial = StepTiming(0)
+    serial.start()
+    with serial.stage('select'):
+        time.sleep(0.05)
+    with serial.stage('action'):
+        time.sleep(0.05)
+    serial.finish()
+    summary = report.add(serial)
+    print(f"  Serial step: {summary}")
+    assert summary['saved_s'] < 0.02
+
+    overlapped = StepTiming(1)
+    overlapped.start()
+
+    def run(name):
+        with overlapped.stage(name):
+            time.sleep(0.1)
+    workers = [threading.Thread(target=run, args=(name,)) for name in ('select', 'action')]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    overlapped.finish()
+    summary = report.add(overlapped)
+    print(f"  Overlapped step: {summary}")
+    assert set(summary['stages']) == {'select', 'action'}
+    assert summary['serial_s'] >= 0.2 and summary['wall_s'] < 0.18
+    assert summary['saved_s'] >= 0.05
+
+    totals = report.to_dict()
+    assert totals['mode'] == 'pipelined' and len(totals['steps']) == 2
+    assert 0 < totals['saved_ratio'] < 1
+
+    return True
+
+if __name__ == "__main__":
+    test_pipeline_overlap()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the token-budgeted prompt compiler: ranked OCR rows
+within budget, action history compaction and bounded prompt size
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from prompt_compiler import PromptCompiler, count_tokens, summarize_actions
+
+TEMPLATE = '''
+Your goal is: "{goal}"
+
+Here are the actions you have taken so far:
+{history}
+
+EXACT TEXT ELEMENTS DETECTED BY OCR, most relevant first:
+{ocr}
+
+''' + "Follow the rules. Respond ONLY with a single JSON object.\n" * 40
+
+
+def fake_annotations(count):
+    return [{'text': f'Menu item number {i}', 'x': 10 * i, 'y': 20 + i, 'index': 0, 'total_instances': 1}
+            for i in range(count)]
+
+
+def fake_actions(count):
+    cycle = [{'action': 'click_text', 'target': 'File'},
+             {'action': 'type', 'text': 'hello world'},
+             {'action': 'press', 'keys': ['enter']}]
+    return [cycle[i % len(cycle)] for i in range(count)]
+
+
+def test_prompt_budget():
+    """Test that long runs on dense screens stay within the budget, best-ranked rows first"""
+    print("=== PROMPT COMPILER TEST ===")
+
+    compiler = PromptCompiler(budget=1500, recent_actions=5)
+    sizes = []
+    for steps in (0, 5, 10, 20):
+        compiled = compiler.compile(TEMPLATE, fake_actions(steps), fake_annotations(300), goal='open the file menu')
+        report = compiled.report()
+        sizes.append(compiled.tokens)
+        print(f"  {steps:2d} actions: {report}")
+        assert compiled.tokens <= 1500
+        assert compiled.tokens == count_tokens(compiled.text)
+        assert report['ocr_total'] == 300 and 0 < report['ocr_included'] < 300
+        assert report['actions_verbatim'] == min(steps, 5)
+        assert report['actions_summarized'] == max(0, steps - 5)
+    # Step 20 costs about what step 10 does: the summary does not grow with repeats
+    assert abs(sizes[3] - sizes[2]) < 20
+
+    compiled = compiler.compile(TEMPLATE, fake_actions(20), fake_annotations(300), goal='open the file menu')
+    assert '1|Menu item number 0|0|20|' in compiled.text
+    assert f"({300 - compiled.ocr_included} lower-ranked elements omitted)" in compiled.text
+    assert 'Steps 1-15 (summarized)' in compiled.text
+    assert '20. {"action":"type","text":"hello world"}' in compiled.text
+
+    summary = summarize_actions(fake_actions(6) + [{'action': 'type', 'text': 'x' * 60}])
+    print(f"  Summary: {summary}")
+    assert "clicked 'File' x2" in summary and "pressed enter x2" in summary
+    assert "typed '" + 'x' * 40 + "...'" in summary
+
+    # Duplicated text keeps its instance number
+    duplicate = [{'text': 'OK', 'x': 1, 'y': 2, 'index': 1, 'total_instances': 2}]
+    compiled = compiler.compile(TEMPLATE, [], duplicate, goal='confirm')
+    assert '1|OK|1|2|2/2' in compiled.text and '(none yet)' in compiled.text
+
+    return True
+
+if __name__ == "__main__":
+    test_prompt_budget()
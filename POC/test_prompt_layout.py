@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the prompt-cache layout: a byte-identical static
+prefix on every request, per-step data only after it, and cached-token
+accounting from the API usage field
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from prompts import ACTION_SYSTEM_PROMPT, ACTION_PROMPT_TEMPLATE, COMMAND_SYSTEM_PROMPT
+from prompts import vision_messages, planner_messages
+from prompt_compiler import PromptCompiler
+from llm_usage import UsageTracker, UsageSampler, drain_usage
+import config
+
+
+def step_messages(compiler, goal, actions, annotations, image):
+    compiled = compiler.compile(ACTION_PROMPT_TEMPLATE, actions, annotations, prefix=ACTION_SYSTEM_PROMPT,
+                                sysinfo='OS: linux 6.1 | Arch: x86_64 | Desktop: gnome', goal=goal)
+    return compiled, vision_messages(ACTION_SYSTEM_PROMPT, compiled.text, image)
+
+
+def test_static_prefix():
+    """Test that the system message is the same bytes at every step and holds no per-step data"""
+    print("=== PROMPT LAYOUT TEST ===")
+
+    compiler = PromptCompiler(budget=3000, recent_actions=5)
+    steps = [
+        ('open the calculator', [], [], 'aW1hZ2Ux'),
+        ('open the calculator', [{'action': 'press', 'keys': ['super']}],
+         [{'text': 'Calculator', 'x': 40, 'y': 90, 'index': 0, 'total_instances': 1}], 'aW1hZ2Uy'),
+        ('write an email', [{'action': 'type', 'text': 'mail'}] * 9,
+         [{'text': f'Item {i}', 'x': i, 'y': i, 'index': 0, 'total_instances': 1} for i in range(50)], 'aW1hZ2Uz'),
+    ]
+    prefixes = set()
+    for goal, actions, annotations, image in steps:
+        compiled, messages = step_messages(compiler, goal, actions, annotations, image)
+        system = messages[0]['content'].encode('utf-8')
+        prefixes.add(system)
+        # Everything that changes lives in the user message, after the prefix
+        assert goal.encode('utf-8') not in system and b'Item 1' not in system
+        assert goal in messages[1]['content'][0]['text']
+        assert compiled.prefix_tokens > 0 and compiled.tokens <= 3000
+        print(f"  {goal!r}, {len(actions)} actions: {compiled.report()}")
+    assert len(prefixes) == 1
+
+    # The prefix is a plain constant: no unfilled template fields or doubled braces
+    assert '{goal}' not in ACTION_SYSTEM_PROMPT and '{{' not in ACTION_SYSTEM_PROMPT
+
+    # Planner requests: static prompts first, the system description after them
+    first = planner_messages(COMMAND_SYSTEM_PROMPT, 'linux (linux with gnome desktop)', 'open notes', ['safety'])
+    second = planner_messages(COMMAND_SYSTEM_PROMPT, 'darwin (darwin with macOS desktop)', 'open mail', ['safety'])
+    assert first[:2] == second[:2] and first[2] != second[2]
+    assert 'darwin' not in COMMAND_SYSTEM_PROMPT and first[-1]['role'] == 'user'
+
+    return True
+
+
+def test_usage_tracker():
+    """Test that cached tokens are read from usage objects and dicts and totalled per call kind"""
+    print("=== LLM USAGE TEST ===")
+
+    class Details:
+        cached_tokens = 1024
+
+    class Usage:
+        prompt_tokens = 1500
+        completion_tokens = 20
+        prompt_tokens_details = Details()
+
+    tracker = UsageTracker()
+    tracker.record('action', {'prompt_tokens': 1500, 'completion_tokens': 18})    # first call: nothing cached
+    tracker.record('action', Usage())
+    tracker.record('action', None)
+    tracker.record('selector', {'prompt_tokens': 900, 'completion_tokens': 60,
+                                'prompt_tokens_details': {'cached_tokens': None}})
+    stats = tracker.stats()
+    print(f"  Stats: {stats['kinds']}")
+    action = stats['kinds']['action']
+    assert action['calls'] == 2 and action['prompt_tokens'] == 3000 and action['cached_tokens'] == 1024
+    assert action['cache_hits'] == 1 and action['cached_ratio'] == round(1024 / 3000, 3)
+    assert stats['kinds']['selector']['cached_ratio'] == 0.0
+    assert stats['recent'][-1]['kind'] == 'selector'
+
+    return True
+
+class FakeChunk:
+    def __init__(self, content=None, usage=None):
+        self.usage = usage
+        self.choices = [] if content is None else [type('Choice', (), {'delta': type('Delta', (), {'content': content})})]
+
+
+class FakeStream:
+    """A streamed completion: the action's content, then (unless closed first) the final usage chunk"""
+
+    def __init__(self, usage):
+        self.chunks = [FakeChunk('{"action": "click"}'), FakeChunk('\n'), FakeChunk(usage=usage)]
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed or not self.chunks:
+            raise StopAsyncIteration
+        return self.chunks.pop(0)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_default_usage_sampling():
+    """Test that a run with the default config records the cached tokens of its streamed action calls"""
+    print("=== STREAMED USAGE SAMPLING TEST ===")
+
+    if 'LLM_STREAMING' in os.environ or 'LLM_USAGE_SAMPLE_EVERY' in os.environ:
+        print("  LLM_STREAMING/LLM_USAGE_SAMPLE_EVERY set in the environment; checking the configured values")
+    assert config.LLM_STREAMING or 'LLM_STREAMING' in os.environ
+
+    tracker = UsageTracker()
+    sampler = UsageSampler(config.LLM_USAGE_SAMPLE_EVERY)
+    usage = {'prompt_tokens': 1500, 'completion_tokens': 12, 'prompt_tokens_details': {'cached_tokens': 1024}}
+
+    async def run(steps):
+        # What stream_llm_action does with each step's stream once its action is dispatched
+        for _ in range(steps):
+            stream = FakeStream(usage)
+            async for chunk in stream:
+                if chunk.choices:
+                    break
+            if sampler.take():
+                await drain_usage(stream, 'action', tracker)
+            else:
+                await stream.close()
+            assert stream.closed
+
+    asyncio.run(run(12))
+    stats = tracker.stats()['kinds'].get('action', {})
+    print(f"  Sampled every {config.LLM_USAGE_SAMPLE_EVERY}: {stats}")
+    if config.LLM_USAGE_SAMPLE_EVERY > 0:
+        assert stats['calls'] == 1 + 11 // config.LLM_USAGE_SAMPLE_EVERY
+        assert stats['cached_tokens'] == 1024 * stats['calls'] and stats['cached_ratio'] > 0
+    else:
+        assert 'LLM_USAGE_SAMPLE_EVERY' in os.environ and not stats, "the default config samples no usage"
+
+    return True
+
+if __name__ == "__main__":
+    test_static_prefix()
+    test_usage_tracker()
+    test_default_usage_sampling()
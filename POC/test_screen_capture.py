@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test script to verify that screen captures of separate X displays stay
+bound to their own display when grabbed from a shared thread pool, and that
+reopening capture handles does not leak X connections
+"""
+
+import sys
+import os
+import shutil
+import ctypes.util
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agent_session import XvfbDisplay, display_in_use
+from screen_capture import ScreenCapture
+
+
+def free_display_numbers(count, start=90):
+    numbers = []
+    number = start
+    while len(numbers) < count:
+        if not display_in_use(number):
+            numbers.append(number)
+        number += 1
+    return numbers
+
+
+def xvfb_available():
+    if shutil.which('Xvfb') is None or ctypes.util.find_library('Xrandr') is None:
+        print("  Xvfb or libXrandr not installed here; skipping the live capture check")
+        return False
+    return True
+
+
+def test_displays_on_shared_pool():
+    """Test that two displays grabbed from the same worker threads each return their own screen"""
+    print("=== SCREEN CAPTURE DISPLAY BINDING TEST ===")
+
+    if not xvfb_available():
+        return True
+
+    sizes = [(1024, 768), (800, 600)]
+    servers = [XvfbDisplay(number, f'{width}x{height}x24') for number, (width, height) in zip(free_display_numbers(2), sizes)]
+    captures = []
+    try:
+        for server, size in zip(servers, sizes):
+            server.start()
+            captures.append((ScreenCapture(display=server.name), size))
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            jobs = [(size, pool.submit(capture.grab)) for _ in range(10) for capture, size in captures]
+            for size, job in jobs:
+                frame = job.result()
+                assert frame.size == size, f"expected {size}, got {frame.size}"
+        print(f"  {len(jobs)} grabs across {len(servers)} displays matched their display")
+    finally:
+        for capture, _ in captures:
+            capture.close()
+        for server in servers:
+            server.stop()
+
+    return True
+
+
+def test_reopen_does_not_leak():
+    """Test that closing and reopening the capture handle releases its X connection"""
+    print("=== SCREEN CAPTURE REOPEN TEST ===")
+
+    if not xvfb_available():
+        return True
+
+    server = XvfbDisplay(free_display_numbers(1)[0], '640x480x24')
+    server.start()
+    try:
+        capture = ScreenCapture(display=server.name, geometry_ttl=0)   # re-checks the layout on every grab
+        capture.grab()
+        capture.close()
+        before = len(os.listdir('/proc/self/fd'))
+        for _ in range(25):
+            assert capture.grab().size == (640, 480)
+            assert capture.grab().size == (640, 480)
+            capture.close()
+        # A handle closed under a grab fails cleanly and is replaced
+        capture._handle().close()
+        assert capture.grab().size == (640, 480)
+        capture.close()
+        after = len(os.listdir('/proc/self/fd'))
+        print(f"  Open descriptors: {before} before, {after} after 26 reopens")
+        assert after <= before
+    finally:
+        server.stop()
+
+    return True
+
+
+if __name__ == "__main__":
+    print("Testing screen capture...")
+    print()
+
+    try:
+        test_displays_on_shared_pool()
+        test_reopen_does_not_leak()
+        print()
+        print("✅ All screen capture tests passed!")
+    except Exception as e:
+        print(f"❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the screen-settle detector: early return on a quiet
+screen, waiting out a delayed change, ignoring caret-sized noise and the
+timeout on a screen that never settles
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image, ImageDraw
+import time
+import numpy as np
+from screen_settle import SettleDetector, bus_sampler
+from screen_capture import Frame
+
+
+class FakeScreen:
+    """Frames on a fake clock: each entry is (time it appears, image)"""
+
+    def __init__(self, timeline):
+        self.timeline = timeline
+        self.now = 0.0
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def sample(self):
+        current = self.timeline[0][1]
+        for appears, image in self.timeline:
+            if appears <= self.now:
+                current = image
+        return current
+
+
+def screen(shade, caret=False):
+    image = Image.new('L', (320, 180), shade)
+    if caret:
+        ImageDraw.Draw(image).rectangle((100, 50, 100, 53), fill=255)
+    return image
+
+
+def detector(fake, **kwargs):
+    return SettleDetector(fake.sample, stable_window=0.3, idle_window=0.6, timeout=3.0, interval=0.05,
+                          clock=fake.clock, sleep=fake.sleep, **kwargs)
+
+
+def test_settle():
+    """Test that waits end as soon as the screen is stable and are bounded by the timeout"""
+    print("=== SCREEN SETTLE TEST ===")
+
+    # Nothing happens: returns after the idle window instead of a fixed 1-2 s
+    fake = FakeScreen([(0.0, screen(40))])
+    result = detector(fake).wait()
+    print(f"  Quiet screen: {result.to_dict()}")
+    assert result.stable and not result.changed and 0.6 <= result.waited < 0.7
+
+    # A window opens after 0.4 s and finishes drawing at 0.6 s: waits for the last change
+    fake = FakeScreen([(0.0, screen(40)), (0.4, screen(120)), (0.6, screen(200))])
+    result = detector(fake).wait()
+    print(f"  App launch: {result.to_dict()}")
+    assert result.stable and result.changed and 0.9 <= result.waited < 1.0
+
+    # A blinking caret is below the change threshold
+    blink = [(i * 0.5, screen(40, caret=i % 2 == 1)) for i in range(10)]
+    fake = FakeScreen(blink)
+    result = detector(fake).wait()
+    print(f"  Blinking caret: {result.to_dict()}")
+    assert result.stable and not result.changed
+
+    # A screen that keeps changing hits the timeout
+    fake = FakeScreen([(i * 0.1, screen(40 + (i % 2) * 100)) for i in range(60)])
+    settle = detector(fake)
+    result = settle.wait()
+    print(f"  Never settles: {result.to_dict()}")
+    assert not result.stable and 3.0 <= result.waited < 3.01
+    assert settle.stats()['timeouts'] == 1 and settle.stats()['waits'] == 1
+
+    return True
+
+class FakeShot:
+    def __init__(self, pixels):
+        self.bgra = pixels.tobytes()
+        self.height, self.width = pixels.shape[:2]
+        self.size = (self.width, self.height)
+
+
+class FakeBus:
+    """Publishes one frame; fresh_frame counts the grabs it would cost"""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.grabs = 0
+
+    def latest(self):
+        return (1, self.frame)
+
+    def fresh_frame(self):
+        self.grabs += 1
+        return self.frame
+
+
+def test_bus_sampler():
+    """Test that settle samples are strided thumbnails of the raw frame, reusing recently published frames"""
+    print("=== SETTLE SAMPLER TEST ===")
+
+    pixels = np.zeros((1080, 1920, 4), dtype=np.uint8)
+    pixels[:, :, 1] = np.arange(1920) % 256   # green channel varies along x
+    frame = Frame(FakeShot(pixels), {'width': 1920, 'height': 1080}, 1.0, 1.0, time.time())
+    bus = FakeBus(frame)
+
+    thumbnail = bus_sampler(bus, max_width=320)()
+    print(f"  Thumbnail: {thumbnail.size} {thumbnail.mode}, grabs {bus.grabs}")
+    assert thumbnail.size == (320, 180) and thumbnail.mode == 'L'
+    assert thumbnail.getpixel((10, 5)) == 60   # column 10 of the thumbnail is column 60 of the frame
+    assert bus.grabs == 0   # the published frame was recent enough
+
+    frame.timestamp -= 1.0
+    bus_sampler(bus, max_width=320)()
+    assert bus.grabs == 1
+
+    return True
+
+if __name__ == "__main__":
+    test_settle()
+    test_bus_sampler()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the versioned agent state store
+"""
+
+import sys
+import os
+import base64
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from state_store import VersionedState
+
+
+def test_versioned_state():
+    """Test diffs since a version, projections, blob references and long-poll wakeups"""
+    print("=== VERSIONED STATE TEST ===")
+
+    state = VersionedState(
+        {'status': 'idle', 'step': 0, 'screen_b64': '', 'actions_taken': []},
+        blob_fields={'screen_b64': ('image/jpeg', base64.b64decode)}
+    )
+    assert state.version == 0
+
+    state['status'] = 'running'
+    state['step'] = 1
+    state['step'] = 1  # unchanged scalar: no new version
+    assert state.version == 2
+
+    jpeg = b'\xff\xd8fake-jpeg\xff\xd9'
+    state['screen_b64'] = base64.b64encode(jpeg).decode()
+    version, changes = state.snapshot(since=2, inline_blobs=False)
+    print(f"  Diff since 2: {changes}")
+    assert version == 3 and list(changes) == ['screen_b64']
+    ref = changes['screen_b64']
+    assert ref['bytes'] == len(jpeg) and ref['url'].endswith(ref['blob'])
+    assert state.blob(ref['blob']) == (jpeg, 'image/jpeg')
+    assert state.snapshot(since=2)[1]['screen_b64'] == base64.b64encode(jpeg).decode()
+
+    # Projection ETag only moves when a projected field changes
+    assert state.field_version(['status']) == 1
+    assert state.snapshot(['status', 'missing'])[1] == {'status': 'running'}
+
+    # Long-poll on a projection wakes on a change to that field only
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(state.wait(1, ['status'], timeout=2.0)))
+    waiter.start()
+    time.sleep(0.05)
+    state['step'] = 2
+    time.sleep(0.05)
+    assert not results
+    state['actions_taken'] = state['actions_taken'] + [{'action': 'click'}]
+    state['status'] = 'done'
+    waiter.join()
+    assert results == [True]
+    assert state.wait(state.version, timeout=0.05) is False
+
+    version, changes = state.snapshot(since=3)
+    assert sorted(changes) == ['actions_taken', 'status', 'step'] and version == 6
+
+    return True
+
+if __name__ == "__main__":
+    test_versioned_state()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Test script to verify incremental JSON action parsing of streamed output
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stream_json import JSONObjectScanner
+
+
+def feed_all(chunks):
+    scanner = JSONObjectScanner()
+    for i, chunk in enumerate(chunks):
+        value = scanner.feed(chunk)
+        if value is not None:
+            return value, i
+    return None, len(chunks)
+
+
+def test_stream_json():
+    """Test that the first object is returned on its closing brace, however it is chunked"""
+    print("=== STREAMED JSON TEST ===")
+
+    response = '```json\n{"action": "type", "text": "a {tricky} \\"quoted\\" }"}\n```\nThis types the text.'
+    # Every possible chunking of the response yields the same action, on the chunk with the closing brace
+    closing = response.index('}\n```') + 1
+    for size in (1, 2, 3, 7, 64):
+        chunks = [response[i:i + size] for i in range(0, len(response), size)]
+        value, index = feed_all(chunks)
+        assert value == {'action': 'type', 'text': 'a {tricky} "quoted" }'}, (size, value)
+        assert index == (closing - 1) // size, (size, index)
+
+    # Nested objects are part of the action; prose braces are skipped
+    value, _ = feed_all(['Sure {not json} ', '{"action": "press", "keys": ["ctrl", ', '"t"], "meta": {"x": 1}}', ' trailing'])
+    print(f"  Parsed: {value}")
+    assert value == {'action': 'press', 'keys': ['ctrl', 't'], 'meta': {'x': 1}}
+
+    # Incomplete stream: nothing yet
+    assert feed_all(['{"action": "click_text", "target": "Sub'])[0] is None
+
+    return True
+
+if __name__ == "__main__":
+    test_stream_json()
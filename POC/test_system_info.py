@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the cached system info provider: one detection,
+reused until PATH, a PATH directory or the home directory changes
+"""
+
+import sys
+import os
+import stat
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from system_info import SystemInfo
+
+
+def install(bin_dir, name):
+    path = os.path.join(bin_dir, name)
+    with open(path, 'w') as f:
+        f.write('#!/bin/sh\n')
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+
+
+def test_system_info_cache():
+    """Test that apps are detected once and redetected only after the watched environment changes"""
+    print("=== SYSTEM INFO CACHE TEST ===")
+
+    saved = {name: os.environ.get(name) for name in ('PATH', 'HOME')}
+    with tempfile.TemporaryDirectory() as root:
+        bin_dir, other_bin, home = (os.path.join(root, name) for name in ('bin', 'other', 'home'))
+        for directory in (bin_dir, other_bin, home):
+            os.mkdir(directory)
+        install(bin_dir, 'kcalc')
+        try:
+            os.environ['PATH'] = bin_dir
+            os.environ['HOME'] = home
+            provider = SystemInfo()
+
+            first = provider.info()
+            assert first['available_apps']['calculator'] == ['kcalc']
+            snippet = provider.prompt_snippet()
+            assert provider.info() is first and provider.best_app('calculator') == 'kcalc'
+            assert provider.prompt_snippet() == snippet and 'calculator: kcalc' in provider.planner_context()
+            assert provider.stats()['refreshes'] == 1
+
+            # Installing an app changes its bin directory
+            install(bin_dir, 'firefox')
+            assert provider.best_app('browser') == 'firefox'
+            assert provider.stats()['refreshes'] == 2
+
+            # A new PATH entry
+            install(other_bin, 'vlc')
+            os.environ['PATH'] = os.pathsep.join([bin_dir, other_bin])
+            assert provider.best_app('video_player') == 'vlc'
+
+            # A new home directory
+            assert 'downloads' not in provider.info()['common_dirs']
+            os.mkdir(os.path.join(home, 'Downloads'))
+            assert provider.info()['common_dirs']['downloads'] == os.path.join(home, 'Downloads')
+
+            stats = provider.stats()
+            print(f"  Stats: {stats}")
+            assert stats['refreshes'] == 4 and stats['hits'] >= 6
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    return True
+
+if __name__ == "__main__":
+    test_system_info_cache()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the click_text lookup index: exact, word-subset,
+substring and fuzzy matches, best-match scoring and instance disambiguation
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from text_index import TextIndex, text_index_for
+from ocr_frame import OCRFrame
+
+
+def element(text, x, y, index=0, total=1):
+    return {'text': text, 'x': x, 'y': y, 'bbox': {'x1': x - 10, 'y1': y - 5, 'x2': x + 10, 'y2': y + 5},
+            'index': index, 'total_instances': total}
+
+
+def test_text_lookup():
+    """Test that the best-scoring element wins and duplicates are told apart by instance"""
+    print("=== TEXT INDEX TEST ===")
+
+    annotations = [
+        element('Enter', 100, 200),
+        element('Submit', 150, 250),
+        element('File Menu', 50, 100),
+        element('New Document', 300, 150),
+        element('Document', 320, 400),
+        element('OK', 500, 600, 0, 2),
+        element('OK', 700, 600, 1, 2),
+        element('Save As...', 80, 120),
+    ]
+    index = TextIndex(annotations)
+
+    cases = [
+        ('enter', (100, 200), 'exact'),
+        ('  Submit ', (150, 250), 'exact'),
+        ('File', (50, 100), 'words'),
+        # The old first-partial-match rule picked 'New Document'; the exact element wins now
+        ('Document', (320, 400), 'exact'),
+        ('Subrnit', (150, 250), 'fuzzy'),
+        ('Save As', (80, 120), 'words'),
+        ('Docu', (320, 400), 'partial'),
+        ('click New Document button', (300, 150), 'contained'),
+    ]
+    for target, position, kind in cases:
+        match = index.lookup(target)
+        print(f"  {target!r} -> {match.text!r} ({match.kind}, score {match.score}, confidence {match.confidence})")
+        assert (match.x, match.y) == position and match.kind == kind
+    assert index.lookup('Quit') is None and index.lookup('') is None
+
+    # Duplicates: highest-ranked by default (less confident), or the requested instance
+    first = index.lookup('OK')
+    assert (first.x, first.instance) == (500, 1) and first.confidence < first.score
+    second = index.lookup('OK', instance=2)
+    assert (second.x, second.instance) == (700, 2)
+    assert index.lookup('OK', instance='2/2').x == 700
+    assert index.lookup('OK', instance=5).x == 500
+
+    # An OCRFrame keeps its index; dict lists get a fresh one
+    frame = OCRFrame.from_dicts(annotations)
+    assert text_index_for(frame) is text_index_for(frame)
+    assert text_index_for(frame).lookup('File').text == 'File Menu'
+
+    # Lookups only score elements sharing a token or trigram with the target
+    dense = TextIndex([element(f'Row {i} item {i * 7}', i, i) for i in range(5000)] + annotations)
+    start = time.perf_counter()
+    for _ in range(100):
+        match = dense.lookup('New Document')
+    elapsed = (time.perf_counter() - start) / 100
+    print(f"  Lookup among {len(dense)} elements: {elapsed * 1000:.2f} ms")
+    assert match.x == 300 and len(dense.candidates('New Document')) < 10
+
+    return True
+
+if __name__ == "__main__":
+    test_text_lookup()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test script to verify trajectory recording and replay lookup
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image, ImageDraw
+
+from trajectory_cache import TrajectoryCache, screen_fingerprint
+
+
+def screen(window, caret=False):
+    """A fake desktop: a window at a given position, optionally with a blinking caret"""
+    img = Image.new("L", (640, 400), 90)
+    draw = ImageDraw.Draw(img)
+    draw.rectangle(window, fill=230)
+    draw.rectangle((window[0] + 10, window[1] + 10, window[2] - 10, window[1] + 40), fill=30)
+    if caret:
+        draw.rectangle((300, 300, 301, 312), fill=0)
+    return img
+
+
+def test_trajectory_cache():
+    """Test that a successful run replays on matching screens and not on diverging ones"""
+    print("=== TRAJECTORY CACHE TEST ===")
+    with tempfile.TemporaryDirectory() as root:
+        cache = TrajectoryCache(os.path.join(root, 'trajectories.sqlite3'), max_distance=12)
+
+        desktop = screen((20, 20, 200, 150))
+        calculator = screen((300, 100, 600, 380))
+        open_app = {'action': 'press', 'keys': ['command', 'space']}
+        type_name = {'action': 'type', 'text': 'calculator'}
+
+        cache.record_run('Open Calculator', [
+            ([], screen_fingerprint(desktop), open_app),
+            ([open_app], screen_fingerprint(calculator), {'action': 'done'}),
+        ])
+
+        # Same goal (modulo case/spacing), same history, same screen give the recorded action
+        assert cache.lookup('open  calculator', [], screen_fingerprint(desktop)) == open_app
+        # A caret blink is within tolerance
+        assert cache.lookup('open calculator', [], screen_fingerprint(screen((20, 20, 200, 150), caret=True))) == open_app
+        # Different screen, history or goal: fall back to the LLM
+        assert cache.lookup('open calculator', [], screen_fingerprint(calculator)) is None
+        assert cache.lookup('open calculator', [type_name], screen_fingerprint(desktop)) is None
+        assert cache.lookup('open notes', [], screen_fingerprint(desktop)) is None
+        assert cache.lookup('open calculator', [open_app], screen_fingerprint(calculator)) == {'action': 'done'}
+
+        # Recording the same run again reinforces it instead of duplicating it
+        cache.record_run('open calculator', [([], screen_fingerprint(desktop), open_app)])
+        stats = cache.stats()
+        print(f"  Stats: {stats}")
+        assert stats == {'path': cache.path, 'goals': 1, 'decisions': 2}
+
+    return True
+
+if __name__ == "__main__":
+    test_trajectory_cache()
@@ -0,0 +1,155 @@
+"""
+Text lookup index for click_text targets.
+
+find_text_coordinates used to scan every annotation up to five times per
+click, re-normalizing each text on every pass, and returned the first
+partial match rather than the best one. A TextIndex is built once per OCR
+result and holds:
+
+- a normalized-text hash map for exact hits
+- an inverted token index for word-subset matches ('File' -> 'File Menu')
+- a character trigram index for substring and fuzzy matches, so OCR
+  misreadings such as 'Subrnit' still find 'Submit'
+
+Only the elements that share a token or trigram with the target are
+scored, and the best score wins. Ties go to the higher-ranked element
+(earlier in the list), unless an instance number asks for a specific
+duplicate. Each match carries a confidence, which is lower when the
+target was ambiguous.
+"""
+
+import re
+from collections import Counter, namedtuple
+
+from ocr_ranker import normalize, trigrams
+
+_WORD = re.compile(r"\w+")
+
+FUZZY_MIN = 0.5         # minimum trigram Dice similarity for a fuzzy match
+AMBIGUOUS_PENALTY = 0.8  # confidence factor when duplicates exist and no instance picked one
+
+# element is the matched annotation dict; instance is its 1-based number among duplicates
+TextMatch = namedtuple('TextMatch', 'x y text score confidence kind instance element')
+
+
+def tokens(normalized):
+    return set(_WORD.findall(normalized))
+
+
+def parse_instance(instance):
+    """1-based instance number from 2, '2' or '2/3' (the OCR table's k/n form); None if absent or unreadable"""
+    if instance is None:
+        return None
+    try:
+        return int(str(instance).split('/')[0])
+    except ValueError:
+        return None
+
+
+class TextIndex:
+    def __init__(self, annotations):
+        self.elements = list(annotations)
+        self.norms = []
+        self.tokens = []
+        self.grams = []
+        self.exact = {}        # normalized text -> element positions, in rank order
+        self.by_token = {}     # token -> element positions
+        self.by_gram = {}      # trigram -> element positions
+        for position, ann in enumerate(self.elements):
+            norm = normalize(str(ann['text']))
+            words = tokens(norm)
+            grams = trigrams(norm)
+            self.norms.append(norm)
+            self.tokens.append(words)
+            self.grams.append(grams)
+            self.exact.setdefault(norm, []).append(position)
+            for word in words:
+                self.by_token.setdefault(word, []).append(position)
+            for gram in grams:
+                self.by_gram.setdefault(gram, []).append(position)
+
+    def __len__(self):
+        return len(self.elements)
+
+    def _score(self, position, target, target_tokens, target_grams, shared):
+        """(score, kind) of one candidate, or None when it does not match well enough"""
+        norm = self.norms[position]
+        if not norm:
+            return None
+        candidates = []
+        if target in norm:
+            ratio = len(target) / len(norm)
+            if target_tokens and target_tokens <= self.tokens[position]:
+                candidates.append((0.65 + 0.3 * ratio, 'words'))
+            else:
+                candidates.append((0.55 + 0.3 * ratio, 'partial'))
+        elif norm in target and self.tokens[position] and self.tokens[position] <= target_tokens:
+            candidates.append((0.4 + 0.4 * len(norm) / len(target), 'contained'))
+        elif target_tokens and target_tokens <= self.tokens[position]:
+            # All words present, but not as one phrase
+            candidates.append((0.5 + 0.3 * len(target) / len(norm), 'words'))
+        dice = 2 * shared / (len(target_grams) + len(self.grams[position]))
+        if dice >= FUZZY_MIN:
+            candidates.append((0.6 * dice, 'fuzzy'))
+        return max(candidates) if candidates else None
+
+    def candidates(self, target_text):
+        """All matching elements as (score, position, kind), best first"""
+        target = normalize(str(target_text))
+        if not target:
+            return []
+        if target in self.exact:
+            return [(1.0, position, 'exact') for position in self.exact[target]]
+        target_tokens = tokens(target)
+        target_grams = trigrams(target)
+        shared = Counter()
+        for gram in target_grams:
+            for position in self.by_gram.get(gram, ()):
+                shared[position] += 1
+        # Elements made only of target words (e.g. 'Save' for 'Save file') share few trigrams
+        for word in target_tokens:
+            for position in self.by_token.get(word, ()):
+                shared.setdefault(position, 0)
+        scored = []
+        for position, count in shared.items():
+            result = self._score(position, target, target_tokens, target_grams, count)
+            if result is not None:
+                scored.append((result[0], position, result[1]))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return scored
+
+    def lookup(self, target_text, instance=None):
+        """
+        The best match for target_text as a TextMatch, or None. instance is
+        the 1-based number of the wanted duplicate ('2' for instance 2/3).
+        """
+        instance = parse_instance(instance)
+        scored = self.candidates(target_text)
+        if not scored:
+            return None
+        score, position, kind = scored[0]
+        best_norm = self.norms[position]
+        duplicates = [(s, p, k) for s, p, k in scored if self.norms[p] == best_norm and s == score]
+        ann = self.elements[position]
+        total = ann.get('total_instances', 1)
+        confidence = score
+        if instance is not None:
+            wanted = [(s, p, k) for s, p, k in duplicates if self.elements[p].get('index', 0) + 1 == instance]
+            if wanted:
+                score, position, kind = wanted[0]
+                ann = self.elements[position]
+            elif total > 1 or len(duplicates) > 1:
+                confidence *= AMBIGUOUS_PENALTY
+        elif total > 1 or len(duplicates) > 1:
+            confidence *= AMBIGUOUS_PENALTY
+        return TextMatch(ann['x'], ann['y'], ann['text'], round(score, 3), round(confidence, 3), kind,
+                         ann.get('index', 0) + 1, ann)
+
+
+def text_index_for(annotations):
+    """The index of an OCR result: memoized on an OCRFrame, built for a list of dicts"""
+    if isinstance(annotations, TextIndex):
+        return annotations
+    if hasattr(annotations, 'text_index'):
+        return annotations.text_index()
+    return TextIndex(annotations)
@@ -0,0 +1,108 @@
+"""
+Trajectory cache: replay what worked last time.
+
+Repeat goals ("open calculator", "search the weather") used to re-derive the
+same actions through the LLM, step by step. A successful run is recorded as
+a list of decisions, each of the form (goal, actions taken so far, screen
+fingerprint) -> action. On a later run with the same goal, a step whose
+action history matches and whose screen fingerprint is within
+max_distance bits of the recorded one replays the recorded action directly.
+As soon as the screen differs (or the LLM picks something else), the history
+no longer matches and the loop is back on the LLM.
+
+The fingerprint is a 256-bit dHash of the frame, so clock ticks, a blinking
+caret or a moved cursor do not break a match, but a different window does.
+Storage is SQLite (WAL), shared by all agent processes, like the OCR cache.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from frame_diff import dhash, hamming_distance
+
+FINGERPRINT_SIZE = 16  # dHash grid; 16x16 = 256 bits
+
+
+def screen_fingerprint(gray):
+    """256-bit perceptual fingerprint of a grayscale frame"""
+    return dhash(gray, hash_size=FINGERPRINT_SIZE)
+
+
+def normalize_goal(goal):
+    return ' '.join(goal.lower().split())
+
+
+def history_key(actions_taken):
+    """Stable hash of the action history that led to a step"""
+    return hashlib.sha1(json.dumps(actions_taken, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class TrajectoryCache:
+    def __init__(self, path, max_distance=12, timeout=10.0):
+        self.path = path
+        self.max_distance = max_distance   # fingerprint bits that may differ for a match
+        self.timeout = timeout
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute('''CREATE TABLE IF NOT EXISTS decisions (
+                goal TEXT NOT NULL,
+                history TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                action TEXT NOT NULL,
+                successes INTEGER NOT NULL DEFAULT 1,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (goal, history, fingerprint, action)
+            )''')
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    def lookup(self, goal, actions_taken, fingerprint):
+        """The recorded action for this goal, history and screen, or None"""
+        rows = self._connect().execute(
+            'SELECT fingerprint, action, successes FROM decisions WHERE goal = ? AND history = ?',
+            (normalize_goal(goal), history_key(actions_taken))
+        ).fetchall()
+        best = None
+        for recorded, action, successes in rows:
+            distance = hamming_distance(int(recorded, 16), fingerprint)
+            if distance > self.max_distance:
+                continue
+            # Closest screen wins; among equally close ones, the most proven action
+            rank = (distance, -successes)
+            if best is None or rank < best[0]:
+                best = (rank, action)
+        return json.loads(best[1]) if best else None
+
+    def record_run(self, goal, decisions):
+        """Store the (actions_taken, fingerprint, action) decisions of a successful run"""
+        now = time.time()
+        goal = normalize_goal(goal)
+        db = self._connect()
+        with db:
+            for actions_taken, fingerprint, action in decisions:
+                db.execute(
+                    'INSERT INTO decisions (goal, history, fingerprint, action, last_used) VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT(goal, history, fingerprint, action) '
+                    'DO UPDATE SET successes = successes + 1, last_used = excluded.last_used',
+                    (goal, history_key(actions_taken), format(fingerprint, 'x'),
+                     json.dumps(action, sort_keys=True), now)
+                )
+
+    def stats(self):
+        goals, decisions = self._connect().execute(
+            'SELECT COUNT(DISTINCT goal), COUNT(*) FROM decisions'
+        ).fetchone()
+        return {'path': self.path, 'goals': goals, 'decisions': decisions}